@@ -0,0 +1,46 @@
+"""
+jsonstream.py - write json lists element by element.
+
+The registermap generators use this in stream mode, so finished
+registers are written to the output file immediately instead of
+collecting all of them in memory. The output is the same as
+json.dump(list, f, indent=2, ensure_ascii=False) writes, also
+when the list is nested at level in other objects.
+"""
+
+import json
+
+
+def dumps_indented(obj, level: int) -> str:
+    """
+    return obj as json string, as json.dumps() with indent=2 formats
+    it, when it is nested at level
+    """
+    return json.dumps(obj, indent=2, ensure_ascii=False).replace(
+        "\n", "\n" + "  " * level
+    )
+
+
+class jsonlistwriter:
+    """
+    write a json list to the open file f, element by element
+
+    :param f: file object to write to
+    :param level: nesting level of the list in the json output
+    """
+
+    def __init__(self, f, level: int = 0) -> None:
+        self.f = f
+        self.level = level
+        self.count = 0
+
+    def append(self, obj) -> None:
+        self.f.write("[\n" if self.count == 0 else ",\n")
+        self.f.write("  " * (self.level + 1) + dumps_indented(obj, self.level + 1))
+        self.count += 1
+
+    def close(self) -> None:
+        if self.count == 0:
+            self.f.write("[]")
+        else:
+            self.f.write("\n" + "  " * self.level + "]")
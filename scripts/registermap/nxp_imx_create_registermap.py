@@ -2,18 +2,20 @@
 """
 nxp_imx_create_registermap.py - create a registermap in JSon format for NXP SoCs.
 
-usage: nxp_imx_create_registermap.py [-h] -s SOC
+usage: nxp_imx_create_registermap.py [-h] -s SOC [-j JOBS] [-c CACHEDIR] [--stream]
 
 example:
 
-    $ python3 nxp_imx_create_registermap.py -s imx8mp
+    $ python3 nxp_imx_create_registermap.py -s imx8mp -j 8
 """
 
 import argparse
-import pdfplumber
 import re
 import json
 
+from jsonstream import jsonlistwriter
+from pdfpages import pdfpages, peak_memory
+
 
 def parse_arguments():
     """Parse and return command-line arguments."""
@@ -25,6 +27,27 @@ def parse_arguments():
         "-s", "--soc", required=True, help="Name of the SoC (example imx8mp)"
     )
 
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes extracting the pdf pages (default 1)",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--cachedir",
+        default=None,
+        help="Directory in which the text and tables of each pdf page are cached",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Keep memory bounded, write registers to the output file when finished",
+    )
+
     args = parser.parse_args()
     return args
 
@@ -32,8 +55,14 @@ def parse_arguments():
 class pdf2json:
     """ """
 
-    def __init__(self, socname: str) -> None:
+    def __init__(
+        self, socname: str, jobs: int = 1, cachedir: str = None, stream: bool = False
+    ) -> None:
         self.soc = socname
+        self.jobs = jobs
+        self.cachedir = cachedir
+        self.stream = stream
+        self.writer = None
         self.regmap = []
         self.current_register = None
         self.current_address = None
@@ -191,6 +220,20 @@ class pdf2json:
         self.found_new_register = False
         self.current_register = None
 
+    def flush_registers(self, final=False):
+        """
+        stream mode: write the committed registers into the output file.
+        The bits of the current register may still get extended, even
+        if it is already committed, so keep it until a new one starts.
+        """
+        if self.writer is None:
+            return
+
+        while self.regmap:
+            if not final and self.regmap[0]["bits"] is self.current_bits:
+                break
+            self.writer.append(self.regmap.pop(0))
+
     def print_all_tables(self, page):
         tables = page.extract_tables()
         self.debug(f"\nfound tables: {len(tables)}")
@@ -494,9 +537,10 @@ class pdf2json:
         if self.found_new_register:
             self.handle_table()
 
-    def handle_pdf(self, pdf, start_page, end_page):
+    def handle_pdf(self, pages, start_page, end_page):
         for page_num in range(start_page - 1, end_page):  # pdfplumber indexiert ab 0
-            self.page = pdf.pages[page_num]
+            self.flush_registers()
+            self.page = pages[page_num]
 
             self.page_nr = page_num + 1
             self.debug(f"\n=== Page {self.page_nr} ===\n")
@@ -548,23 +592,35 @@ class pdf2json:
             )
 
     def convert(self):
-        with pdfplumber.open(self.pdfname) as pdf:
+        if self.stream:
+            f = open(self.output_file, "w", encoding="utf-8")
+            self.writer = jsonlistwriter(f)
+
+        with pdfpages(self.pdfname, self.jobs, self.cachedir, self.stream) as pages:
+            pages.prefetch([(r["start_page"], r["end_page"]) for r in self.ranges])
             for r in self.ranges:
-                self.handle_pdf(pdf, r["start_page"], r["end_page"])
+                self.handle_pdf(pages, r["start_page"], r["end_page"])
 
-        # save as JSON
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            json.dump(self.regmap, f, indent=2, ensure_ascii=False)
+        if self.stream:
+            self.flush_registers(final=True)
+            self.writer.close()
+            f.close()
+        else:
+            # save as JSON
+            with open(self.output_file, "w", encoding="utf-8") as f:
+                json.dump(self.regmap, f, indent=2, ensure_ascii=False)
 
         # debug("\n=== JSON result ===")
         # debug(json.dumps(regmap, indent=2, ensure_ascii=False))
         self.debug(f"Result saved as {self.output_file}")
+        mem, workermem = peak_memory()
+        self.debug(f"peak memory {mem} kB, worker processes {workermem} kB")
 
 
 def main():
     args = parse_arguments()
 
-    regmap = pdf2json(args.soc)
+    regmap = pdf2json(args.soc, args.jobs, args.cachedir, args.stream)
     regmap.convert()
 
 
@@ -0,0 +1,363 @@
+"""
+pdfpages.py - page text and table extraction for the registermap generators.
+
+The generators only use extract_text(), extract_tables() and extract_table()
+of the pdfplumber pages. pdfpages extracts this data once per page and
+hands out page objects with the same methods, so the parsing heuristics
+run unchanged on the extracted data.
+
+With jobs > 1 the pages of the configured page ranges are split into
+shards of contiguous pages, which are extracted concurrently in a process
+pool. The parsing heuristics still walk the pages strictly in page order,
+so state carried from page to page (for example tables continued on the
+next page) is the same as in the sequential run, and so is the output.
+
+With a cachedir the extracted data of each page is stored in
+cachedir/<hash of pdf and pdfplumber version>/<page number>.json.gz.
+Later runs only read this cache, so changes of the parsing heuristics
+can be tested without extracting the pdf again.
+
+In stream mode the memory is bounded: pdfplumber page caches are
+released after each page, the pdf is reopened from time to time and
+only the pages of the current shard are kept in memory.
+"""
+
+import concurrent.futures
+import copy
+import gzip
+import hashlib
+import json
+import os
+import pdfplumber
+import resource
+
+PAGE_ITEMS = ("text", "tables", "table")
+
+# stream mode: max pages of one shard, reopen pdf after this count of pages
+STREAM_SHARD_PAGES = 32
+STREAM_REOPEN_PAGES = 100
+
+
+def release_page(page) -> None:
+    """
+    release the parsed objects pdfplumber caches in page
+    """
+    if hasattr(page, "close"):
+        page.close()
+    else:
+        page.flush_cache()
+
+
+def peak_memory() -> tuple:
+    """
+    return the peak memory (maximum resident set size) in kB of this
+    process and of the largest terminated worker process
+    """
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def extract_page(page, items) -> dict:
+    """
+    extract items from a pdfplumber page
+
+    :param page: pdfplumber page
+    :param items: list of items to extract, see PAGE_ITEMS
+    :return: dictionary item -> extracted data
+    """
+    data = {}
+    if "text" in items:
+        data["text"] = page.extract_text()
+    if "tables" in items:
+        data["tables"] = page.extract_tables()
+    if "table" in items:
+        data["table"] = page.extract_table()
+
+    return data
+
+
+def extract_shard(pdfname, start, end, items) -> list:
+    """
+    extract items of pages start to end - 1 (0 based), runs in a worker
+    process, so it opens the pdf itself.
+
+    :return: list of dictionaries, see extract_page()
+    """
+    ret = []
+    with pdfplumber.open(pdfname) as pdf:
+        for n in range(start, end):
+            ret.append(extract_page(pdf.pages[n], items))
+            release_page(pdf.pages[n])
+
+    return ret
+
+
+class pdfpage:
+    """
+    extracted data of one pdf page, with the extract methods of a
+    pdfplumber page. Items not extracted yet are extracted on first use.
+    """
+
+    def __init__(self, doc, page_num: int, data: dict) -> None:
+        self.doc = doc
+        self.page_num = page_num
+        self.page_number = page_num + 1
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"<Page:{self.page_number}>"
+
+    def get(self, item):
+        if item not in self.data:
+            self.data.update(self.doc.extract(self.page_num, [item]))
+            self.doc.store(self.page_num, self.data)
+
+        return self.data[item]
+
+    def extract_text(self):
+        return self.get("text")
+
+    def extract_tables(self):
+        # the heuristics modify the rows, so always return a fresh copy
+        return copy.deepcopy(self.get("tables"))
+
+    def extract_table(self):
+        return copy.deepcopy(self.get("table"))
+
+
+class pdfpages:
+    """
+    access the pages of a pdf file by page index (0 based), like
+    pdfplumber.PDF.pages
+
+    :param pdfname: path to the pdf file
+    :param jobs: number of worker processes used by prefetch()
+    :param cachedir: if not None, directory for the page cache
+    :param stream: if True, keep memory bounded, see above
+    """
+
+    def __init__(
+        self, pdfname: str, jobs: int = 1, cachedir: str = None, stream: bool = False
+    ) -> None:
+        self.pdfname = pdfname
+        self.jobs = jobs
+        self.stream = stream
+        self.pdf = None
+        self.pdfpages = 0
+        self.data = {}
+        self.current = None
+        # stream mode: shards extracted on demand
+        self.executor = None
+        self.shardlist = []
+        self.plan = {}
+        self.futures = {}
+        self.cachepath = None
+        if cachedir is not None:
+            self.cachepath = os.path.join(cachedir, self.digest())
+            os.makedirs(self.cachepath, exist_ok=True)
+
+    def digest(self) -> str:
+        """
+        return the cache key of the pdf file, the extracted data
+        also depends on the pdfplumber version.
+        """
+        h = hashlib.sha256()
+        with open(self.pdfname, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        h.update(pdfplumber.__version__.encode())
+        return h.hexdigest()
+
+    def cachefile(self, page_num: int) -> str:
+        return os.path.join(self.cachepath, f"{page_num + 1}.json.gz")
+
+    def load(self, page_num: int) -> dict:
+        """
+        return the cached data of page page_num, {} if not cached
+        """
+        if self.cachepath is None:
+            return {}
+        try:
+            with gzip.open(self.cachefile(page_num), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def store(self, page_num: int, data: dict) -> None:
+        """
+        write the data of page page_num into the cache
+        """
+        if self.cachepath is None:
+            return
+        name = self.cachefile(page_num)
+        with gzip.open(name + ".tmp", "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(name + ".tmp", name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.executor is not None:
+            # shutdown(cancel_futures=True) needs python >= 3.9
+            for f in self.futures.values():
+                f.cancel()
+            self.futures = {}
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.pdf is not None:
+            self.pdf.close()
+            self.pdf = None
+
+    def extract(self, page_num: int, items) -> dict:
+        """
+        extract items of page page_num in this process
+        """
+        if self.stream and self.pdfpages >= STREAM_REOPEN_PAGES:
+            # reopen the pdf only, pending shards in the workers stay
+            self.pdf.close()
+            self.pdf = None
+        if self.pdf is None:
+            self.pdf = pdfplumber.open(self.pdfname)
+            self.pdfpages = 0
+
+        page = self.pdf.pages[page_num]
+        data = extract_page(page, items)
+        if self.stream:
+            release_page(page)
+            self.pdfpages += 1
+
+        return data
+
+    def cached(self, page_num: int, items) -> bool:
+        """
+        return True if the items of page page_num are extracted already.
+
+        Without stream mode the loaded cache data is kept in self.data,
+        so the page is not loaded again when it is used. In stream mode
+        only the presence of the cache file is checked, to keep the memory
+        bounded. Items missing in a cached page are then extracted on
+        first use, see pdfpage.get().
+        """
+        if page_num in self.data:
+            return all(i in self.data[page_num] for i in items)
+        if self.cachepath is None:
+            return False
+        if self.stream:
+            return os.path.exists(self.cachefile(page_num))
+
+        return all(i in self.pagedata(page_num) for i in items)
+
+    def shards(self, ranges, items=PAGE_ITEMS) -> list:
+        """
+        split the pages in ranges, for which not all items are
+        extracted yet, into shards of contiguous pages
+
+        :param ranges: list of tuples (start_page, end_page), 1 based
+            page numbers as used in the generator configuration
+        :param items: items needed, see PAGE_ITEMS
+        :return: list of tuples (start, end) of 0 based page indexes
+        """
+        pages = sorted(
+            n
+            for n in set(n for start, end in ranges for n in range(start - 1, end))
+            if not self.cached(n, items)
+        )
+        size = max(1, -(-len(pages) // (self.jobs * 4)))
+        if self.stream:
+            size = min(size, STREAM_SHARD_PAGES)
+        shards = []
+        for n in pages:
+            if shards and shards[-1][1] == n and shards[-1][1] - shards[-1][0] < size:
+                shards[-1][1] = n + 1
+            else:
+                shards.append([n, n + 1])
+
+        return [tuple(s) for s in shards]
+
+    def prefetch(self, ranges, items=PAGE_ITEMS) -> None:
+        """
+        extract the items of all pages in ranges in worker processes.
+        Without jobs > 1 pages are extracted on first access.
+
+        :param ranges: list of tuples (start_page, end_page), 1 based
+        :param items: items to extract, see PAGE_ITEMS
+        """
+        if self.jobs <= 1:
+            return
+
+        shards = self.shards(ranges, items)
+        if len(shards) == 0:
+            return
+
+        if self.stream:
+            # extract the shards when they are needed, see fetch()
+            if self.executor is None:
+                self.executor = concurrent.futures.ProcessPoolExecutor(self.jobs)
+            for start, end in shards:
+                for n in range(start, end):
+                    self.plan[n] = len(self.shardlist)
+                self.shardlist.append((start, end, items))
+            return
+
+        with concurrent.futures.ProcessPoolExecutor(self.jobs) as ex:
+            futures = [
+                ex.submit(extract_shard, self.pdfname, start, end, items)
+                for start, end in shards
+            ]
+            # merge in page order, independent of completion order
+            for (start, end), fut in zip(shards, futures):
+                for n, data in zip(range(start, end), fut.result()):
+                    self.pagedata(n).update(data)
+                    self.store(n, self.data[n])
+
+    def submit(self, i: int) -> None:
+        if i < len(self.shardlist) and i not in self.futures:
+            start, end, items = self.shardlist[i]
+            if start in self.plan:
+                self.futures[i] = self.executor.submit(
+                    extract_shard, self.pdfname, start, end, items
+                )
+
+    def fetch(self, page_num: int) -> None:
+        """
+        stream mode: get the shard of page page_num from the workers,
+        and start extracting the following shards.
+        """
+        i = self.plan[page_num]
+        for j in range(i, i + self.jobs + 1):
+            self.submit(j)
+
+        # only keep the pages of this shard
+        self.data = {}
+        start, end, items = self.shardlist[i]
+        for n, data in zip(range(start, end), self.futures.pop(i).result()):
+            del self.plan[n]
+            self.pagedata(n).update(data)
+            self.store(n, self.data[n])
+
+    def pagedata(self, page_num: int) -> dict:
+        """
+        return the extracted data of page page_num
+        """
+        data = self.data.get(page_num)
+        if data is None:
+            data = self.load(page_num)
+            self.data[page_num] = data
+
+        return data
+
+    def __getitem__(self, page_num: int) -> pdfpage:
+        if self.stream and self.current not in [None, page_num]:
+            self.data.pop(self.current, None)
+        self.current = page_num
+
+        if page_num in self.plan:
+            self.fetch(page_num)
+
+        return pdfpage(self, page_num, self.pagedata(page_num))
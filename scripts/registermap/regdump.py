@@ -3,20 +3,36 @@
 regdump.py - A simple tool to analyze register values for a given SoC.
 
 Usage example:
-    ./regump.py -s imx8 -i ./input -o ./output -a 0x12345678 --value 0xDEADBEEF
+    ./regump.py -s imx8 -i ./input -o ./output '[{"address":"0x12345678","value":"0xDEADBEEF"}]'
+    ./regump.py -s imx8mp --regsfile - --format jsonl < board_dump.txt
+
+The registers are processed as a stream: input lines are read one by
+one, resolved to an address, decoded and written through a buffered
+writer, so also dumps with thousands of registers are decoded with
+constant memory.
 """
 
 import argparse
 import ast
+import csv
 import inspect
 import json
 import os
 import sys
 
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
-sys.path.insert(0, currentdir + "/../../../tbottest")
+# the tbottest package of this repository, if it is not installed
+sys.path.insert(0, os.path.join(currentdir, "..", ".."))
 
 from tbottest.tc.registermap import REGISTERMAP  # noqa: E402
+from tbottest.tc.registermap_xml import REGMAP_XML_SUFFIXES  # noqa: E402
+
+# suffixes of the registermap files, searched in this order, svd and
+# xml files (CMSIS-SVD, IP-XACT) are imported, see REGISTERMAP
+REGMAP_SUFFIXES = (".json",) + REGMAP_XML_SUFFIXES
+# output formats and the suffix of the result file
+OUTPUT_FORMATS = {"text": "txt", "jsonl": "jsonl", "csv": "csv"}
+CSV_COLUMNS = ["address", "value", "register", "page", "range", "field", "fieldvalue"]
 
 
 def parse_arguments():
@@ -33,7 +49,8 @@ def parse_arguments():
         "-i",
         "--input-dir",
         default="scripts/registermap",
-        help="Directory where the regsitermap json file is located",
+        help="Directory where the registermap file <soc>_registers.json "
+        "(or .svd, .xml) is located",
     )
 
     parser.add_argument(
@@ -43,15 +60,33 @@ def parse_arguments():
         help="Directory where the result will be written",
     )
 
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Result file, - for stdout. Default <output-dir>/<soc>_result.<format>",
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=OUTPUT_FORMATS.keys(),
+        default="text",
+        help="Output format, text is appended to the result file, "
+        "jsonl (one json object per register) and csv overwrite it",
+    )
+
     parser.add_argument(
         "--regsfile",
         default=None,
-        help="File with a list of registername, index, value lines",
+        help="File with a list of registername, index, value lines or "
+        "address, value lines (register dump from a board), - for stdin",
     )
 
     # One positional argument for address-value pairs
     parser.add_argument(
         "regs",
+        nargs="?",
+        default=None,
         help=(
             "JSON-like list of register dictionaries, e.g. "
             '\'[{"address":"0x30330070","value":"0x00000000"}]\''
@@ -60,14 +95,20 @@ def parse_arguments():
 
     args = parser.parse_args()
 
+    if args.regsfile is not None:
+        return args
+
+    if args.regs is None:
+        parser.error("either regs or --regsfile is required")
+
     # Parse the positional argument as Python literal or JSON
     try:
         # Try Python literal (allows single quotes)
         args.regs = ast.literal_eval(args.regs)
-    except Exception:
+    except (ValueError, SyntaxError):
         try:
             args.regs = json.loads(args.regs)
-        except Exception:
+        except ValueError:
             print("Error: Invalid format for register list.")
             print('Expected: \'[{"address":"0xADDR","value":"0xVAL"}]\'')
             sys.exit(1)
@@ -84,46 +125,210 @@ def parse_arguments():
     return args
 
 
+def read_regsfile(f):
+    """
+    yield the entries of a regsfile, one per line
+
+    Lines are "registername index value" or "address value", as
+    written by generic_machine_dump(). Empty lines and lines
+    starting with # are skipped.
+
+    :param f: open file
+    :return: generator of tuples (line number, columns)
+    """
+    for lineno, line in enumerate(f, 1):
+        cols = line.split()
+        if len(cols) == 0 or cols[0].startswith("#"):
+            continue
+        yield lineno, cols
+
+
+def resolve(regmap, entries):
+    """
+    resolve the regsfile entries into (address, value) tuples,
+    entries which can not be resolved are reported on stderr.
+    """
+    for lineno, cols in entries:
+        if len(cols) == 2:
+            yield cols[0], cols[1]
+        elif len(cols) == 3:
+            try:
+                yield regmap.registername_to_address(cols[0], cols[1]), cols[2]
+            except (RuntimeError, ValueError):
+                print(f"line {lineno}: register {cols[0]} not found!!", file=sys.stderr)
+        else:
+            print(f"line {lineno}: invalid format {' '.join(cols)}", file=sys.stderr)
+
+
+def decode(regmap, regs):
+    """
+    decode the (address, value) tuples
+
+    :return: generator of tuples (address, value, register id or None,
+        list of (range, field, value of the bits)), register id is
+        None if the address is not found in the registermap
+    """
+    for address, value in regs:
+        regid = None
+        fields = []
+        try:
+            regid = regmap.registermap_search_regid(address)
+            if regid is not None:
+                fields = regmap.registermap_decode_register(address, value)
+        except (RuntimeError, ValueError):
+            regid = None
+        if regid is None:
+            print(f"address {address} not found", file=sys.stderr)
+        yield address, value, regid, fields
+
+
+class textwriter:
+    """
+    write the decoded registers in the format of
+    REGISTERMAP.registermap_dump_register_file()
+    """
+
+    def __init__(self, f, regmap) -> None:
+        self.f = f
+        self.regmap = regmap
+
+    def write(self, address, value, regid, fields) -> None:
+        try:
+            self.f.write(self.regmap.registermap_format_register(address, value))
+        except (RuntimeError, ValueError) as e:
+            # not found registers are already reported by decode()
+            if regid is not None:
+                print(f"address {address}: {e}", file=sys.stderr)
+
+    def close(self) -> None:
+        pass
+
+
+class jsonlwriter:
+    """
+    write one json object per decoded register
+    """
+
+    def __init__(self, f, regmap) -> None:
+        self.f = f
+        self.regmap = regmap
+
+    def record(self, address, value, regid, fields) -> dict:
+        rec = {"address": address, "value": value}
+        if regid is None:
+            rec["error"] = "not found"
+            return rec
+
+        reg = self.regmap.store.register(regid)
+        rec["register"] = reg[self.regmap.get_registername_from_dict()]
+        rec["page"] = reg["page"]
+        rec["fields"] = [
+            {"range": bitrange, "field": field, "value": hex(val)}
+            for bitrange, field, val in fields
+        ]
+        return rec
+
+    def write(self, address, value, regid, fields) -> None:
+        self.f.write(json.dumps(self.record(address, value, regid, fields), ensure_ascii=False))
+        self.f.write("\n")
+
+    def close(self) -> None:
+        pass
+
+
+class csvwriter(jsonlwriter):
+    """
+    write one csv row per bitfield of the decoded registers
+    """
+
+    def __init__(self, f, regmap) -> None:
+        super().__init__(f, regmap)
+        self.csv = csv.writer(f)
+        self.csv.writerow(CSV_COLUMNS)
+
+    def write(self, address, value, regid, fields) -> None:
+        rec = self.record(address, value, regid, fields)
+        row = [address, value, rec.get("register", ""), rec.get("page", "")]
+        if not rec.get("fields"):
+            self.csv.writerow(row + ["", "", ""])
+        for fld in rec.get("fields", []):
+            self.csv.writerow(row + [fld["range"], fld["field"], fld["value"]])
+
+
+WRITERS = {"text": textwriter, "jsonl": jsonlwriter, "csv": csvwriter}
+
+
+def registermap_path(input_dir, soc) -> str:
+    """
+    return the path of the registermap of soc in input_dir, the
+    first existing file with a suffix in REGMAP_SUFFIXES, else
+    the json path
+    """
+    for suffix in REGMAP_SUFFIXES:
+        path = os.path.join(input_dir, f"{soc}_registers{suffix}")
+        if os.path.exists(path):
+            return path
+
+    return os.path.join(input_dir, f"{soc}_registers.json")
+
+
 def analyze_register(args):
     """
-    Analyze a given address and value using the SoC data.
-    For now, this function just returns a mock result.
+    Analyze the given registers using the SoC data and write
+    the result to the output file.
+
+    :return: True if all registers are found
     """
     os.makedirs(args.input_dir, exist_ok=True)
-    input_path = os.path.join(args.input_dir, f"{args.soc}_registers.json")
-    regmap = REGISTERMAP(input_path)
-    os.makedirs(args.output_dir, exist_ok=True)
-    output_path = os.path.join(args.output_dir, f"{args.soc}_result.txt")
-    if args.regsfile:
-        registers = []
-        with open(args.regsfile, "r") as f:
-            for line in f:
-                l = line.strip()
-                name = l.split(" ")[0]
-                index = l.split(" ")[1]
-                value = l.split(" ")[2]
-                try:
-                    addr = regmap.registername_to_address(name, index)
-                    #print(f'name {name} index {index} name {name} addr {addr} value {value}')
-                    registers.append({"address":addr, "value":value})
-                except:
-                    print(f'register {name} not found!!')
-                    pass
+    regmap = REGISTERMAP(registermap_path(args.input_dir, args.soc))
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_path = os.path.join(
+            args.output_dir, f"{args.soc}_result.{OUTPUT_FORMATS[args.format]}"
+        )
+
+    if args.regsfile is None:
+        regs = ((r["address"], r["value"]) for r in args.regs)
+        inf = None
     else:
-        registers = args.regs
+        inf = sys.stdin if args.regsfile == "-" else open(args.regsfile, "r")
+        regs = resolve(regmap, read_regsfile(inf))
 
-    for regs in registers:
-        try:
-            regmap.registermap_dump_register_file(output_path, regs["address"], regs["value"])
-        except:
-            print(f'address {regs["address"]} not found')
+    if output_path == "-":
+        outf = sys.stdout
+    else:
+        mode = "a" if args.format == "text" else "w"
+        outf = open(output_path, mode, encoding="utf-8", newline="", buffering=1024 * 1024)
+
+    ret = True
+    try:
+        writer = WRITERS[args.format](outf, regmap)
+        for address, value, regid, fields in decode(regmap, regs):
+            if regid is None:
+                ret = False
+            writer.write(address, value, regid, fields)
+        writer.close()
+    finally:
+        if outf is not sys.stdout:
+            outf.close()
+        if inf not in [None, sys.stdin]:
+            inf.close()
+
+    return ret
 
 
 def main():
+    """
+    :return: exit code, 1 if a register is not found
+    """
     args = parse_arguments()
 
-    analyze_register(args)
+    if not analyze_register(args):
+        return 1
+
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -2,18 +2,20 @@
 """
 nxp_imx_create_registermap.py - create a registermap in JSon format for NXP SoCs.
 
-usage: nxp_imx_create_registermap.py [-h] -s SOC
+usage: nxp_imx_create_registermap.py [-h] -s SOC [-j JOBS] [-c CACHEDIR] [--stream]
 
 example:
 
-    $ python3 nxp_imx_create_registermap.py -s imx8mp
+    $ python3 nxp_imx_create_registermap.py -s imx8mp -j 8
 """
 
 import argparse
-import pdfplumber
 import re
 import json
 
+from jsonstream import dumps_indented, jsonlistwriter
+from pdfpages import pdfpages, peak_memory
+
 
 def parse_arguments():
     """Parse and return command-line arguments."""
@@ -25,6 +27,27 @@ def parse_arguments():
         "-s", "--soc", required=True, help="Name of the SoC (example imx8mp)"
     )
 
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes extracting the pdf pages (default 1)",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--cachedir",
+        default=None,
+        help="Directory in which the text and tables of each pdf page are cached",
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Keep memory bounded, write registermaps to the output file when finished",
+    )
+
     args = parser.parse_args()
     return args
 
@@ -32,14 +55,22 @@ def parse_arguments():
 class pdf2json:
     """ """
 
-    def __init__(self, socname: str) -> None:
+    def __init__(
+        self, socname: str, jobs: int = 1, cachedir: str = None, stream: bool = False
+    ) -> None:
         self.soc = socname
+        self.jobs = jobs
+        self.cachedir = cachedir
+        self.stream = stream
+        self.output = None
+        self.writer = None
         self.page = None
         self.page_nr = None
         self.peripheralmaps = []
         self.peripheralmapranges = {"start_page": 161, "end_page": 168}
 
         self.registermaps = []
+        self.registermapnames = set()
 
         if self.soc == "stm32mp157":
             self.peripheralmapranges = {"start_page": 161, "end_page": 168}
@@ -47,6 +78,18 @@ class pdf2json:
             self.path = "/home/hs/data/Entwicklung/prozessordoku/stm32/mp15"
             self.url = "https://www.st.com/resource/en/reference_manual/DM00327659.pdf"
             self.output_file = f"{self.soc}_registers.json"
+            # pages of the supported registermaps
+            self.registermappages = {
+                "ADC registers (for each ADC)": (1577, 1610),
+                "DDRCTRL registers": (219, 302),
+                "PUBL registers": (378, 421),
+                "DTS registers": (1631, 1639),
+                "I2C registers": (2559, 2573),
+                "GPIO registers": (1078, 1092),
+                "SPI/I2S registers": (2723, 2743),
+                "SYSCFG registers": (1097, 1114),
+                "USART registers": (2626, 2670),
+            }
         else:
             raise RuntimeError(f"Soc {self.soc} not supported yet.")
 
@@ -69,7 +112,7 @@ class pdf2json:
                 self.debug(row)
 
 
-    def create_register_map(self, pdf, mapname):
+    def create_register_map(self, pages, mapname):
         #
         #   {     
         #    "mapname" : "USART registers",  # same as peripheralmap
@@ -91,45 +134,19 @@ class pdf2json:
         #  },
         #
 
-        for rm in self.registermaps:
-            if rm["mapname"] == mapname:
-                self.debug(f"registermap {mapname} already created!")
-                return
+        if mapname in self.registermapnames:
+            self.debug(f"registermap {mapname} already created!")
+            return
 
         self.debug(f"==== Create registermap {mapname} ====")
         # ToDo get rid of this
         # currently scanning the whole pdf for each register, exhausts memory
-        if mapname == "ADC registers (for each ADC)":
-            start_page = 1577
-            end_page = 1610
-        elif mapname == "DDRCTRL registers":
-            start_page = 219
-            end_page = 302
-        elif mapname == "PUBL registers":
-            start_page = 378
-            end_page = 421
-        elif mapname == "DTS registers":
-            start_page = 1631
-            end_page = 1639
-        elif mapname == "I2C registers":
-            start_page = 2559
-            end_page = 2573
-        elif mapname == "GPIO registers":
-            start_page = 1078
-            end_page = 1092
-        elif mapname == "SPI/I2S registers":
-            start_page = 2723
-            end_page = 2743
-        elif mapname == "SYSCFG registers":
-            start_page = 1097
-            end_page = 1114
-        elif mapname == "USART registers":
-            start_page = 2626
-            end_page = 2670
-        else:
+        if mapname not in self.registermappages:
             self.debug(f"==== Create registermap {mapname} not yet supported ====")
             return
 
+        start_page, end_page = self.registermappages[mapname]
+
         registers = []
         foundchapter = False
         chapter = None
@@ -145,7 +162,7 @@ class pdf2json:
         foundbits = False
 
         for page_num in range(start_page - 1, end_page):
-            self.page = pdf.pages[page_num]
+            self.page = pages[page_num]
             self.page_nr = page_num + 1
             self.debug(f"\n=== Page {self.page_nr} ===\n")
             self.debug(f"\n=== Page {self.page_nr} start with analysing text ===\n")
@@ -223,6 +240,7 @@ class pdf2json:
                                     "registers" : registers,
                                 }
                             )
+                            self.registermapnames.add(mapname)
                             return
 
                     # when we have the chapter search for registername
@@ -362,7 +380,7 @@ class pdf2json:
                     oldline = line
 
 
-    def create_register_maps(self, pdf):
+    def create_register_maps(self, pages):
         self.debug("==== create register maps ====")
         #self.debug(self.peripheralmaps)
         for regm in self.peripheralmaps:
@@ -373,9 +391,13 @@ class pdf2json:
                 continue
 
             self.debug(f"==== create register maps ==== {regm['peripheralmap']}")
-            self.create_register_map(pdf, regm['peripheralmap'])
+            self.create_register_map(pages, regm['peripheralmap'])
+            if self.writer:
+                # stream mode, write finished registermaps
+                while self.registermaps:
+                    self.writer.append(self.registermaps.pop(0))
 
-    def create_peripheral_map(self, pdf):
+    def create_peripheral_map(self, pages):
         # ['Bus', 'Boundary address', 'Size (Bytes)', 'Peripheral', 'Peripheral Register map']
         # ['Cortex-\nA7\ninternal', '0xA0026000 - 0xA0027FFF', '8KB', 'GICV', 'GIC virtual CPU interface (GICV)']
         # [None, '0xA0024000 - 0xA0025FFF', '8KB', 'GICH', 'GIC virtual interface control, common\n(GICH)']
@@ -396,7 +418,7 @@ class pdf2json:
         #  },  
         self.bus = None
         for page_num in range(self.peripheralmapranges["start_page"] - 1, self.peripheralmapranges["end_page"]):
-            self.page = pdf.pages[page_num]
+            self.page = pages[page_num]
             self.page_nr = page_num + 1
             #self.debug(f"\n=== Page {self.page_nr} === create_peripheral_map\n")
             #self.print_all_tables()
@@ -421,29 +443,52 @@ class pdf2json:
                     )
 
 
-    def handle_pdf(self, pdf):
-        self.create_peripheral_map(pdf)
-        self.create_register_maps(pdf)
+    def handle_pdf(self, pages):
+        pmr = self.peripheralmapranges
+        pages.prefetch([(pmr["start_page"], pmr["end_page"])], ["tables"])
+        self.create_peripheral_map(pages)
+        if self.stream:
+            # same format as json.dump() of result in convert()
+            self.output.write('[\n  {\n    "peripheralmaps": ')
+            self.output.write(dumps_indented(self.peripheralmaps, 2))
+            self.output.write('\n  },\n  {\n    "registermaps": ')
+            self.writer = jsonlistwriter(self.output, 2)
+
+        mapnames = set(regm["peripheralmap"] for regm in self.peripheralmaps)
+        pages.prefetch(
+            [r for m, r in self.registermappages.items() if m in mapnames], ["text"]
+        )
+        self.create_register_maps(pages)
 
     def convert(self):
-        with pdfplumber.open(self.path + "/" + self.pdfname) as pdf:
-            self.handle_pdf(pdf)
+        if self.stream:
+            self.output = open(self.output_file, "w", encoding="utf-8")
 
-        result = {"peripheralmaps":self.peripheralmaps}, {"registermaps": self.registermaps}
+        with pdfpages(self.path + "/" + self.pdfname, self.jobs, self.cachedir, self.stream) as pages:
+            self.handle_pdf(pages)
+
+        if self.stream:
+            self.writer.close()
+            self.output.write("\n  }\n]")
+            self.output.close()
+        else:
+            result = {"peripheralmaps":self.peripheralmaps}, {"registermaps": self.registermaps}
 
-        # save as JSON
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+            # save as JSON
+            with open(self.output_file, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
 
         # debug("\n=== JSON result ===")
         # debug(json.dumps(result, indent=2, ensure_ascii=False))
         self.debug(f"Result saved as {self.output_file}")
+        mem, workermem = peak_memory()
+        self.debug(f"peak memory {mem} kB, worker processes {workermem} kB")
 
 
 def main():
     args = parse_arguments()
 
-    regmap = pdf2json(args.soc)
+    regmap = pdf2json(args.soc, args.jobs, args.cachedir, args.stream)
     regmap.convert()
 
 
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+tests for regdump.py, run with
+
+    python3 -m pytest scripts/registermap/test_regdump.py
+"""
+
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+currentdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, currentdir)
+sys.path.insert(0, os.path.join(currentdir, "..", ".."))
+
+import regdump  # noqa: E402
+from tbottest.tc.registermap import REGISTERMAP  # noqa: E402
+
+UNKNOWN = "0x12345678"
+USART_CR1 = "0x4000e000"
+GPIOX_MODER = "0x50002000"
+
+
+class TestDecode(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.regmap = REGISTERMAP(os.path.join(currentdir, "stm32mp157_registers.json"))
+
+    def dump(self, regs):
+        f = io.StringIO()
+        writer = regdump.jsonlwriter(f, self.regmap)
+        for address, value, regid, fields in regdump.decode(self.regmap, regs):
+            writer.write(address, value, regid, fields)
+        return [json.loads(line) for line in f.getvalue().splitlines()]
+
+    def test_unknown_first(self):
+        recs = self.dump([(UNKNOWN, "0x1"), (USART_CR1, "0x1")])
+        self.assertEqual(recs[0], {"address": UNKNOWN, "value": "0x1", "error": "not found"})
+        self.assertEqual(recs[1]["register"], "USART_CR1")
+
+    def test_mixed_known_unknown(self):
+        regs = [(USART_CR1, "0x1"), (UNKNOWN, "0x1"), (GPIOX_MODER, "0x5"), (UNKNOWN, "0x2")]
+        recs = self.dump(regs)
+        self.assertEqual(len(recs), 4)
+        self.assertEqual(recs[0]["register"], "USART_CR1")
+        # unknown registers must not get the fields of the register before
+        self.assertEqual(recs[1], {"address": UNKNOWN, "value": "0x1", "error": "not found"})
+        self.assertEqual(recs[2]["register"], "GPIOx_MODER")
+        self.assertEqual(recs[2]["fields"], [{"range": "31:0", "field": "MODER[15:0][1:0]", "value": "0x5"}])
+        self.assertEqual(recs[3], {"address": UNKNOWN, "value": "0x2", "error": "not found"})
+
+    def test_unknown_has_no_fields(self):
+        regs = [(UNKNOWN, "0x1"), (USART_CR1, "0x1"), (UNKNOWN, "0x2")]
+        decoded = list(regdump.decode(self.regmap, regs))
+        self.assertIsNone(decoded[0][2])
+        self.assertEqual(decoded[0][3], [])
+        self.assertIsNotNone(decoded[1][2])
+        self.assertNotEqual(decoded[1][3], [])
+        self.assertIsNone(decoded[2][2])
+        self.assertEqual(decoded[2][3], [])
+
+
+
+class TestMain(unittest.TestCase):
+    def run_regdump(self, *args):
+        return subprocess.run(
+            [sys.executable, os.path.join(currentdir, "regdump.py"), "-s", "stm32mp157",
+             "-i", currentdir, "--output", "-", "-f", "jsonl"] + list(args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+
+    def test_stdout_is_jsonl(self):
+        p = self.run_regdump(f'[{{"address":"{USART_CR1}","value":"0x1"}}]')
+        self.assertEqual(p.returncode, 0, p.stderr)
+        recs = [json.loads(line) for line in p.stdout.splitlines()]
+        self.assertEqual([r["register"] for r in recs], ["USART_CR1"])
+
+    def test_exitcode_not_found(self):
+        p = self.run_regdump(f'[{{"address":"{UNKNOWN}","value":"0x1"}}]')
+        self.assertEqual(p.returncode, 1)
+        self.assertEqual(json.loads(p.stdout)["error"], "not found")
+
+    def test_registermap_path(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.assertEqual(
+                regdump.registermap_path(d, "soc"), os.path.join(d, "soc_registers.json")
+            )
+            svd = os.path.join(d, "soc_registers.svd")
+            shutil.copy(os.devnull, svd)
+            self.assertEqual(regdump.registermap_path(d, "soc"), svd)
+
+
+if __name__ == "__main__":
+    unittest.main()
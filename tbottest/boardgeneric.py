@@ -1,5 +1,4 @@
 import inspect
-import time
 import re
 import tbot
 from tbot.machine import board, linux, connector, channel
@@ -13,6 +12,14 @@ import tbottest.initconfig as ini
 from tbottest.labgeneric import cfgt as cfglab
 from tbottest.dynamicimport import get_boardmodule_import
 from tbottest.dynamicimport import get_boardmodulepath_import
+from tbottest.common.sshmux import sshmux_lab_options
+from tbottest.common.cmdstats import CmdStats
+from tbottest.common.trace import Trace
+from tbottest.common.trace import trace_instant
+from tbottest.common.trace import trace_sleep
+from tbottest.common.utils import bootlog_limit
+from tbottest.common.utils import machine_capability
+from tbottest.common.utils import machine_capability_reset
 
 try:
     set_ub_board_specific = getattr(get_boardmodule_import(), "set_ub_board_specific")
@@ -77,6 +84,7 @@ class GenericBoardConfig:
     iperf = eval(cfg.get_config("iperf", "[]"))
     ping = eval(cfg.get_config("ping", "[]"))
     regdump = eval(cfg.get_config("regdump", "[]"))
+    regdump_peripherals = eval(cfg.get_config("regdump_peripherals", "[]"))
 
     sensors = eval(cfg.get_config("sensors", "[]"))
 
@@ -122,7 +130,7 @@ else:
 
 
 class GenericUBoot(
-    board.Connector, board.UBootAutobootInterceptSimple, board.UBootShell
+    board.Connector, board.UBootAutobootInterceptSimple, Trace, CmdStats, board.UBootShell
 ):  # noqa: E501
     name = f"{ini.generic_get_boardname()}-uboot"
     cfgp = cfg
@@ -170,6 +178,8 @@ class GenericUBoot(
         return eval(self.cfgp.get_config("uboot_death_strings", "[]"))
 
     def init(self) -> None:
+        # keep only the end of the boot log in memory
+        bootlog_limit(self)
         if "uboot_no_env_set" in tbot.flags:
             return
 
@@ -214,7 +224,7 @@ def add_death_strings(ch):
 
 
 class GenericLinuxBoot(
-    board.LinuxUbootConnector, board.LinuxBootLogin, BOARD_LINUX_SHELL
+    board.LinuxUbootConnector, board.LinuxBootLogin, Trace, CmdStats, BOARD_LINUX_SHELL
 ):
     name = f"{ini.generic_get_boardname()}-linux"
 
@@ -270,6 +280,7 @@ class GenericLinuxBoot(
         return ch
 
     def do_boot(self, ub: board.UBootShell) -> channel.Channel:
+        trace_instant("boot linux", "boot")
         ch = None
         for f in tbot.flags:
             if "bootcmd" in f:
@@ -298,6 +309,10 @@ class GenericLinuxBoot(
         return linux.Workdir.static(self, "/tmp")
 
     def init(self) -> None:
+        trace_instant("linux login done", "boot")
+        bootlog_limit(self)
+        # new boot session, drop cached capability probes
+        machine_capability_reset(self)
         # Disable all clutter on the console
         self.exec("sysctl", "kernel.printk=1 1 1 1")
         if "linux_no_cmd_after_login" in tbot.flags:
@@ -307,7 +322,7 @@ class GenericLinuxBoot(
             for dev in ethdevices:
                 ethcfg = cfglab.ethdevices[ini.generic_get_boardname()][dev]
                 # try with ip
-                ret, out = self.exec("ip", "--help")
+                ret = machine_capability(self, "ip", lambda: self.exec("ip", "--help")[0])
                 if "useifconfig" in tbot.flags:
                     ret = 0
 
@@ -349,7 +364,7 @@ class GenericLinuxBoot(
 
             lx_init_timeout = eval(self.cfgp.get_config("linux_init_timeout", "None"))
             if lx_init_timeout != "None":
-                time.sleep(float(lx_init_timeout))
+                trace_sleep(float(lx_init_timeout), "linux_init_timeout")
 
         lx_init = eval(self.cfgp.get_config("linux_init", "[]"))
         for cmd in lx_init:
@@ -364,7 +379,7 @@ class GenericLinuxBoot(
                 self.exec(linux.Raw(cmd["cmd"]))
 
 
-class GenericLinuxBootwithoutUBootwithoutLogin(board.Connector, BOARD_LINUX_SHELL):
+class GenericLinuxBootwithoutUBootwithoutLogin(board.Connector, Trace, CmdStats, BOARD_LINUX_SHELL):
     """
     removed init function as we have an already running board, so we
     do not want to execute any init tasks.
@@ -388,7 +403,7 @@ class GenericLinuxBootwithoutUBootwithoutLogin(board.Connector, BOARD_LINUX_SHEL
 
 
 class GenericLinuxBootwithoutUBoot(
-    board.Connector, board.LinuxBootLogin, BOARD_LINUX_SHELL
+    board.Connector, board.LinuxBootLogin, Trace, CmdStats, BOARD_LINUX_SHELL
 ):
     name = f"{ini.generic_get_boardname()}-linux"
 
@@ -411,6 +426,9 @@ class GenericLinuxBootwithoutUBoot(
 
     def init(self) -> None:
         add_death_strings(self.ch)
+        bootlog_limit(self)
+        # new boot session, drop cached capability probes
+        machine_capability_reset(self)
         # Disable all clutter on the console
         self.exec("sysctl", "kernel.printk=1 1 1 1")
         if "noboardethinit" in tbot.flags:
@@ -430,15 +448,16 @@ class GenericLinuxBootwithoutUBoot(
             )
 
 
-class GenericLinuxAlwaysOn(board.Connector, BOARD_LINUX_SHELL):
+class GenericLinuxAlwaysOn(board.Connector, Trace, CmdStats, BOARD_LINUX_SHELL):
     name = f"{ini.generic_get_boardname()}-linux-on"
 
     cfgp = cfg
 
     def init(self) -> None:
+        # new boot session, drop cached capability probes
+        machine_capability_reset(self)
         # Disable all clutter on the console
         # self.exec0("sysctl", "kernel.printk=1 1 1 1")
-        pass
 
     @property
     def workdir(self) -> "linux.Path[GenericLinuxAlwaysOn]":
@@ -467,7 +486,7 @@ if "nouboot" in tbot.flags:
         GenericLinux = GenericLinuxBootwithoutUBoot
 
 
-class GenericSSH(connector.SSHConnector, linux.Ash):
+class GenericSSH(connector.SSHConnector, Trace, CmdStats, linux.Ash):
     hostname: str = None  # type: ignore
     username = "root"
     ignore_hostkey = True
@@ -487,9 +506,15 @@ class GenericSSH(connector.SSHConnector, linux.Ash):
             )
         assert match is not None, f"invalid output from 'ip route' {output}"
         self.hostname = match.group("ipaddr")
+        # ssh runs on the lab host, so the control sockets are there
+        self.sshmux = sshmux_lab_options(lh)
 
         super().__init__(lh)
 
+    @property
+    def ssh_config(self) -> List[str]:
+        return self.sshmux
+
     @property
     def workdir(self) -> "linux.Path[GenericSSH]":
         return linux.Workdir.static(self, "/run/tbot-testdata")
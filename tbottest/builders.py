@@ -4,13 +4,16 @@ import typing
 import pathlib
 import tbot
 from tbot.machine import linux, connector
+from tbottest.common.sshmux import sshmux_local_options
+from tbottest.common.cmdstats import CmdStats
+from tbottest.common.trace import Trace
 
 cfgt = ini.IniTBotConfig()
 
 _INIT_CACHE: typing.Dict[str, bool] = {}
 
 
-class genericbuilder(connector.SSHConnector, linux.Bash, linux.Builder):
+class genericbuilder(connector.SSHConnector, Trace, CmdStats, linux.Bash, linux.Builder):
     def builder_get_sectionname() -> str:
         for f in tbot.flags:
             if "buildername" in f:
@@ -54,7 +57,7 @@ class genericbuilder(connector.SSHConnector, linux.Bash, linux.Builder):
             except:  # noqa: E722
                 pass
 
-        return args
+        return args + sshmux_local_options(self.name)
 
     @property
     def port(self) -> int:
@@ -100,7 +103,7 @@ class genericbuilder(connector.SSHConnector, linux.Bash, linux.Builder):
         raise RuntimeError("toolchains not implemented yet, please add support!")
 
 
-class genericbuilderlocal(connector.SubprocessConnector, linux.Bash, linux.Builder):
+class genericbuilderlocal(connector.SubprocessConnector, Trace, CmdStats, linux.Bash, linux.Builder):
     sn = "BUILDHOST_local"
     try:
         name = cfgt.config_parser.get(sn, "name")
@@ -2,6 +2,10 @@ import tbot
 from tbot.context import Optional
 from tbot.machine import linux
 import tbottest.initconfig as ini
+from tbottest.labagent import lab_exec0
+from tbottest.labagent import lab_is_file
+from tbottest.labagent import lab_read_text
+from tbottest.labagent import lab_write_text
 
 
 def lab_get_lockname(lab) -> linux.path.Path:
@@ -33,8 +37,8 @@ def lab_get_lock_info(
             lab = cx.request(tbot.role.LabHost)
 
         lockfile = lab_get_lockname(lab)
-        if lockfile.is_file():
-            lockid = lab.exec0("cat", lockfile)
+        if lab_is_file(lab, lockfile):
+            lockid = lab_read_text(lab, lockfile)
             return 0, lockid.strip()
         else:
             return 1, ""
@@ -80,7 +84,7 @@ def lab_get_lock(
 
         if ret == 1:
             # no lockid active, set it
-            lab.exec0("echo", lockid, linux.Raw(">"), lockfile)
+            lab_write_text(lab, lockfile, f"{lockid}\n")
             return 0, lockid
         else:
             # check lockid
@@ -128,4 +132,4 @@ def lab_rm_lock(
             tbot.log.message(tbot.log.c(errstr).red)
             raise RuntimeError("errstr")
 
-        lab.exec0("rm", lockfile)
+        lab_exec0(lab, "rm", lockfile)
@@ -0,0 +1,205 @@
+import heapq
+import json
+import os
+import sys
+import time
+import tbot
+
+__all__ = (
+    "CmdStats",
+    "cmdstats_enabled",
+    "cmdstats_report",
+    "cmdstats_dump",
+)
+
+# per command latency instrumentation
+#
+# If tbot is started with flag "cmdstats" (or "cmdstats:<file>"), every
+# exec()/exec0()/test() call on the tbottest machines (which have the
+# CmdStats mixin) records the wall time, the bytes sent and received,
+# the machine and the calling testcase.
+#
+# At the end of the run (docgenevent.tbot_end) a json report with a
+# latency histogram per machine and the CMDSTATS_TOPN slowest commands
+# is written to <file>, default is the tbot logfile name with suffix
+# "-cmdstats.json" or CMDSTATS_FILE if tbot does not write a logfile.
+CMDSTATS_FILE = "tbot-cmdstats.json"
+CMDSTATS_TOPN = 20
+# upper bounds of the histogram buckets in seconds, the last bucket
+# collects all slower commands
+CMDSTATS_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+# modules, whose frames are skipped when searching the calling
+# testcase: tbot itself and the machine mixins, which wrap exec()
+CMDSTATS_SKIP_MODULES = [
+    "tbot",
+    "tbottest.common.cmdstats",
+    "tbottest.common.trace",
+]
+
+# machine name -> statistic of this machine
+_MACHINES: dict = {}
+# heap of (duration, seq, record) with the slowest commands
+_TOP: list = []
+_SEQ = 0
+
+
+def cmdstats_enabled() -> bool:
+    """
+    return True if the command latency instrumentation is enabled
+    """
+    for f in tbot.flags:
+        if f == "cmdstats" or f.startswith("cmdstats:"):
+            return True
+
+    return False
+
+
+def _caller() -> str:
+    """
+    return the name of the first function on the stack, which is not
+    part of a module in CMDSTATS_SKIP_MODULES, this is the testcase,
+    which called exec()
+    """
+    f = sys._getframe(2)
+    while f is not None:
+        mod = f.f_globals.get("__name__", "")
+        if not any(mod == m or mod.startswith(m + ".") for m in CMDSTATS_SKIP_MODULES):
+            return f"{mod}.{f.f_code.co_name}"
+        f = f.f_back
+
+    return "unknown"
+
+
+def _record(machine: str, cmd: str, duration: float, out: str, retcode) -> None:
+    global _SEQ
+
+    st = _MACHINES.get(machine)
+    if st is None:
+        st = {
+            "count": 0,
+            "total": 0.0,
+            "min": None,
+            "max": 0.0,
+            "bytes_out": 0,
+            "bytes_in": 0,
+            "histogram": [0] * (len(CMDSTATS_BUCKETS) + 1),
+            "testcases": {},
+        }
+        _MACHINES[machine] = st
+
+    testcase = _caller()
+    st["count"] += 1
+    st["total"] += duration
+    st["min"] = duration if st["min"] is None else min(st["min"], duration)
+    st["max"] = max(st["max"], duration)
+    st["bytes_out"] += len(cmd) + 1
+    st["bytes_in"] += len(out)
+    i = 0
+    while i < len(CMDSTATS_BUCKETS) and duration > CMDSTATS_BUCKETS[i]:
+        i += 1
+    st["histogram"][i] += 1
+    tc = st["testcases"].setdefault(testcase, [0, 0.0])
+    tc[0] += 1
+    tc[1] += duration
+
+    # keep only the slowest commands, so memory does not grow
+    _SEQ += 1
+    rec = {
+        "machine": machine,
+        "testcase": testcase,
+        "cmd": cmd,
+        "duration": round(duration, 6),
+        "retcode": retcode,
+        "bytes_out": len(cmd) + 1,
+        "bytes_in": len(out),
+    }
+    if len(_TOP) < CMDSTATS_TOPN:
+        heapq.heappush(_TOP, (duration, _SEQ, rec))
+    elif duration > _TOP[0][0]:
+        heapq.heapreplace(_TOP, (duration, _SEQ, rec))
+
+
+class CmdStats:
+    """
+    mixin for tbot shell machines, which records the latency of
+    each command, if flag "cmdstats" is set.
+
+    Add it to the bases before the shell class, for example:
+
+    .. code-block:: python
+
+        class GenericLab(CON, CmdStats, LAB_LINUX_SHELL, linux.Lab, linux.Builder):
+
+    exec0() and test() call exec(), so they are recorded too.
+    """
+
+    def exec(self, *args):
+        if not cmdstats_enabled():
+            return super().exec(*args)
+
+        cmd = self.escape(*args)
+        start = time.monotonic()
+        retcode, out = super().exec(*args)
+        _record(self.name, cmd, time.monotonic() - start, out, retcode)
+        return retcode, out
+
+
+def cmdstats_report() -> dict:
+    """
+    return the command latency statistic collected so far
+
+    :return: dict with keys "buckets" (upper bounds of the histogram
+        buckets in seconds), "machines" (statistic per machine name)
+        and "slowest" (list of the slowest commands, slowest first)
+    """
+    machines = {}
+    for name, st in _MACHINES.items():
+        m = dict(st)
+        m["mean"] = st["total"] / st["count"]
+        m["testcases"] = {
+            tc: {"count": v[0], "total": round(v[1], 6)}
+            for tc, v in sorted(st["testcases"].items(), key=lambda i: -i[1][1])
+        }
+        machines[name] = m
+
+    return {
+        "buckets": CMDSTATS_BUCKETS + ["inf"],
+        "machines": machines,
+        "slowest": [rec for _, _, rec in sorted(_TOP, key=lambda i: -i[0])],
+    }
+
+
+def cmdstats_dump(logfile: str = None) -> str:
+    """
+    write the command latency report as json and log a short summary
+
+    :param logfile: name of the tbot logfile, the report is written
+        next to it
+    :return: name of the report file, None if instrumentation is
+        disabled or no command was recorded
+    """
+    if not cmdstats_enabled() or len(_MACHINES) == 0:
+        return None
+
+    filename = None
+    for f in tbot.flags:
+        if f.startswith("cmdstats:"):
+            filename = f.split(":", 1)[1]
+    if filename is None:
+        if logfile is not None:
+            filename = os.path.splitext(logfile)[0] + "-cmdstats.json"
+        else:
+            filename = CMDSTATS_FILE
+
+    report = cmdstats_report()
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, m in report["machines"].items():
+        tbot.log.message(
+            f"cmdstats {name}: {m['count']} commands {m['total']:.3f}s "
+            f"(mean {m['mean']:.3f}s max {m['max']:.3f}s)"
+        )
+    tbot.log.message(f"Command statistic written to {filename!r}")
+    return filename
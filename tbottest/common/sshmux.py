@@ -0,0 +1,114 @@
+import os
+import tbot
+
+from tbottest.common.utils import machine_capability
+
+# ssh connection multiplexing
+#
+# If tbot is started with flag "sshmux" (or "sshmux:<time>"), ssh
+# connections use ControlMaster/ControlPersist: the first connection
+# to a host becomes the master, all further ssh and scp calls to the
+# same host reuse it without a new handshake. The master is kept
+# alive for <time> (ssh ControlPersist format) after the last
+# connection closed, default SSHMUX_PERSIST.
+#
+# Connections started on the tbot host use the socket directory
+# ~/.ssh/tbot-mux/<name>, connections started on the lab host (to
+# the board) use <lab tmpdir>/sshmux.
+SSHMUX_PERSIST = "10m"
+
+
+def sshmux_persist() -> str:
+    """
+    return the ControlPersist time, None if multiplexing is disabled
+    """
+    for f in tbot.flags:
+        if f == "sshmux":
+            return SSHMUX_PERSIST
+        if f.startswith("sshmux:"):
+            return f.split(":", 1)[1]
+
+    return None
+
+
+def sshmux_options(socketdir: str) -> list:
+    """
+    return the ssh options for multiplexing with sockets in socketdir,
+    as used in ssh_config of tbot SSHConnector machines.
+
+    :param socketdir: directory for the control sockets
+    :return: list of ssh options, empty if multiplexing is disabled
+    """
+    persist = sshmux_persist()
+    if persist is None:
+        return []
+
+    # %C is a hash of local host, remote host, port and user, so the
+    # socket path stays short
+    return [
+        "ControlMaster=auto",
+        f"ControlPath={socketdir}/%C",
+        f"ControlPersist={persist}",
+    ]
+
+
+def sshmux_local_options(name: str) -> list:
+    """
+    return the ssh options for multiplexing connections started on
+    the tbot host
+
+    :param name: name of the lab or build host, each gets its own
+        socket directory
+    """
+    if sshmux_persist() is None:
+        return []
+
+    socketdir = os.path.expanduser(f"~/.ssh/tbot-mux/{name}")
+    os.makedirs(socketdir, mode=0o700, exist_ok=True)
+    return sshmux_options(socketdir)
+
+
+def sshmux_lab_options(lab) -> list:
+    """
+    return the ssh options for multiplexing connections started on
+    the lab host, for example to the board
+
+    :param lab: lab host machine
+    """
+    if sshmux_persist() is None:
+        return []
+
+    def probe():
+        socketdir = lab.tmpdir() / "sshmux"
+        lab.exec0("mkdir", "-p", "-m", "700", socketdir)
+        return socketdir._local_str()
+
+    return sshmux_options(machine_capability(lab, "sshmuxdir", probe))
+
+
+def sshmux_lab_args(lab) -> list:
+    """
+    return the multiplexing options as command line arguments
+    for ssh or scp started on the lab host
+
+    :param lab: lab host machine
+    """
+    args = []
+    for o in sshmux_lab_options(lab):
+        args += ["-o", o]
+
+    return args
+
+
+def sshmux_local_args(name: str) -> list:
+    """
+    return the multiplexing options as command line arguments
+    for ssh or scp started on the tbot host
+
+    :param name: name of the lab or build host
+    """
+    args = []
+    for o in sshmux_local_options(name):
+        args += ["-o", o]
+
+    return args
@@ -0,0 +1,184 @@
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tbot
+
+__all__ = (
+    "TcProfile",
+    "profile_enabled",
+    "profile_dir",
+    "profile_install",
+)
+
+# testcase profiling
+#
+# A profiled testcase runs under cProfile and a sampling profiler,
+# which records the python stack of the testcase thread every
+# PROFILE_INTERVAL seconds. Into the results directory (flag
+# "profile:<dir>", default PROFILE_DIR) the following files are
+# written:
+#
+# <testcase>-<n>.prof       cProfile statistic, use snakeviz or
+#                           python -m pstats to view it
+# <testcase>-<n>.collapsed  collapsed stacks of the sampler, use
+#                           flamegraph.pl or speedscope to view it
+# summary.jsonl             one line per profiled testcase with
+#                           wall and cpu time
+#
+# The wall time minus the cpu time is mostly time tbot waits for the
+# target, the flamegraph shows this in the channel read functions.
+PROFILE_DIR = "results/profile"
+PROFILE_INTERVAL = 0.005
+
+_LOCAL = threading.local()
+_LOCK = threading.Lock()
+_COUNT: dict = {}
+_HOOKED = False
+
+
+def profile_enabled() -> bool:
+    """
+    return True if all testcases should be profiled
+    """
+    for f in tbot.flags:
+        if f == "profile" or f.startswith("profile:"):
+            return True
+
+    return False
+
+
+def profile_dir() -> str:
+    """
+    return the directory for the profile results
+    """
+    for f in tbot.flags:
+        if f.startswith("profile:"):
+            return f.split(":", 1)[1]
+
+    return PROFILE_DIR
+
+
+def _frame_name(f) -> str:
+    co = f.f_code
+    # ";" separates the frames in collapsed stack format
+    return f"{co.co_name} ({os.path.basename(co.co_filename)}:{co.co_firstlineno})".replace(";", ",")
+
+
+class TcProfile:
+    """
+    profile one testcase, see tbottest.decorators.tbot_profile
+
+    :param name: name of the testcase, used for the result files
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = re.sub(r"[^\w.-]", "_", name)
+        self.prof = cProfile.Profile()
+        self.profiling = False
+        self.stacks: dict = {}
+        self.tid = threading.get_ident()
+        self.done = threading.Event()
+        self.sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self) -> None:
+        while not self.done.wait(PROFILE_INTERVAL):
+            f = sys._current_frames().get(self.tid)
+            stack = []
+            while f is not None:
+                stack.append(_frame_name(f))
+                f = f.f_back
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def start(self) -> None:
+        self.wall = time.monotonic()
+        self.cpu = time.thread_time()
+        self.sampler.start()
+        try:
+            self.prof.enable()
+            self.profiling = True
+        except ValueError:
+            # only one cProfile can run at once (python >= 3.12)
+            tbot.log.message(
+                tbot.log.c(f"profile {self.name}: cProfile busy, only sampling").yellow
+            )
+
+    def stop(self) -> None:
+        if self.profiling:
+            self.prof.disable()
+        wall = time.monotonic() - self.wall
+        cpu = time.thread_time() - self.cpu
+        self.done.set()
+        self.sampler.join()
+
+        outdir = profile_dir()
+        os.makedirs(outdir, exist_ok=True)
+        with _LOCK:
+            n = _COUNT.get(self.name, 0) + 1
+            _COUNT[self.name] = n
+        base = os.path.join(outdir, f"{self.name}-{n}")
+        if self.profiling:
+            self.prof.dump_stats(f"{base}.prof")
+        with open(f"{base}.collapsed", "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        with _LOCK:
+            with open(os.path.join(outdir, "summary.jsonl"), "a") as f:
+                rec = {"testcase": self.name, "run": n, "wall": round(wall, 6), "cpu": round(cpu, 6)}
+                f.write(json.dumps(rec) + "\n")
+
+        tbot.log.message(
+            f"profile {self.name}: wall {wall:.3f}s cpu {cpu:.3f}s, written to {base}.*"
+        )
+
+    def __enter__(self) -> "TcProfile":
+        # nested testcases are part of the profile of the outer one
+        depth = getattr(_LOCAL, "depth", 0)
+        _LOCAL.depth = depth + 1
+        self.outer = depth == 0
+        if self.outer:
+            self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        _LOCAL.depth -= 1
+        if self.outer:
+            self.stop()
+
+
+def profile_install() -> None:
+    """
+    if flag "profile" is set, hook into the tbot testcase events, so
+    each testcase (the outermost, if they are nested) is profiled.
+    Called from docgenevent.tbot_start.
+    """
+    global _HOOKED
+
+    if not profile_enabled() or _HOOKED:
+        return
+
+    _HOOKED = True
+    tc_begin = tbot.log_event.testcase_begin
+    tc_end = tbot.log_event.testcase_end
+
+    def testcase_begin(name, *args, **kwargs):
+        ret = tc_begin(name, *args, **kwargs)
+        stack = getattr(_LOCAL, "profiles", [])
+        _LOCAL.profiles = stack
+        p = TcProfile(name)
+        p.__enter__()
+        stack.append(p)
+        return ret
+
+    def testcase_end(name, *args, **kwargs):
+        stack = getattr(_LOCAL, "profiles", [])
+        if stack:
+            stack.pop().__exit__(None, None, None)
+        return tc_end(name, *args, **kwargs)
+
+    tbot.log_event.testcase_begin = testcase_begin
+    tbot.log_event.testcase_end = testcase_end
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+tests for cmdstats.py, run with
+
+    python3 -m pytest tbottest/common/test_cmdstats.py
+"""
+
+import time
+import unittest
+from unittest import mock
+
+try:
+    import tbot
+except ImportError:
+    raise unittest.SkipTest("tbot not installed")
+
+from tbottest.common import cmdstats  # noqa: E402
+from tbottest.common import trace  # noqa: E402
+from tbottest.common.cmdstats import CmdStats  # noqa: E402
+from tbottest.common.trace import Trace  # noqa: E402
+
+
+class Shell:
+    name = "lab"
+
+    def escape(self, *args):
+        return " ".join(args)
+
+    def exec(self, *args):
+        return 0, "output\n"
+
+
+class TraceCmdStatsMachine(Trace, CmdStats, Shell):
+    pass
+
+
+class CmdStatsMachine(CmdStats, Shell):
+    pass
+
+
+def tc_with_trace(m):
+    m.exec("uname", "-a")
+    m.exec("ls")
+
+
+def tc_without_trace(m):
+    m.exec("ls")
+
+
+class TestCaller(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        patches = [
+            mock.patch.object(tbot, "flags", {"trace", "cmdstats"}),
+            mock.patch.dict(cmdstats._MACHINES, clear=True),
+            mock.patch.object(cmdstats, "_TOP", []),
+            # do not hook into tbot and do not write a trace file
+            mock.patch.object(trace, "_HOOKED", True),
+            mock.patch.object(trace, "_T0", time.monotonic()),
+            mock.patch.object(trace, "_write", self.events.append),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def recorded(self):
+        return cmdstats.cmdstats_report()["machines"]["lab"]["testcases"]
+
+    def test_trace_and_cmdstats(self):
+        tc_with_trace(TraceCmdStatsMachine())
+        self.assertEqual(
+            self.recorded(), {f"{__name__}.tc_with_trace": {"count": 2, "total": mock.ANY}}
+        )
+        # the commands are in the trace too
+        self.assertEqual([ev["name"] for ev in self.events], ["uname -a", "ls"])
+
+    def test_cmdstats_only(self):
+        tc_without_trace(CmdStatsMachine())
+        self.assertEqual(list(self.recorded()), [f"{__name__}.tc_without_trace"])
+
+
+if __name__ == "__main__":
+    unittest.main()
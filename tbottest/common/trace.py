@@ -0,0 +1,238 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import tbot
+
+__all__ = (
+    "Trace",
+    "TracePower",
+    "trace_enabled",
+    "trace_install",
+    "trace_span",
+    "trace_instant",
+    "trace_sleep",
+    "trace_dump",
+)
+
+# timeline trace in Chrome trace / Perfetto json format
+#
+# If tbot is started with flag "trace" (or "trace:<file>"), nested spans
+# for testcases, machine acquisition, power on/off, boot phases, each
+# exec() and the explicit sleeps in tbottest helpers (trace_sleep()) are
+# written to a trace file, which can be opened with chrome://tracing or
+# https://ui.perfetto.dev
+#
+# Default file is the tbot logfile name with suffix "-trace.json" or
+# TRACE_FILE if tbot does not write a logfile. Events are written
+# directly to the file, so the trace does not use memory while tbot
+# runs.
+TRACE_FILE = "tbot-trace.json"
+
+_LOCK = threading.Lock()
+_FILE = None
+_T0 = None
+_HOOKED = False
+_DONE = False
+
+
+def trace_enabled() -> bool:
+    """
+    return True if the timeline trace is enabled
+    """
+    for f in tbot.flags:
+        if f == "trace" or f.startswith("trace:"):
+            return True
+
+    return False
+
+
+def _filename() -> str:
+    for f in tbot.flags:
+        if f.startswith("trace:"):
+            return f.split(":", 1)[1]
+
+    if tbot.log.LOGFILE is not None:
+        return os.path.splitext(tbot.log.LOGFILE.name)[0] + "-trace.json"
+
+    return TRACE_FILE
+
+
+def _now() -> float:
+    """
+    return the trace timestamp in microseconds
+    """
+    return (time.monotonic() - _T0) * 1e6
+
+
+def _write(ev: dict) -> None:
+    global _FILE
+
+    with _LOCK:
+        if _DONE:
+            # trace file is already closed at the end of the run
+            return
+        if _FILE is None:
+            _FILE = open(_filename(), "w")
+            # chrome trace format allows a missing closing bracket,
+            # so the trace is usable, even if tbot crashes
+            _FILE.write("[\n")
+            _FILE.write(
+                json.dumps(
+                    {
+                        "name": "process_name",
+                        "ph": "M",
+                        "pid": os.getpid(),
+                        "args": {"name": "tbot"},
+                    }
+                )
+            )
+        ev["pid"] = os.getpid()
+        ev["tid"] = threading.get_ident()
+        _FILE.write(",\n")
+        _FILE.write(json.dumps(ev, default=str))
+
+
+def trace_install() -> None:
+    """
+    hook into the tbot testcase events, so each testcase is a span in
+    the trace. Called from docgenevent.tbot_start, it does nothing if
+    the trace is disabled.
+    """
+    global _HOOKED, _T0
+
+    if not trace_enabled() or _HOOKED:
+        return
+
+    _HOOKED = True
+    _T0 = time.monotonic()
+    tc_begin = tbot.log_event.testcase_begin
+    tc_end = tbot.log_event.testcase_end
+
+    def testcase_begin(name, *args, **kwargs):
+        _write({"name": name, "cat": "testcase", "ph": "B", "ts": _now()})
+        return tc_begin(name, *args, **kwargs)
+
+    def testcase_end(name, *args, **kwargs):
+        ret = tc_end(name, *args, **kwargs)
+        _write({"name": name, "cat": "testcase", "ph": "E", "ts": _now()})
+        return ret
+
+    tbot.log_event.testcase_begin = testcase_begin
+    tbot.log_event.testcase_end = testcase_end
+
+
+@contextlib.contextmanager
+def trace_span(name: str, cat: str, **args):
+    """
+    trace the code inside the with block as span name
+
+    .. code-block:: python
+
+        with trace_span("flash image", "flash", image=img):
+            ...
+
+    :param name: name of the span
+    :param cat: category of the span, for example "exec", "sleep"
+    :param args: additional info, shown in the trace viewer
+    """
+    if not trace_enabled():
+        yield
+        return
+
+    trace_install()
+    start = _now()
+    try:
+        yield
+    finally:
+        _write({"name": name, "cat": cat, "ph": "X", "ts": start, "dur": _now() - start, "args": args})
+
+
+def trace_instant(name: str, cat: str, **args) -> None:
+    """
+    mark a point in time in the trace, for example a boot phase
+
+    :param name: name of the event
+    :param cat: category of the event
+    :param args: additional info, shown in the trace viewer
+    """
+    if not trace_enabled():
+        return
+
+    trace_install()
+    _write({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": _now(), "args": args})
+
+
+def trace_sleep(seconds: float, name: str = "sleep") -> None:
+    """
+    time.sleep(seconds), which is shown as span in the trace, so idle
+    waits are visible
+
+    :param seconds: seconds to sleep
+    :param name: name of the span, for example what we wait for
+    """
+    with trace_span(name, "sleep", seconds=seconds):
+        time.sleep(seconds)
+
+
+def trace_dump() -> str:
+    """
+    close the trace file, called from docgenevent.tbot_end
+
+    :return: name of the trace file, None if no trace is written
+    """
+    global _FILE, _DONE
+
+    with _LOCK:
+        _DONE = True
+        if _FILE is None:
+            return None
+
+        _FILE.write("\n]\n")
+        name = _FILE.name
+        _FILE.close()
+        _FILE = None
+
+    tbot.log.message(f"Trace written to {name!r}")
+    return name
+
+
+class Trace:
+    """
+    mixin for tbot machines, which traces the acquisition of the
+    machine and, for shell machines, each exec() (so also exec0()
+    and test()), if flag "trace" is set.
+
+    Add it to the bases before the shell class, for example:
+
+    .. code-block:: python
+
+        class GenericLab(CON, Trace, CmdStats, LAB_LINUX_SHELL, linux.Lab, linux.Builder):
+    """
+
+    def __enter__(self):
+        with trace_span(f"acquire {self.name}", "machine"):
+            return super().__enter__()
+
+    def exec(self, *args):
+        if not trace_enabled():
+            return super().exec(*args)
+
+        with trace_span(self.escape(*args), "exec", machine=self.name):
+            return super().exec(*args)
+
+
+class TracePower:
+    """
+    mixin for board machines, which traces power on and power off
+    of the board, add it to the bases before the power control class.
+    """
+
+    def poweron(self) -> None:
+        with trace_span(f"poweron {self.name}", "power"):
+            super().poweron()
+
+    def poweroff(self) -> None:
+        with trace_span(f"poweroff {self.name}", "power"):
+            super().poweroff()
@@ -1,4 +1,8 @@
+import hashlib
+import os
 import re
+import tbot
+from tbot.machine import linux
 
 
 def string_to_dict(string: str, pattern: str) -> dict:
@@ -24,3 +28,146 @@ def string_to_dict(string: str, pattern: str) -> dict:
     keys = re.findall(r"{(.+?)}", pattern)
     _dict = dict(zip(keys, values))
     return _dict
+
+
+def deploy_scripts(host, scriptdir, scripts: dict, name: str = "scripts"):
+    """
+    write scripts into directory scriptdir on host, if they changed
+
+    A sha256 hash over all scripts is stored in scriptdir, so the
+    scripts are only written again, if one of them changed.
+
+    :param host: machine the scripts are deployed to
+    :param scriptdir: directory on host, created if it does not exist
+    :param scripts: dictionary script name -> content
+    :param name: what is deployed, used in the log messages
+    :return: scriptdir as linux.Path
+    """
+    if not isinstance(scriptdir, linux.Path):
+        scriptdir = linux.Path(host, scriptdir)
+    host.exec0("mkdir", "-p", scriptdir)
+    # Generate a hash for the version of the scripts
+    script_hasher = hashlib.sha256()
+    for script in sorted(scripts.values()):
+        script_hasher.update(script.encode("utf-8"))
+    script_hash = script_hasher.hexdigest()
+
+    hashfile = scriptdir / "tbot-scripts.sha256"
+    try:
+        up_to_date = script_hash == hashfile.read_text().strip()
+    except Exception:
+        up_to_date = False
+
+    if up_to_date:
+        tbot.log.message(f"{name} are up to date, skipping deployment ...")
+        return scriptdir
+
+    tbot.log.message(f"Updating {name} ...")
+    for scriptname, script in scripts.items():
+        (scriptdir / scriptname).write_text(script)
+        host.exec0("chmod", "+x", scriptdir / scriptname)
+
+    # Write checksum so we don't re-deploy next time
+    hashfile.write_text(script_hash)
+    return scriptdir
+
+
+# attribute of a machine instance, which holds the cached results
+# of capability probes, see machine_capability()
+CAPABILITY_ATTR = "_tbottest_capabilities"
+
+
+def machine_capability(machine, key: str, probe):
+    """
+    return the result of a capability probe (tool presence, busybox
+    variant, SoC name, kernel version, ...) of machine
+
+    The probe only runs once, the result is cached on the machine
+    instance. When the machine is re-acquired (for example after a
+    reboot) tbot creates a new machine instance, so the cache starts
+    empty again. The init() of the generic linux machines also resets
+    it, see machine_capability_reset().
+
+    :param machine: machine the probe runs on
+    :param key: name of the capability
+    :param probe: function without arguments, which probes the capability
+    :return: result of probe()
+    """
+    caps = getattr(machine, CAPABILITY_ATTR, None)
+    if caps is None:
+        caps = {}
+        setattr(machine, CAPABILITY_ATTR, caps)
+
+    if key not in caps:
+        caps[key] = probe()
+
+    return caps[key]
+
+
+def machine_capability_reset(machine, key: str = None) -> None:
+    """
+    drop cached capability probe results of machine
+
+    :param machine: machine
+    :param key: capability to drop, if None drop all
+    """
+    caps = getattr(machine, CAPABILITY_ATTR, None)
+    if caps is None:
+        return
+
+    if key is None:
+        caps.clear()
+    else:
+        caps.pop(key, None)
+
+
+# max count of characters of a boot log, which is kept in memory,
+# see bootlog_limit()
+BOOTLOG_MAX = 64 * 1024
+BOOTLOG_SPILL_DIR = "results/bootlogs"
+_BOOTLOG_COUNT: dict = {}
+
+
+def bootlog_spill_dir() -> str:
+    """
+    return the directory for the full boot logs, None if flag
+    "bootlogspill" (or "bootlogspill:<dir>") is not set
+    """
+    for f in tbot.flags:
+        if f == "bootlogspill":
+            return BOOTLOG_SPILL_DIR
+        if f.startswith("bootlogspill:"):
+            return f.split(":", 1)[1]
+
+    return None
+
+
+def bootlog_limit(machine) -> None:
+    """
+    limit the boot log (attribute bootlog) of a U-Boot or Linux machine
+    to the last BOOTLOG_MAX characters
+
+    In soak tests with thousands of boots the boot logs would grow the
+    tbot process without bound. If flag "bootlogspill" is set, the full
+    boot log is written to <dir>/<machine name>-<n>.log before it is cut.
+
+    The limit is applied after the boot, while booting the full log is
+    still collected in memory, so the peak memory of one boot does not
+    change, only the memory kept over many boots.
+
+    :param machine: machine, which has just booted
+    """
+    bootlog = getattr(machine, "bootlog", None)
+    if bootlog is None:
+        return
+
+    spilldir = bootlog_spill_dir()
+    if spilldir is not None:
+        os.makedirs(spilldir, exist_ok=True)
+        n = _BOOTLOG_COUNT.get(machine.name, 0) + 1
+        _BOOTLOG_COUNT[machine.name] = n
+        with open(os.path.join(spilldir, f"{machine.name}-{n}.log"), "w") as f:
+            f.write(bootlog)
+
+    if len(bootlog) > BOOTLOG_MAX:
+        machine.bootlog = bootlog[-BOOTLOG_MAX:]
@@ -1,8 +1,9 @@
 import abc
 import contextlib
-import time
 from tbot.machine import channel, connector, linux
 
+from tbottest.common.trace import trace_sleep
+
 __all__ = (
     "KermitConnector",
     "PicocomConnector",
@@ -67,7 +68,7 @@ class KermitConnector(connector.ConsoleConnector):
 
             # get original prompt...
             if self.kermit_delay != 0.0:
-                time.sleep(self.kermit_delay)
+                trace_sleep(self.kermit_delay, "kermit delay")
 
     def connect(self, mach: linux.LinuxShell) -> channel.Channel:
         return self.kermitconnect(mach)
@@ -170,7 +171,7 @@ class PicocomConnector(connector.ConsoleConnector):
 
             # some usb adapters need here an delay...
             if self.delay != 0.0:
-                time.sleep(self.delay)
+                trace_sleep(self.delay, "picocom delay")
 
     def connect(self, mach: linux.LinuxShell) -> channel.Channel:
         return self.picocomconnect(mach)
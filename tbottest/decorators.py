@@ -2,6 +2,8 @@ import functools
 import tbot
 import typing
 
+from tbottest.common.tcprofile import TcProfile
+
 F_tc = typing.TypeVar("F_tc", bound=typing.Callable[..., typing.Any])
 
 
@@ -27,3 +29,30 @@ def tbot_save_flags(tc: F_tc) -> F_tc:
             raise RuntimeError(f"{tc} failed")
 
     return wrapper
+
+
+def tbot_profile(tc: F_tc) -> F_tc:
+    """
+    Use this decorator to profile a testcase.
+
+    The testcase runs under cProfile and a sampling profiler, wall and
+    cpu time are logged and a .prof and a collapsed stack file are
+    written to the results directory, see tbottest.common.tcprofile.
+
+    Start tbot with flag "profile" (or "profile:<dir>") to profile every
+    testcase without this decorator.
+
+    .. code-block:: python
+
+        @tbot_profile
+        @tbot.testcase
+        def board_lnx_regdump(lab=None, board=None) -> None:
+            ...
+    """
+
+    @functools.wraps(tc)
+    def wrapper(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        with TcProfile(tc.__name__):
+            return tc(*args, **kwargs)
+
+    return typing.cast(F_tc, wrapper)
@@ -2,6 +2,11 @@ import time
 
 from tbot import log
 
+from tbottest.common.cmdstats import cmdstats_dump
+from tbottest.common.tcprofile import profile_install
+from tbottest.common.trace import trace_dump
+from tbottest.common.trace import trace_install
+
 __all__ = ("doc_begin", "doc_image", "doc_cmd", "doc_tag", "doc_end")
 
 """
@@ -115,6 +120,8 @@ def doc_end(docid: str) -> None:
 def tbot_start() -> None:
     print(log.c("tbot").yellow.bold + " starting ...")
     log.NESTING += 1
+    trace_install()
+    profile_install()
 
 
 def tbot_end(success: bool) -> None:
@@ -127,6 +134,9 @@ def tbot_end(success: bool) -> None:
         ).dark
     )
 
+    cmdstats_dump(log.LOGFILE.name if log.LOGFILE is not None else None)
+    trace_dump()
+
     if log.LOGFILE is not None:
         log.message(f"Log written to {log.LOGFILE.name!r}")
 
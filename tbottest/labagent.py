@@ -0,0 +1,496 @@
+import base64
+import contextlib
+import json
+import tbot
+from tbot.machine import linux
+
+from tbottest.common.utils import deploy_scripts
+from tbottest.common.utils import machine_capability
+
+__all__ = (
+    "LabAgent",
+    "lab_agent",
+    "lab_exec",
+    "lab_exec0",
+    "lab_is_file",
+    "lab_file_hash",
+    "lab_read_text",
+    "lab_write_text",
+)
+
+# prompt the agent prints, when it waits for the next request
+LABAGENT_PROMPT = "TBOTAGENT> "
+# prefix of the response line
+LABAGENT_RESPONSE = "TBOTAGENT-R "
+# seconds to wait for the first prompt of the agent
+LABAGENT_START_TIMEOUT = 30
+
+LABAGENT_SCRIPTS = {
+    "labagent.py": """\
+#!/usr/bin/env python3
+#
+# tbottest lab agent, reads one json request per line from stdin,
+# each request is a list of operations, and writes one json
+# response line with a result for each operation.
+
+import base64
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import termios
+import tty
+
+PROMPT = "TBOTAGENT> "
+RESPONSE = "TBOTAGENT-R "
+jobs = {}
+
+
+def op_exec(req):
+    p = subprocess.run(
+        req["cmd"],
+        shell=isinstance(req["cmd"], str),
+        cwd=req.get("cwd"),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        timeout=req.get("timeout"),
+    )
+    return {"rc": p.returncode, "out": p.stdout.decode("utf-8", "replace")}
+
+
+def op_stat(req):
+    try:
+        st = os.stat(req["path"])
+    except FileNotFoundError:
+        return {"exists": False}
+    return {
+        "exists": True,
+        "isdir": os.path.isdir(req["path"]),
+        "size": st.st_size,
+        "mode": st.st_mode,
+        "mtime": st.st_mtime,
+    }
+
+
+def op_hash(req):
+    h = hashlib.new(req.get("algo", "sha256"))
+    with open(req["path"], "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return {"hash": h.hexdigest()}
+
+
+def op_read_file(req):
+    with open(req["path"], "rb") as f:
+        f.seek(req.get("offset", 0))
+        data = f.read(req.get("size", -1))
+    return {"data": base64.b64encode(data).decode()}
+
+
+def op_write_file(req):
+    with open(req["path"], "ab" if req.get("append") else "wb") as f:
+        f.write(base64.b64decode(req["data"]))
+    if "mode" in req:
+        os.chmod(req["path"], req["mode"])
+    return {}
+
+
+def op_job_start(req):
+    log = open(req["log"], "wb")
+    p = subprocess.Popen(
+        req["cmd"],
+        shell=isinstance(req["cmd"], str),
+        cwd=req.get("cwd"),
+        stdin=subprocess.DEVNULL,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    log.close()
+    jobs[p.pid] = p
+    return {"pid": p.pid}
+
+
+def op_job_poll(req):
+    return {"rc": jobs[req["pid"]].poll()}
+
+
+def op_job_kill(req):
+    p = jobs.pop(req["pid"])
+    p.send_signal(req.get("signal", 15))
+    return {"rc": p.wait()}
+
+
+def op_call(req):
+    # call a function of a python module in directory path, so
+    # helper scripts do not start a new interpreter for each call
+    if req["path"] not in sys.path:
+        sys.path.insert(0, req["path"])
+    mod = importlib.import_module(req["module"])
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        ret = getattr(mod, req["func"])(*req.get("args", []))
+    return {"result": ret, "out": out.getvalue()}
+
+
+OPS = {
+    "exec": op_exec,
+    "stat": op_stat,
+    "hash": op_hash,
+    "read-file": op_read_file,
+    "write-file": op_write_file,
+    "job-start": op_job_start,
+    "job-poll": op_job_poll,
+    "job-kill": op_job_kill,
+    "call": op_call,
+}
+
+
+def handle(req):
+    try:
+        ret = OPS[req["op"]](req)
+        ret["ok"] = True
+    except Exception as e:
+        ret = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return ret
+
+
+def main():
+    old = None
+    if os.isatty(0):
+        # no echo and no line length limit of the terminal
+        old = termios.tcgetattr(0)
+        tty.setraw(0)
+    buf = b""
+    try:
+        while True:
+            sys.stdout.write(PROMPT)
+            sys.stdout.flush()
+            while b"\\n" not in buf:
+                c = os.read(0, 65536)
+                if c == b"":
+                    return
+                buf += c
+            line, buf = buf.split(b"\\n", 1)
+            line = line.strip()
+            if line == b"":
+                continue
+            reqs = json.loads(line)
+            if reqs == "quit":
+                return
+            resp = json.dumps([handle(r) for r in reqs])
+            sys.stdout.write(RESPONSE + resp + "\\n")
+    finally:
+        for p in jobs.values():
+            p.kill()
+        if old is not None:
+            termios.tcsetattr(0, termios.TCSADRAIN, old)
+
+
+main()
+""",
+}
+
+
+class LabAgent:
+    """
+    agent on the lab host, which executes batches of operations
+    and returns structured results, without parsing the output of
+    shell commands.
+
+    The agent script is deployed to the lab host with deploy_scripts()
+    (only if its hash changed), and started once on a second connection
+    to the lab host, so the lab machine itself is still usable. Requests
+    and responses are exchanged as json lines over this connection.
+
+    Use lab_agent() to get the agent of a lab host, or the lab_exec(),
+    lab_is_file(), ... helpers, which fall back to shell commands on the
+    lab machine, if the agent is not available.
+
+    example:
+
+    .. code-block:: python
+
+        agent = lab_agent(lab)
+        rc, out = agent.exec(["ls", "-l", "/tftpboot"])
+        res = agent.batch([
+            {"op": "stat", "path": "/tftpboot/Image"},
+            {"op": "hash", "path": "/tftpboot/Image"},
+        ])
+
+    Operations (key "op", further keys are the arguments):
+
+    - exec: cmd (list or shell string), cwd, timeout -> rc, out
+    - stat: path -> exists, isdir, size, mode, mtime
+    - hash: path, algo (default sha256) -> hash
+    - read-file: path, offset, size -> data (base64)
+    - write-file: path, data (base64), append, mode
+    - job-start: cmd, cwd, log (output file) -> pid
+    - job-poll: pid -> rc (None if still running)
+    - job-kill: pid, signal -> rc
+    - call: path, module, func, args -> result, out (stdout of the
+      function), the module is imported from directory path once and
+      stays loaded
+
+    Each result contains "ok", and "error" if ok is False.
+
+    :param lab: lab host machine
+    :param agentdir: directory on the lab host for the agent script
+    """
+
+    def __init__(self, lab: linux.LinuxShell, agentdir: str = "/tmp/tbot/labagent") -> None:
+        self.lab = lab
+        self.agentdir = linux.Path(lab, agentdir)
+        self.stack = contextlib.ExitStack()
+        self.proc = None
+
+    def start(self) -> None:
+        """
+        deploy and start the agent on a new connection to the lab host
+        """
+        deploy_scripts(self.lab, self.agentdir, LABAGENT_SCRIPTS, "lab agent scripts")
+        host = self.stack.enter_context(self.lab.clone())
+        self.proc = self.stack.enter_context(
+            host.run("python3", linux.Path(host, self.agentdir._local_str()) / "labagent.py")
+        )
+        self.proc.read_until_prompt(LABAGENT_PROMPT, timeout=LABAGENT_START_TIMEOUT)
+
+    def close(self) -> None:
+        """
+        stop the agent
+        """
+        if self.proc is not None:
+            self.proc.sendline(json.dumps("quit"))
+            self.proc.terminate0()
+            self.proc = None
+        self.stack.close()
+
+    def batch(self, ops: list, timeout: float = None) -> list:
+        """
+        execute a list of operations in one round trip
+
+        :param ops: list of operations, see above
+        :param timeout: timeout for the whole batch in seconds
+        :return: list of results, one for each operation
+        """
+        if self.proc is None:
+            self.start()
+
+        self.proc.sendline(json.dumps(ops))
+        out = self.proc.read_until_prompt(LABAGENT_PROMPT, timeout=timeout)
+        for line in out.splitlines():
+            if line.startswith(LABAGENT_RESPONSE):
+                return json.loads(line[len(LABAGENT_RESPONSE) :])
+
+        raise RuntimeError(f"lab agent: no response for {ops}")
+
+    def _op(self, op: dict) -> dict:
+        ret = self.batch([op])[0]
+        if not ret["ok"]:
+            raise RuntimeError(f"lab agent: {op['op']} failed: {ret['error']}")
+        return ret
+
+    def exec(self, cmd, cwd: str = None, timeout: float = None) -> tuple:
+        """
+        execute cmd (list of arguments or shell string) on the lab host
+
+        :return: tuple (return code, output)
+        """
+        ret = self._op({"op": "exec", "cmd": cmd, "cwd": cwd, "timeout": timeout})
+        return ret["rc"], ret["out"]
+
+    def exec0(self, cmd, cwd: str = None, timeout: float = None) -> str:
+        """
+        as exec(), but raise a RuntimeError if cmd fails
+
+        :return: output of cmd
+        """
+        rc, out = self.exec(cmd, cwd, timeout)
+        if rc != 0:
+            raise RuntimeError(f"lab agent: {cmd} failed with {rc}: {out}")
+        return out
+
+    def stat(self, path: str) -> dict:
+        return self._op({"op": "stat", "path": _path(path)})
+
+    def hash(self, path: str, algo: str = "sha256") -> str:
+        return self._op({"op": "hash", "path": _path(path), "algo": algo})["hash"]
+
+    def read_file(self, path: str, offset: int = 0, size: int = -1) -> bytes:
+        ret = self._op({"op": "read-file", "path": _path(path), "offset": offset, "size": size})
+        return base64.b64decode(ret["data"])
+
+    def write_file(self, path: str, data: bytes, append: bool = False, mode: int = None) -> None:
+        op = {
+            "op": "write-file",
+            "path": _path(path),
+            "data": base64.b64encode(data).decode(),
+            "append": append,
+        }
+        if mode is not None:
+            op["mode"] = mode
+        self._op(op)
+
+    def job_start(self, cmd, log: str, cwd: str = None) -> int:
+        """
+        start cmd in background, output goes into file log
+
+        :return: pid of the job
+        """
+        return self._op({"op": "job-start", "cmd": cmd, "log": _path(log), "cwd": cwd})["pid"]
+
+    def job_poll(self, pid: int):
+        """
+        :return: return code of the job, None if it is still running
+        """
+        return self._op({"op": "job-poll", "pid": pid})["rc"]
+
+    def job_kill(self, pid: int, signal: int = 15) -> int:
+        return self._op({"op": "job-kill", "pid": pid, "signal": signal})["rc"]
+
+    def call(self, path, module: str, func: str, args: list = [], timeout: float = None):
+        """
+        call func(*args) of python module in directory path on the lab
+        host inside the agent, without starting a new interpreter
+
+        :param path: directory of the module on the lab host
+        :param module: name of the module
+        :param func: name of the function
+        :param args: list of arguments, must be json serializable
+        :return: tuple (return value of func, output of func)
+        """
+        ret = self.batch(
+            [{"op": "call", "path": _path(path), "module": module, "func": func, "args": args}],
+            timeout=timeout,
+        )[0]
+        if not ret["ok"]:
+            raise RuntimeError(f"lab agent: {module}.{func} failed: {ret['error']}")
+        return ret["result"], ret["out"]
+
+
+def _path(path) -> str:
+    if isinstance(path, linux.Path):
+        return path._local_str()
+    return str(path)
+
+
+def lab_agent(lab: linux.LinuxShell) -> LabAgent:
+    """
+    return the agent of the lab host lab, it is started on first use
+    and stays running as long as the lab machine instance exists.
+
+    :param lab: lab host machine
+    :return: the agent, None if flag "nolabagent" is set or the agent
+        could not be started (for example no python3 on the lab host)
+    """
+
+    def probe():
+        if "nolabagent" in tbot.flags:
+            return None
+
+        if not lab.test("python3", "-c", "import json"):
+            tbot.log.message(tbot.log.c("no python3 on lab host, lab agent disabled").yellow)
+            return None
+
+        agent = LabAgent(lab)
+        try:
+            agent.start()
+        except Exception as e:
+            tbot.log.message(tbot.log.c(f"could not start lab agent: {e}").yellow)
+            with contextlib.suppress(Exception):
+                agent.stack.close()
+            return None
+
+        # stop the agent, before the lab machine is closed
+        cx = getattr(lab, "_cx", None)
+        if cx is not None:
+            cx.callback(agent.close)
+        return agent
+
+    return machine_capability(lab, "labagent", probe)
+
+
+def lab_exec(lab: linux.LinuxShell, *args) -> tuple:
+    """
+    execute a command on the lab host through the lab agent, as
+    lab.exec() does, if the agent is not available
+
+    The command runs in the home directory of the lab user, so use
+    absolute paths.
+
+    :param lab: lab host machine
+    :param args: command, same arguments as for lab.exec()
+    :return: tuple (return code, output)
+    """
+    agent = lab_agent(lab)
+    if agent is None:
+        return lab.exec(*args)
+
+    return agent.exec(lab.escape(*args))
+
+
+def lab_exec0(lab: linux.LinuxShell, *args) -> str:
+    """
+    as lab_exec(), but raise a RuntimeError if the command fails
+
+    :return: output of the command
+    """
+    agent = lab_agent(lab)
+    if agent is None:
+        return lab.exec0(*args)
+
+    return agent.exec0(lab.escape(*args))
+
+
+def lab_is_file(lab: linux.LinuxShell, path) -> bool:
+    """
+    return True if path is a regular file on the lab host
+    """
+    agent = lab_agent(lab)
+    if agent is None:
+        return lab.test("test", "-f", path)
+
+    st = agent.stat(path)
+    return st["exists"] and not st["isdir"]
+
+
+def lab_file_hash(lab: linux.LinuxShell, path, algo: str = "md5") -> str:
+    """
+    return the hash of file path on the lab host
+
+    :param algo: hash algorithm, the shell fallback uses <algo>sum
+    :return: hex digest
+    """
+    agent = lab_agent(lab)
+    if agent is None:
+        return lab.exec0(f"{algo}sum", path).split()[0]
+
+    return agent.hash(path, algo)
+
+
+def lab_read_text(lab: linux.LinuxShell, path) -> str:
+    """
+    return the content of file path on the lab host
+    """
+    agent = lab_agent(lab)
+    if agent is None:
+        return lab.exec0("cat", path)
+
+    return agent.read_file(path).decode("utf-8", "replace")
+
+
+def lab_write_text(lab: linux.LinuxShell, path, text: str) -> None:
+    """
+    write text into file path on the lab host
+    """
+    agent = lab_agent(lab)
+    if agent is None:
+        if not isinstance(path, linux.Path):
+            path = linux.Path(lab, path)
+        path.write_text(text)
+        return
+
+    agent.write_file(path, text.encode("utf-8"))
@@ -2,7 +2,6 @@ import os
 import typing
 import tbot
 from tbot.machine import connector, linux, board
-import time
 import tbottest.initconfig as ini
 from tbot_contrib.gpio import Gpio
 from tbottest.connector import KermitConnector
@@ -12,8 +11,14 @@ from tbottest import builders
 from tbottest import powercontrol
 from tbottest import machineinit
 from tbottest.common.boardlocking import lab_get_lock
+from tbottest.common.sshmux import sshmux_local_options
+from tbottest.common.cmdstats import CmdStats
+from tbottest.common.trace import Trace
+from tbottest.common.trace import TracePower
+from tbottest.common.trace import trace_sleep
 from tbottest.dynamicimport import get_boardcallback_import
 from tbottest.dynamicimport import get_boardmodule_import
+from tbottest.labagent import lab_is_file
 
 import tbottest.initconfighelper as inithelper
 
@@ -336,11 +341,11 @@ else:
         raise RuntimeError("Please setup console connector")
 
 
-class boardControlFull(BOARDCON, BOARDCTRL, board.Board):
+class boardControlFull(BOARDCON, Trace, TracePower, BOARDCTRL, board.Board):
     pass
 
 
-class boardExtPower(BOARDCON, board.Board):
+class boardExtPower(BOARDCON, Trace, board.Board):
     pass
 
 
@@ -352,7 +357,7 @@ else:
 BH = typing.TypeVar("BH", bound=linux.Builder)
 
 
-class GenericLab(CON, LAB_LINUX_SHELL, linux.Lab, linux.Builder):
+class GenericLab(CON, Trace, CmdStats, LAB_LINUX_SHELL, linux.Lab, linux.Builder):
     sectionname = LABSECTIONNAME
     tmpdir_exists = False
     nfsbasedir = True
@@ -392,7 +397,7 @@ class GenericLab(CON, LAB_LINUX_SHELL, linux.Lab, linux.Builder):
             except:  # noqa: E722
                 pass
 
-        return args
+        return args + sshmux_local_options(self.name)
 
     @property
     def authenticator(self) -> linux.auth.Authenticator:
@@ -687,8 +692,7 @@ class GenericLab(CON, LAB_LINUX_SHELL, linux.Lab, linux.Builder):
             try:
                 labinit = eval(cfgt.config_parser.get(LABSECTIONNAME, "labinit"))
 
-                ret, log = self.exec("test", "-f", self.labinitfilename)
-                if ret != 0:
+                if not lab_is_file(self, self.labinitfilename):
                     for i in labinit:
                         self.exec0(linux.Raw(i))
 
@@ -716,7 +720,7 @@ class GenericLab(CON, LAB_LINUX_SHELL, linux.Lab, linux.Builder):
                 out = self.exec0("ip", "link", "show", "dev", labdev)
                 while "NO-CARRIER" in out:
                     self.exec0("sudo", "ethtool", "-s", labdev, "autoneg", "on")
-                    time.sleep(1)
+                    trace_sleep(1, f"{labdev} carrier")
                     out = self.exec0("ip", "link", "show", "dev", labdev)
 
     def has_sshmachine(self) -> bool:
@@ -743,6 +747,10 @@ class SSHMachine(connector.SSHConnector, linux.Bash):
     except:
         pass
 
+    @property
+    def ssh_config(self) -> typing.List[str]:
+        return sshmux_local_options(self.name)
+
     def tftp_dir(self) -> "linux.path.Path[SSHMachine]":
         return self.workdir
 
@@ -835,4 +843,10 @@ FLAGS = {
     "powershellscript": "use a shell script for switching power",
     "poweroffonstart": "always power off board on tbot start",
     "labname": "select which labhost we use",
+    "sshmux": "sshmux[:<time>] reuse ssh connections (ControlMaster), keep master open <time> (default 10m)",
+    "cmdstats": "cmdstats[:<file>] record latency of each command, write json report to <file> at end of run",
+    "trace": "trace[:<file>] write a Chrome trace / Perfetto timeline of testcases, commands and sleeps to <file>",
+    "profile": "profile[:<dir>] profile each testcase with cProfile and a sampling profiler, results in <dir>",
+    "nolabagent": "do not start the lab agent, lab helpers use shell commands on the lab host",
+    "bootlogspill": "bootlogspill[:<dir>] write the full U-Boot and Linux boot logs to <dir>, only the end is kept in memory",
 }
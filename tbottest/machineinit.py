@@ -5,7 +5,7 @@ import tbot
 from tbot.machine import machine
 from tbot.machine import linux
 from typing import List
-import time
+from tbottest.common.trace import trace_sleep
 from tbottest.tc.common import search_string_in_multiline
 
 import platform
@@ -234,7 +234,7 @@ class SeggerLoad(machine.Initializer):
                     if "go" in cmd:
                         if self.timeout is False:
                             # give SPL some time
-                            time.sleep(2)
+                            trace_sleep(2, "segger spl")
                             self.timeout = True
                 ev.data["stdout"] = out
 
@@ -346,10 +346,10 @@ class UsbSdpLoad(machine.Initializer):
         for bina in bins:
             loop = True
             i = 0
-            time.sleep(3)
+            trace_sleep(3, "imx_usb")
             while loop:
                 if i:
-                    time.sleep(2)
+                    trace_sleep(2, "imx_usb retry")
                 ret, out = self.host.exec("sudo", imx / "imx_usb", bina)
                 if "no matching USB device found" in out and ret == 1:
                     i += 1
@@ -430,7 +430,7 @@ class DFUUTIL(machine.Initializer):
                     if search_string_in_multiline(dmesgcheck, log):
                         break
 
-                    time.sleep(1)
+                    trace_sleep(1, "dfu-util dmesg check")
 
             self.host.exec("dfu-util", "-w", "-a", cmd["a"], "-D", cmd["D"])  # type: ignore
 
@@ -1,11 +1,12 @@
 import abc
-import hashlib
 import tbot
-import time
 from tbot.machine import board
 from tbot.machine import linux
 
 from tbot_contrib.gpio import Gpio
+from tbottest.common.trace import trace_sleep
+from tbottest.common.utils import deploy_scripts
+from tbottest.labagent import lab_agent
 
 __all__ = (
     "GpiopmControl",
@@ -68,7 +69,7 @@ class GpiopmControl(board.PowerControl):
             self._gpio.set_value(True)
 
         tbot.log.message("Waiting a bit to let power settle down ...")
-        time.sleep(2)
+        trace_sleep(2, "power settle")
 
 
 class PowerShellScriptControl(board.PowerControl):
@@ -170,7 +171,7 @@ class SispmControl(board.PowerControl):
             )
 
             tbot.log.message("Waiting a bit to let power settle down ...")
-            time.sleep(2)
+            trace_sleep(2, "power settle")
 
 
 class TinkerforgeControl(board.PowerControl):
@@ -344,27 +345,41 @@ from TestModule import TestModule
 # 3 : timeout
 # 4 : address
 # 5 : port
-# 6 : on or off
+# 6 : on, off or state
 # 7 : debug
 
 
-testBus = serial.Serial(str(sys.argv[1]), int(sys.argv[2]), timeout=int(sys.argv[3]))
-if sys.argv[7] == "True":
-    print ("ARGS ", sys.argv)
+# switch port on or off, or with state "state" only read the state
+# of port, returns the response of the relais state query.
+# Called from the tbottest lab agent or from the command line.
+def tm021(device, baudrate, timeout, address, port, state, debug):
+    testBus = serial.Serial(str(device), int(baudrate), timeout=int(timeout))
+    try:
+        tm021addr0 = TestModule(testBus, 'TM021', str(address), debug=debug == "True")
 
-tm021addr0 = TestModule(testBus, 'TM021', str(sys.argv[4]), debug=sys.argv[7])
+        tm021addr0.clearErrorQueue()
+        tm021addr0.sendCheck('SYST:REM')
 
-tm021addr0.clearErrorQueue()
-tm021addr0.sendCheck('SYST:REM')
+        if state == "state":
+            return tm021addr0.sendReceive(f'ROUT:CLOS? (@{port})')
 
-state = "OPEN"
-if sys.argv[6] == "on":
-    state = "CLOS"
+        rout = "OPEN"
+        if state == "on":
+            rout = "CLOS"
 
-tmp = f"ROUT:{state} (@{sys.argv[5]})"
-tm021addr0.sendCheck(tmp)
-response=tm021addr0.sendReceive('ROUT:CLOS? (@1)')
-print ("RESP ", response)
+        tmp = f"ROUT:{rout} (@{port})"
+        tm021addr0.sendCheck(tmp)
+        return tm021addr0.sendReceive('ROUT:CLOS? (@1)')
+    finally:
+        testBus.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[7] == "True":
+        print ("ARGS ", sys.argv)
+
+    response = tm021(*sys.argv[1:8])
+    print ("RESP ", response)
 """,
 }
 
@@ -451,63 +466,62 @@ class TM021Control(board.PowerControl):
         if self.scriptexists == True:
             return True
 
-        self.hookdir = linux.Path(self.host, "/tmp/tbot/tm021")
-        self.host.exec0("mkdir", "-p", self.hookdir)
-        # Generate a hash for the version of the control files
-        script_hasher = hashlib.sha256()
-        for script in sorted(TM021_SCRIPTS.values()):
-            script_hasher.update(script.encode("utf-8"))
-        script_hash = script_hasher.hexdigest()
-
-        hashfile = self.hookdir / "tbot-scripts.sha256"
-        try:
-            up_to_date = script_hash == hashfile.read_text().strip()
-        except Exception:
-            up_to_date = False
-
-        if up_to_date:
-            tbot.log.message("Hooks are up to date, skipping deployment ...")
-        else:
-            tbot.log.message("Updating hook scripts ...")
-
-            for scriptname, script in TM021_SCRIPTS.items():
-                print("scriptname ", scriptname)
-                print("script     ", script, type(script))
-                (self.hookdir / scriptname).write_text(script)
-                self.host.exec0("chmod", "+x", self.hookdir / scriptname)
-
-            # Write checksum so we don't re-deploy next time
-            hashfile.write_text(script_hash)
-
-
+        self.hookdir = deploy_scripts(self.host, "/tmp/tbot/tm021", TM021_SCRIPTS, "hook scripts")
         self.scriptexists = True
         return True
 
-    def poweron(self) -> None:
+    def tm021_call(self, state: str) -> str:
+        """
+        switch the relais port on or off, or read its state
+
+        The script runs inside the lab agent, so no new python
+        interpreter is started for each call. If the lab agent is
+        not available, the script is called on the lab host.
+
+        :param state: "on", "off" or "state"
+        :return: response of the relais state query
+        """
         # we cannot use pyserial as device is on lab host, and tbot
         # may is not started on lab host!
         self.copy_script()
 
-        self.host.exec0(self.hookdir / "tm021.py", self.tm021_device, self.tm021_baudrate,
+        args = [
+            self.tm021_device,
+            self.tm021_baudrate,
             self.tm021_timeout,
             self.tm021_address,
             self.tm021_port,
-            "on",
+            state,
             self.tm021_debug,
-        )
+        ]
+        agent = lab_agent(self.host)
+        if agent is not None:
+            ret, out = agent.call(self.hookdir, "tm021", "tm021", [str(a) for a in args])
+            if out:
+                tbot.log.message(out)
+            return ret
+
+        out = self.host.exec0(self.hookdir / "tm021.py", *args)
+        for line in out.splitlines():
+            if line.startswith("RESP "):
+                return line[len("RESP ") :].strip()
+
+        return ""
+
+    def tm021_state(self) -> str:
+        """
+        return the state of the relais port, as the relais reports it
+        """
+        return self.tm021_call("state")
+
+    def poweron(self) -> None:
+        self.tm021_call("on")
 
     def poweroff(self) -> None:
         if "nopoweroff" in tbot.flags:
             tbot.log.message("Do not power off ...")
         else:
-            self.host.exec0(self.hookdir / "tm021.py", self.tm021_device, self.tm021_baudrate,
-                self.tm021_timeout,
-                self.tm021_address,
-                self.tm021_port,
-                "off",
-                self.tm021_debug,
-            )
-
+            self.tm021_call("off")
 
 
 FLAGS = {
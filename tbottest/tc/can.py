@@ -5,21 +5,18 @@
 import typing
 from typing import List
 import tbot
-import time
 import datetime
+import tempfile
 from tbot.machine import linux
 from tbot.context import Optional
+from tbottest.common.sshmux import sshmux_lab_args
+from tbottest.common.trace import trace_sleep
+from tbottest.tc.common import lx_exec_batch
+from tbottest.tc.common import lx_exec_to_file
 from tbottest.tc.common import tbot_start_thread
 from tbottest.tc.common import tbot_stop_thread
 
 
-def sudo_exec0(lnx: linux.LinuxShell, usesudo: bool, *args) -> str:
-    if usesudo:
-        return lnx.exec0("sudo", *args)
-
-    return lnx.exec0(*args)
-
-
 def get_lines(lnx: linux.LinuxShell, fi: str) -> int:
     out = lnx.exec0("wc", "-l", fi)
     cl = out.split(" ")
@@ -42,16 +39,20 @@ def board_setup_can(
     :param tql: use tx queuelen
     :param usesudo: if we need a sudo for calling ip command
     """
-
+    sudo = ("sudo",) if usesudo else ()
+    cmds = []
     for n in candev:
-        sudo_exec0(lnx, usesudo, "ifconfig", n, "down")
+        cmds.append(sudo + ("ifconfig", n, "down"))
 
     for n in candev:
-        sudo_exec0(lnx, usesudo, "ip", "link", "set", n, "type", "can", "bitrate", br)
-        sudo_exec0(lnx, usesudo, "ip", "link", "set", n, "txqueuelen", tql)
+        cmds.append(sudo + ("ip", "link", "set", n, "type", "can", "bitrate", br))
+        cmds.append(sudo + ("ip", "link", "set", n, "txqueuelen", tql))
 
-    for n in candev:
-        sudo_exec0(lnx, usesudo, "ifconfig", n, "up")
+    # configuration in one round trip, it raises before any interface
+    # is set up, if a command failed
+    lx_exec_batch(lnx, cmds, check=True)
+
+    lx_exec_batch(lnx, [sudo + ("ifconfig", n, "up") for n in candev], check=True)
 
 
 def lnx_can_write_dump_compare(
@@ -122,27 +123,41 @@ def lnx_can_write_dump_compare(
         tbot.log.message(tbot.log.c("found output in stderr").yellow)
         lnxread.exec0("cat", f"/tmp/thread_2_{tid}")
 
-    log = lnxread.exec0("cat", f"/tmp/thread_1_{tid}")
-    log = log.strip()
     i = 0
     ign = 0
     error = False
-    for line in log.split("\n"):
-        line = line.strip()
-        if "interface" in line:
-            i += 1
-            ign += 1
-            continue
-
-        if line != data[i - ign]["res"]:
-            tbot.log.message(
-                tbot.log.c(
-                    f"found difference in candump '{line}' != '{data[i - ign]['res']}' send: '{data[i - ign]['data']}'"
-                ).red
-            )
-            error = True
+    # stream the dump into a local file and compare it line by line
+    with tempfile.TemporaryDirectory() as tmpdir:
+        res = lx_exec_to_file(lnxread, f"{tmpdir}/candump.log", "cat", f"/tmp/thread_1_{tid}")
+        with open(res["file"]) as f:
+            for line in f:
+                line = line.strip()
+                if line == "":
+                    continue
+                if "interface" in line:
+                    i += 1
+                    ign += 1
+                    continue
+
+                if i - ign >= len(data):
+                    tbot.log.message(tbot.log.c(f"unexpected line in candump '{line}'").red)
+                    error = True
+                elif line != data[i - ign]["res"]:
+                    tbot.log.message(
+                        tbot.log.c(
+                            f"found difference in candump '{line}' != '{data[i - ign]['res']}' send: '{data[i - ign]['data']}'"
+                        ).red
+                    )
+                    error = True
+
+                i += 1
 
-        i += 1
+    # empty or short dumps must fail too
+    if i - ign != len(data):
+        tbot.log.message(
+            tbot.log.c(f"candump contains {i - ign} frames, expected {len(data)}").red
+        )
+        error = True
 
     if error:
         raise RuntimeError("candump errors")
@@ -211,7 +226,7 @@ def board_lnx_cangen(
             retry = 4
             re = 0
             while cl < stop:
-                time.sleep(1)
+                trace_sleep(1, "candump")
                 clold = cl
                 cl = get_lines(lnx, cand)
                 if re < retry:
@@ -241,6 +256,7 @@ def board_lnx_cangen(
             df = f"{tmpdir}/candump.log"
             lab.exec0(
                 "scp",
+                *sshmux_lab_args(lab),
                 "-o",
                 "StrictHostKeyChecking=no",
                 "-o",
@@ -1,14 +1,27 @@
+import bisect
+import collections
 import contextlib
 import re
 import typing
 import tbot
-import time
 import uuid
 from tbot.machine import linux
 from tbot.machine import board
 from tbot.context import Optional
 from typing import AnyStr, List
 import tbottest.initconfig as ini
+from tbottest.common.sshmux import sshmux_lab_args
+from tbottest.common.sshmux import sshmux_local_args
+from tbottest.common.trace import trace_sleep
+from tbottest.common.utils import machine_capability
+from tbottest.common.utils import machine_capability_reset
+from tbottest.labagent import lab_exec
+from tbottest.labagent import lab_file_hash
+from tbottest.labagent import lab_is_file
+from tbottest.tc.uboot import ub_parse_md_output
+from tbottest.tc.uboot import ub_read_register_list
+from tbottest.tc.uboot import ub_read_register_runs
+from tbottest.tc.uboot import ub_write_register_list
 
 
 def escape_ansi(line: str) -> str:
@@ -72,13 +85,163 @@ def lx_cmd_exists(
     """
     check if command on linux machine exists
 
+    The result is cached for the boot session, see machine_capability()
+
     :param lnx: Linux machine we run on
     :param cmd: command name
     """
-    ret = lnx.exec(linux.Raw(("command -v " + cmd + " >/dev/null 2>&1")))
-    if ret[0] == 0:
-        return True
-    return False
+
+    def probe():
+        ret = lnx.exec(linux.Raw(("command -v " + cmd + " >/dev/null 2>&1")))
+        return ret[0] == 0
+
+    return machine_capability(lnx, f"cmd:{cmd}", probe)
+
+
+def lx_kernel_version(
+    lnx: linux.LinuxShell,
+) -> str:
+    """
+    return the kernel version of the linux machine, the first line
+    of uname -a. The result is cached for the boot session, see
+    machine_capability()
+
+    :param lnx: Linux machine we run on
+    """
+    return machine_capability(
+        lnx, "kernel", lambda: lnx.exec0("uname", "-a").splitlines()[0]
+    )
+
+
+def lx_exec_batch(
+    lnx: linux.LinuxShell,
+    cmds: list,
+    check: bool = False,
+    chunksize: int = 32,
+) -> list:
+    """
+    execute a list of independent commands in one round trip
+
+    All commands are sent in one command line, the output of each
+    command is framed with unique delimiters, which also carry the
+    return code of the command. A command does not stop the following
+    commands, when it fails. The output of each command is the same
+    as exec() returns.
+
+    example:
+
+    .. code-block:: python
+
+        ret = lx_exec_batch(lnx, [
+            ("cat", "/sys/class/leds/led_blue/brightness"),
+            ("ip", "link", "set", "can0", "up"),
+        ])
+        for rc, out in ret:
+            ...
+
+    :param lnx: Linux machine we run on
+    :param cmds: list of commands, each a tuple of arguments as
+        passed to exec()
+    :param check: if True raise a RuntimeError, if a command failed
+        (after all commands are executed)
+    :param chunksize: max count of commands send in one command line
+    :return: list of tuples (return code, output), one for each command
+    """
+    ret = []
+    for i in range(0, len(cmds), chunksize):
+        chunk = cmds[i : i + chunksize]
+        tag = f"tbot_batch_{uuid.uuid4().hex[:8]}"
+        line = []
+        for n, cmd in enumerate(chunk):
+            # print the delimiters with printf, so they are not part of the command line
+            line.append(
+                f"printf '%s_b{n}\\n' {tag}; {lnx.escape(*cmd)}; "
+                f"printf '\\n%s_e{n} %d\\n' {tag} $?"
+            )
+        log = lnx.exec(linux.Raw("; ".join(line)))[1]
+
+        for n, cmd in enumerate(chunk):
+            begin = f"{tag}_b{n}\n"
+            end = f"\n{tag}_e{n} "
+            try:
+                start = log.index(begin) + len(begin)
+                stop = log.index(end, start)
+                rc = int(log[stop + len(end) :].split("\n", 1)[0])
+            except ValueError:
+                raise RuntimeError(f"batch: no output found for {cmd}")
+            ret.append((rc, log[start:stop]))
+
+    if check:
+        for cmd, (rc, out) in zip(cmds, ret):
+            if rc != 0:
+                raise RuntimeError(f"command {' '.join(str(c) for c in cmd)} failed with {rc}: {out}")
+
+    return ret
+
+
+# lines fetched in one round trip and lines of the output summary,
+# see lx_exec_to_file()
+LX_EXEC_CHUNK_LINES = 2000
+LX_EXEC_TAIL = 20
+
+
+def lx_exec_to_file(
+    lnx: linux.LinuxShell,
+    localfile: str,
+    *args,
+    chunklines: int = LX_EXEC_CHUNK_LINES,
+    tail: int = LX_EXEC_TAIL,
+) -> dict:
+    """
+    execute a command and write its output to a file on the tbot host
+
+    The output is redirected into a file on lnx and then fetched in
+    chunks of chunklines lines, which are appended to localfile, so
+    also commands with megabytes of output do not grow the memory
+    of the tbot process.
+
+    example:
+
+    .. code-block:: python
+
+        res = lx_exec_to_file(lnx, "results/dmesg.log", "dmesg")
+        with open(res["file"]) as f:
+            for line in f:
+                ...
+
+    :param lnx: Linux machine we run on
+    :param localfile: file on the tbot host, gets overwritten
+    :param args: command as passed to exec()
+    :param chunklines: count of lines fetched in one round trip
+    :param tail: count of last output lines returned in the summary
+    :return: dict with keys "file" (localfile), "retcode", "lines"
+        (count of lines), "bytes" (size of localfile) and "tail" (list
+        of the last tail lines)
+    """
+    tmpfile = (lnx.tmpdir() / f"tbot_exec_{uuid.uuid4().hex[:8]}.out")._local_str()
+    rc, _ = lnx.exec(*args, linux.Raw(f"> {tmpfile} 2>&1"))
+
+    last = collections.deque(maxlen=tail)
+    lines = 0
+    with open(localfile, "w") as f:
+        start = 1
+        while True:
+            out = lnx.exec0("sed", "-n", f"{start},{start + chunklines - 1}p", tmpfile)
+            f.write(out)
+            n = out.count("\n")
+            lines += n
+            last.extend(out.splitlines()[-tail:])
+            if n < chunklines:
+                if out != "" and not out.endswith("\n"):
+                    lines += 1
+                break
+            start += chunklines
+        size = f.tell()
+
+    lnx.exec0("rm", "-f", tmpfile)
+    tbot.log.message(f"{lines} lines ({size} bytes) output written to {localfile}")
+
+    return {"file": localfile, "retcode": rc, "lines": lines, "bytes": size, "tail": list(last)}
 
 
 @tbot.testcase
@@ -106,12 +269,264 @@ def lx_devmem2_get(
     raise RuntimeError("devmem2 unexpected output")
 
 
+DEVMEM_TYPE_SIZE = {"b": 1, "h": 2, "w": 4, "l": 8}
+
+
+def devmem_addr_runs(addrs: list, step: int) -> list:
+    """
+    coalesce a list of addresses into runs of contiguous addresses
+
+    :param addrs: list of addresses (int)
+    :param step: distance between two contiguous addresses
+    :return: list of tuples (startaddr, count)
+    """
+    runs = []
+    for a in addrs:
+        if runs and runs[-1][0] + runs[-1][1] * step == a:
+            runs[-1][1] += 1
+        else:
+            runs.append([a, 1])
+
+    return [(a, c) for a, c in runs]
+
+
+@tbot.testcase
+def lx_devmem2_get_list(
+    lnx: linux.LinuxShell,
+    addrs: list,
+    typ: str,
+    chunksize: int = 64,
+    usememtool: bool = False,
+) -> list:
+    """
+    read the values of a list of addresses in one round trip
+
+    Instead of calling devmem2 for each address, one shell loop is
+    sent to the board, which calls devmem2 for all addresses. Runs
+    of contiguous addresses are generated on the board with a while
+    loop, so even a 4k register range is only a short command line.
+
+    If usememtool is True the memtool from pengutronix is used, which
+    reads a contiguous range in one mmap.
+
+    :param lnx: Linux machine we run on
+    :param addrs: list of addresses (hex strings)
+    :param typ: | devmem2 type
+        | access operation type : [b]yte, [h]alfword, [w]ord, [l]ong
+    :param chunksize: max count of address runs send in one command
+    :param usememtool: use memtool md instead of devmem2
+    :return: list of values (hex strings) in the same order as addrs
+    """
+    if typ not in DEVMEM_TYPE_SIZE:
+        raise RuntimeError(f"devmem2 type {typ} not supported")
+
+    step = DEVMEM_TYPE_SIZE[typ]
+    runs = devmem_addr_runs([int(a, 16) for a in addrs], step)
+    values = []
+    for i in range(0, len(runs), chunksize):
+        chunk = runs[i : i + chunksize]
+        if usememtool:
+            values += _lx_memtool_get_runs(lnx, chunk, step)
+        else:
+            values += _lx_devmem2_get_runs(lnx, chunk, typ, step)
+
+    if len(values) != len(addrs):
+        raise RuntimeError(
+            f"devmem2 unexpected output, got {len(values)} values for {len(addrs)} addresses"
+        )
+
+    return values
+
+
+@tbot.testcase
+def lx_devmem2_set_list(
+    lnx: linux.LinuxShell,
+    regs: list,
+    typ: str,
+    chunksize: int = 64,
+    usememtool: bool = False,
+) -> None:
+    """
+    write a list of registers in one round trip
+
+    The devmem2 calls for all registers are chained into one command.
+    If usememtool is True the memtool from pengutronix is used, which
+    writes runs of contiguous registers with one call.
+
+    :param lnx: Linux machine we run on
+    :param regs: list of (address, value) tuples as hex strings
+    :param typ: | devmem2 type
+        | access operation type : [b]yte, [h]alfword, [w]ord, [l]ong
+    :param chunksize: max count of commands send in one command line
+    :param usememtool: use memtool mw instead of devmem2
+    """
+    if typ not in DEVMEM_TYPE_SIZE:
+        raise RuntimeError(f"devmem2 type {typ} not supported")
+
+    step = DEVMEM_TYPE_SIZE[typ]
+    cmds = []
+    if usememtool:
+        width = {1: "-b", 2: "-w", 4: "-l", 8: "-q"}[step]
+        values = [v for a, v in regs]
+        pos = 0
+        for start, count in devmem_addr_runs([int(a, 16) for a, v in regs], step):
+            cmds.append(f"memtool mw {width} {hex(start)} {' '.join(values[pos:pos + count])}")
+            pos += count
+    else:
+        cmds = [f"devmem2 {a} {typ} {v}" for a, v in regs]
+
+    for i in range(0, len(cmds), chunksize):
+        lnx.exec0(linux.Raw(" && ".join(cmds[i : i + chunksize])))
+
+
+def _lx_devmem2_get_runs(lnx: linux.LinuxShell, runs: list, typ: str, step: int) -> list:
+    cmds = []
+    for start, count in runs:
+        if count == 1:
+            cmds.append(f"devmem2 {hex(start)} {typ}")
+        else:
+            end = start + count * step
+            cmds.append(
+                f"tbot_a=$(({hex(start)})); while [ $tbot_a -lt $(({hex(end)})) ]; do "
+                f"devmem2 $(printf 0x%x $tbot_a) {typ}; tbot_a=$((tbot_a+{step})); done"
+            )
+
+    strings = ["Value at address", "Read at address"]
+    values = []
+    ret = lnx.exec0(linux.Raw("; ".join(cmds)))
+    for line in ret.splitlines():
+        if any(s in line for s in strings):
+            values.append(line.split(" ")[-1])
+
+    return values
+
+
+def _lx_memtool_get_runs(lnx: linux.LinuxShell, runs: list, step: int) -> list:
+    width = {1: "-b", 2: "-w", 4: "-l", 8: "-q"}[step]
+    cmds = [f"memtool md {width} {hex(start)}+{count * step}" for start, count in runs]
+    values = []
+    ret = lnx.exec0(linux.Raw("; ".join(cmds)))
+    for line in ret.splitlines():
+        if ":" not in line:
+            continue
+        addr, data = line.split(":", 1)
+        try:
+            int(addr, 16)
+        except ValueError:
+            continue
+        # data columns end before the ascii dump, which is separated by 2 spaces
+        for v in data.strip().split("  ")[0].split(" "):
+            values.append(f"0x{v}")
+
+    return values
+
+
+def devmem_block_checksum(values: list) -> int:
+    """
+    calculate the checksum over a block of masked register values
+    in the same way as lx_devmem2_checksum_list() does on the target
+
+    :param values: list of masked register values (int)
+    :return: checksum
+    """
+    csum = 0
+    for v in values:
+        csum = (csum * 31 + (v & 0xFFFFFFFF) + ((v >> 32) & 0xFFFFFFFF)) & 0xFFFFFFFF
+
+    return csum
+
+
+@tbot.testcase
+def lx_devmem2_checksum_list(
+    lnx: linux.LinuxShell,
+    blocks: list,
+    typ: str,
+    chunksize=8,
+) -> list:
+    """
+    read blocks of registers with devmem2 on the target and
+    return only one checksum per block, see devmem_block_checksum()
+
+    :param lnx: Linux machine we run on
+    :param blocks: list of blocks, each a list of (address, mask) tuples (int)
+    :param typ: devmem2 access type
+    :param chunksize: number of blocks calculated with one command
+    :return: list of checksums (int), one for each block
+    """
+    cmds = []
+    for block in blocks:
+        regs = " ".join(f"{hex(a)}:{hex(m)}" for a, m in block)
+        cmds.append(
+            f"tbot_s=0; for tbot_r in {regs}; do "
+            f"tbot_l=$(devmem2 ${{tbot_r%:*}} {typ} | "
+            'grep -e "Value at address" -e "Read at address"); '
+            "tbot_v=$((${tbot_l##* } & ${tbot_r#*:})); "
+            "tbot_s=$(((tbot_s * 31 + (tbot_v & 0xffffffff) + "
+            "((tbot_v >> 32) & 0xffffffff)) & 0xffffffff)); "
+            "done; echo tbot_csum $tbot_s"
+        )
+
+    csums = []
+    for i in range(0, len(cmds), chunksize):
+        ret = lnx.exec0(linux.Raw("; ".join(cmds[i : i + chunksize])))
+        for line in ret.splitlines():
+            if line.startswith("tbot_csum "):
+                csums.append(int(line.split(" ")[1]))
+
+    if len(csums) != len(blocks):
+        raise RuntimeError(f"devmem2 checksum: got {len(csums)} values for {len(blocks)} blocks")
+
+    return csums
+
+
+def _lnx_check_revfile_blocks(lnx: linux.LinuxShell, lines: list, typ: str, blocksize: int) -> dict:
+    """
+    find the lines of a revfile, whose register values differ, by
+    comparing checksums of blocks of registers and bisecting the
+    blocks, which do not match.
+
+    :return: dictionary line number -> value read, only for lines
+        in blocks with differences.
+    """
+
+    def checksums(blocks):
+        regs = [[(int(cols[0], 16), int(cols[1], 16)) for lnr, cols in b] for b in blocks]
+        return lx_devmem2_checksum_list(lnx, regs, typ)
+
+    def expected(block):
+        return devmem_block_checksum(
+            [int(cols[3], 16) & int(cols[1], 16) for lnr, cols in block]
+        )
+
+    blocks = [lines[i : i + blocksize] for i in range(0, len(lines), blocksize)]
+    leafs = []
+    while blocks:
+        pending = []
+        for b, csum in zip(blocks, checksums(blocks)):
+            if csum == expected(b):
+                continue
+            if len(b) <= 4:
+                leafs.extend(b)
+            else:
+                pending.append(b[: len(b) // 2])
+                pending.append(b[len(b) // 2 :])
+        blocks = pending
+
+    vals = {}
+    tvals = lx_devmem2_get_list(lnx, [cols[0] for lnr, cols in leafs], typ)
+    for (lnr, cols), val in zip(leafs, tvals):
+        vals[lnr] = val
+
+    return vals
+
+
 @tbot.testcase
 def lnx_check_revfile(
     lnx: linux.LinuxShell,
     revfile,
     difffile=None,
     timeout=None,
+    blocksize=None,
 ) -> bool:
     """
     compare the register values defined in revfile with the values
@@ -125,7 +540,11 @@ def lnx_check_revfile(
     :param lnx: Linux machine we run on
     :param revfile: reference file we use
     :param diffile: if not None, file in which testcase writes differences found
-    :param timeout: timeout between devmem2 calls
+    :param timeout: timeout between devmem2 calls. If None (default) all
+        registers are read at once with lx_devmem2_get_list()
+    :param blocksize: if not None (and timeout is None), first only the
+        checksums over blocks of blocksize masked registers are compared.
+        Only blocks with differences are bisected and read in detail.
     """
     # check if devmem exist
     ret = lx_cmd_exists(lnx, "devmem2")
@@ -144,14 +563,36 @@ def lnx_check_revfile(
         except IOError:
             raise RuntimeError("Could not open diffile: " + difffile)
 
+    lines = []
     lnr = 0
     for line in fd.readlines():
         lnr += 1
         cols = line.split()
         if cols[0] == "#":
             continue
+        lines.append((lnr, cols))
+
+    if timeout is None:
+        # read all values at once, grouped by access type
+        vals = {}
+        for typ in set(cols[2] for lnr, cols in lines):
+            tlines = [(lnr, cols) for lnr, cols in lines if cols[2] == typ]
+            if blocksize is not None:
+                vals.update(_lnx_check_revfile_blocks(lnx, tlines, typ, blocksize))
+                continue
+            tvals = lx_devmem2_get_list(lnx, [cols[0] for lnr, cols in tlines], typ)
+            for (lnr, cols), val in zip(tlines, tvals):
+                vals[lnr] = val
 
-        val = lx_devmem2_get(lnx, cols[0], cols[2])
+        if blocksize is not None:
+            # only lines in blocks with differences are read
+            lines = [(lnr, cols) for lnr, cols in lines if lnr in vals]
+
+    for lnr, cols in lines:
+        if timeout is None:
+            val = vals[lnr]
+        else:
+            val = lx_devmem2_get(lnx, cols[0], cols[2])
         msg = f"diff args: {revfile} line: {lnr} {val}@{cols[0]} & {cols[1]} != {cols[3]}"
         if (int(val, 16) & int(cols[1], 16)) != (int(cols[3], 16) & int(cols[1], 16)):
             tbot.log.message(tbot.log.c(msg).red)
@@ -161,7 +602,7 @@ def lnx_check_revfile(
             ret = False
 
         if timeout is not None:
-            time.sleep(timeout)
+            trace_sleep(timeout, "revfile")
 
     fd.close()
     if difffile is not None:
@@ -202,8 +643,7 @@ def lnx_create_revfile(
     except IOError:
         raise RuntimeError("Could not open: " + revfile)
 
-    ret = lnx.exec0("uname", "-a").splitlines()
-    vers = ret[0]
+    vers = lx_kernel_version(lnx)
 
     processor = "ToDo"
     hw = "ToDo"
@@ -224,14 +664,80 @@ def lnx_create_revfile(
     if readtype == "b":
         step = 1
 
-    for i in iter(range(start, stop, step)):
-        val = lx_devmem2_get(lnx, hex(i), readtype)
-        fd.write("%-10s %10s %10s %10s\n" % (hex(i), mask, readtype, val))
+    addrs = [hex(i) for i in range(start, stop, step)]
+    vals = lx_devmem2_get_list(lnx, addrs, readtype)
+    for addr, val in zip(addrs, vals):
+        fd.write("%-10s %10s %10s %10s\n" % (addr, mask, readtype, val))
 
     fd.close()
     return True
 
 
+def machine_dump_runs(
+    startaddr: str,
+    endaddr: str,
+    inc: int,
+    gaps: list,
+) -> list:
+    """
+    split the address range startaddr - endaddr with increment inc
+    into runs of contiguous addresses between the gaps.
+
+    gaps is a list of dictionaries {"iaddr": addr, "naddr": addr},
+    see generic_machine_dump(). When an address is equal to "iaddr",
+    it gets replaced with "naddr".
+
+    :param startaddr: first address as hex string
+    :param endaddr: address on which the dump stops as hex string
+    :param inc: address increment for the next step
+    :param gaps: list of gap dictionaries
+    :return: list of tuples (startaddress, count)
+    """
+    gapmap = {}
+    for g in gaps:
+        gapmap.setdefault(int(g["iaddr"], 16), int(g["naddr"], 16))
+    gapstarts = sorted(gapmap)
+
+    def resolve(addr: int) -> int:
+        seen = set()
+        while addr in gapmap and addr not in seen:
+            seen.add(addr)
+            addr = gapmap[addr]
+        return addr
+
+    runs = []
+    cur = int(startaddr, 16)
+    endval = int(endaddr, 16)
+    if cur >= endval:
+        return runs
+
+    cur = resolve(cur)
+    jumped = set()
+    while True:
+        # next gap address which is hit with increment inc
+        nextgap = None
+        pos = bisect.bisect_right(gapstarts, cur)
+        while pos < len(gapstarts) and gapstarts[pos] < endval:
+            if (gapstarts[pos] - cur) % inc == 0:
+                nextgap = gapstarts[pos]
+                break
+            pos += 1
+
+        limit = endval if nextgap is None else nextgap
+        # address after a gap is always dumped, also if it is >= endaddr
+        count = max(1, -(-(limit - cur) // inc))
+        runs.append((cur, count))
+        if nextgap is None:
+            break
+        if nextgap in jumped:
+            raise RuntimeError(f"gaps loop at address {hex(nextgap)}")
+
+        jumped.add(nextgap)
+        cur = resolve(nextgap)
+
+    return runs
+
+
 def generic_machine_dump(
     typ,
     machine,
@@ -250,7 +756,9 @@ def generic_machine_dump(
     from which you want to create the registerdump.
 
     On Linux machine the value is read with devmem2 tool, in U-Boot
-    with the md command.
+    with the md command. The address range is split into runs of
+    contiguous addresses between the gaps, see machine_dump_runs(),
+    and each run is read with one command.
 
     The testcase writes the address and the value into the file with
     filename filename.
@@ -286,32 +794,29 @@ def generic_machine_dump(
     :param gaps: array if dictionary, see above example
     :param filename: file to where register values get stored
     """
-    fd = open(filename, "w")
+    if typ not in ["linux", "u-boot"]:
+        raise RuntimeError(f"type {typ} not supported.")
 
-    intval = int(startaddr, 16)
-    endval = int(endaddr, 16)
-    while intval < endval:
-        newval = intval
-        newvalhex = hex(newval)
-        # fix gaps
-        for g in gaps:
-            if newvalhex == g["iaddr"]:
-                newvalhex = g["naddr"]
-
-        if typ == "linux":
-            val = lx_devmem2_get(machine, newvalhex, "w")
-        elif typ == "u-boot":
-            log = machine.exec0("md", newvalhex, "1")
-            rval = log.split(":")[1]
-            rval = rval.split(" ")[1]
-            val = f"0x{rval}"
+    runs = machine_dump_runs(startaddr, endaddr, inc, gaps)
+    addrs = [hex(start + i * inc) for start, count in runs for i in range(count)]
+
+    if typ == "linux":
+        vals = lx_devmem2_get_list(machine, addrs, "w")
+    else:
+        # always read 32 bit with md.l, inc is only the address step
+        if inc == 4:
+            # read each contiguous run with one md command
+            mdruns = devmem_addr_runs([int(a, 16) for a in addrs], 4)
         else:
-            raise RuntimeError(f"type {typ} not supported.")
+            # do not touch the registers between the addresses, read
+            # each address with its own md.l, chained into few commands
+            mdruns = [(int(a, 16), 1) for a in addrs]
+        vals = ub_read_register_runs(machine, mdruns, 4)
 
+    fd = open(filename, "w")
+    for newvalhex, val in zip(addrs, vals):
         fd.write("%-10s %10s\n" % (newvalhex, val))
 
-        intval = int(newvalhex, 16) + inc
-
     fd.close()
 
 
@@ -319,31 +824,128 @@ def generic_machine_dump_write(
     typ,
     machine,
     filename,
-) -> None:
+    verify: bool = False,
+) -> bool:
     """
     Write a created register dump in file filename, created with testcase
 
     generic_machine_dump
 
     to the machine machine.
+
+    The registers are not written one by one, on U-Boot the mw commands
+    are chained into long command lines, see ub_write_register_list(),
+    on linux all devmem2 calls are send in one command line, see
+    lx_devmem2_set_list().
+
+    :param typ: values "linux" or "u-boot"
+    :param machine: machine we run on
+    :param filename: file with register values
+    :param verify: if True read back all registers and compare
+    :return: True if verify is False or all registers have the written value
     """
+    if typ not in ["linux", "u-boot"]:
+        raise RuntimeError(f"type {typ} not supported.")
+
+    regs = []
     fd = open(filename, "r")
     for line in fd.readlines():
         cols = line.split()
-        print(f"a: {cols[0]} v: {cols[1]}")
+        if len(cols) == 0:
+            continue
         if cols[0] == "#":
             tbot.log.message(tbot.log.c(f"ignoring {cols[1]}").yellow)
             continue
 
-        if typ == "linux":
-            raise RuntimeError(f"type {typ} not supported.")
-        elif typ == "u-boot":
-            machine.exec0("mw", cols[0], cols[1], "1")
-        else:
-            raise RuntimeError(f"type {typ} not supported.")
+        regs.append((cols[0], cols[1]))
 
     fd.close()
 
+    if typ == "linux":
+        lx_devmem2_set_list(machine, regs, "w")
+    else:
+        ub_write_register_list(machine, regs)
+
+    if not verify:
+        return True
+
+    addrs = [a for a, v in regs]
+    if typ == "linux":
+        vals = lx_devmem2_get_list(machine, addrs, "w")
+    else:
+        vals = []
+        for start, count in devmem_addr_runs([int(a, 16) for a in addrs], 4):
+            vals += ub_read_register_list(machine, hex(start), count)
+
+    ret = True
+    for (addr, val), rval in zip(regs, vals):
+        if int(val, 16) != int(rval, 16):
+            tbot.log.message(tbot.log.c(f"verify {addr} failed: {rval} != {val}").red)
+            ret = False
+
+    return ret
+
+
+@tbot.testcase
+def generic_machine_dump_peripheral(
+    typ,
+    machine,
+    regmap,
+    peripheral,
+    filename,
+    index: int = 0,
+    usememtool: bool = False,
+) -> list:
+    """
+    dump and decode all registers of a peripheral.
+
+    The registers of the peripheral are looked up in the registermap
+    regmap, see REGISTERMAP.registermap_peripheral_registers(), and
+    read in bulk: on linux with one devmem2 (or memtool) shell loop,
+    see lx_devmem2_get_list(), in U-Boot contiguous registers are
+    read with one md command, chained into long command lines, see
+    ub_read_register_runs(). All values are decoded into the file
+    filename in one pass.
+
+    Registers are read as 32 bit words, registers which are not
+    32 bit aligned are skipped.
+
+    example:
+
+    .. code-block:: python
+
+        regmap = REGISTERMAP("scripts/registermap/stm32mp157_registers.json")
+        generic_machine_dump_peripheral("linux", lnx, regmap, "I2C2", "i2c2.txt")
+
+    :param typ: values "linux" or "u-boot"
+    :param machine: machine we run on
+    :param regmap: REGISTERMAP of the SoC
+    :param peripheral: name of the peripheral, see
+        REGISTERMAP.registermap_peripheral_registers()
+    :param filename: file to where the decoded registers get stored
+    :param index: index of the peripheral instance
+    :param usememtool: linux only, use memtool instead of devmem2
+    :return: list of tuples (address, value) as hex strings
+    """
+    if typ not in ["linux", "u-boot"]:
+        raise RuntimeError(f"type {typ} not supported.")
+
+    addrs = []
+    for addr, regid in regmap.registermap_peripheral_registers(peripheral, index):
+        if addr % 4:
+            tbot.log.message(tbot.log.c(f"skip unaligned register {hex(addr)}").yellow)
+            continue
+        addrs.append(addr)
+
+    if typ == "linux":
+        vals = lx_devmem2_get_list(machine, [hex(a) for a in addrs], "w", usememtool=usememtool)
+    else:
+        vals = ub_read_register_runs(machine, devmem_addr_runs(addrs, 4))
+
+    regs = [(hex(a), v) for a, v in zip(addrs, vals)]
+    regmap.registermap_dump_registers_file(filename, regs, mode="w")
+    return regs
+
 
 @tbot.testcase
 def lnx_check_cmd(
@@ -508,7 +1110,7 @@ def lnx_get_ipaddr(
             return _lnx_get_ipaddr(lnx, name, ip6)
         except:
             if sleep:
-                time.sleep(sleep)
+                trace_sleep(sleep, f"lnx_get_ipaddr {name}")
             i += 1
 
     raise RuntimeError(f"Could not get ip for device {name}")
@@ -530,7 +1132,7 @@ def lnx_start_bin_with_timeout(
     lnx.exec(linux.Raw(f"{binary} 2>/dev/null 1>/dev/null &"))
     pid = lnx.env("!")
 
-    time.sleep(seconds)
+    trace_sleep(seconds, f"run {binary}")
     lnx.exec("kill", pid, linux.Then, "wait", pid)
 
 
@@ -574,7 +1176,7 @@ def lnx_wait_for_ip(
         except:
             break
 
-        time.sleep(timeout)
+        trace_sleep(timeout, f"lnx_wait_for_ip {name}")
         loop += 1
 
     raise RuntimeError(f"ip on device {name} not found")
@@ -597,7 +1199,7 @@ def lnx_wait_for_file(
         if ret == 0:
             return True
 
-        time.sleep(timeout)
+        trace_sleep(timeout, f"lnx_wait_for_file {name}")
         loop += 1
 
     raise RuntimeError(f"file {name} not found")
@@ -621,7 +1223,7 @@ def lnx_wait_for_module(
             if name in line:
                 return True
 
-        time.sleep(timeout)
+        trace_sleep(timeout, f"lnx_wait_for_module {name}")
         loop += 1
 
     raise RuntimeError(f"module {name} not loaded")
@@ -644,7 +1246,7 @@ def lnx_wait_for_process(
         if ret == 0:
             return True
 
-        time.sleep(timeout)
+        trace_sleep(timeout, f"lnx_wait_for_process {name}")
         loop += 1
 
     raise RuntimeError(f"process {name} not found")
@@ -740,10 +1342,10 @@ def board_wait_for_device(
             # also wait timeoutafter we detect the device, as at least
             # on raspberry pi, device is not always writeable after
             # device appears
-            time.sleep(retry_timeout)
+            trace_sleep(retry_timeout, f"board_wait_for_device {device}")
             return
 
-        time.sleep(retry_timeout)
+        trace_sleep(retry_timeout, f"board_wait_for_device {device}")
         i += 1
 
     raise RuntimeError("Device {device} does not come up")
@@ -933,11 +1535,54 @@ def board_ub_bootcounter(
                 )
 
 
+def i2c_dump_expected(i2c_dump) -> list:
+    """
+    parse the expected i2c dump lines, format see ub_check_i2c_dump()
+
+    :param i2c_dump: list of dumped lines
+    :return: list of lists of (register address, expected value string)
+        for each line, 'xx' values are not returned
+    """
+    ret = []
+    for line in i2c_dump:
+        addr, values, *_ = line.split(":")
+        ad = int(addr, 0)
+        expected = []
+        for v in values.split(" "):
+            if v == "":
+                continue
+            if v != "xx":
+                expected.append((ad, v))
+            ad += 1
+        ret.append(expected)
+
+    return ret
+
+
+def _i2c_dump_compare(dev, address, expected, vals) -> bool:
+    retval = True
+    for ad, v in expected:
+        adh = format(ad, "02x")
+        rval = vals.get(ad)
+        if rval is None or int(rval, 16) != int(v, 16):
+            tbot.log.message(
+                tbot.log.c(
+                    f"diff for device {address} on bus {dev} found @{adh} {rval} != {v}"
+                ).red
+            )
+            retval = False
+
+    return retval
+
+
 @tbot.testcase
 def ub_check_i2c_dump(ub, dev, address, i2c_dump) -> bool:
     """
     check if i2c dump is correct
 
+    Each line of the dump is read with one "i2c md" command
+    and compared afterwards.
+
     :param ub: U-Boot Machine we run
     :param dev: i2c dev number
     :param address: i2c addr
@@ -955,32 +1600,84 @@ def ub_check_i2c_dump(ub, dev, address, i2c_dump) -> bool:
     """
     retval = True
     ub.exec0("i2c", "dev", dev)
-    for line in i2c_dump:
-        addr, values, *_ = line.split(":")
-        values = values.split(" ")
-        ad = int(addr, 0)
-        for v in values:
-            if v == "":
-                continue
-            if v == "xx":
-                ad += 1
-                continue
-            adh = format(ad, "02x")
-            ret = ub.exec0("i2c", "md", address, adh + ".1", "1")
-            rval = ret.split(":")[1]
-            rval = rval.split(" ")[1]
-            if rval != str(v):
-                tbot.log.message(
-                    tbot.log.c(
-                        f"diff for device {address} on bus {dev} found @{adh} {rval} != {v}"
-                    ).red
-                )
-                retval = False
-            ad += 1
+    for expected in i2c_dump_expected(i2c_dump):
+        if len(expected) == 0:
+            continue
+
+        # read from first to last not ignored value of the line
+        first = expected[0][0]
+        count = expected[-1][0] - first + 1
+        ret = ub.exec0("i2c", "md", address, format(first, "02x") + ".1", hex(count))
+        vals = ub_parse_md_output(ret, first, count, 1)
+        vals = dict(zip(range(first, first + count), vals))
+        if not _i2c_dump_compare(dev, address, expected, vals):
+            retval = False
 
     return retval
 
 
+def lnx_parse_i2cdump_output(log: str) -> dict:
+    """
+    parse the output of i2cdump in byte mode
+
+    :param log: output of i2cdump command
+    :return: dictionary register address -> value hex string,
+        registers not read or with read error are not returned
+    """
+    vals = {}
+    for line in log.splitlines():
+        if len(line) < 4 or line[2] != ":":
+            continue
+        try:
+            row = int(line[:2], 16)
+        except ValueError:
+            continue
+        for i in range(16):
+            v = line[4 + 3 * i : 6 + 3 * i]
+            try:
+                vals[row + i] = f"0x{int(v, 16):02x}"
+            except ValueError:
+                # not read or XX read error
+                continue
+
+    return vals
+
+
+@tbot.testcase
+def lnx_check_i2c_dump(
+    lnx: linux.LinuxShell,
+    bus: str,
+    address: str,
+    i2c_dump,
+    force: bool = False,
+) -> bool:
+    """
+    check if i2c dump is correct on linux
+
+    All registers of the device are read with one i2cdump
+    call and compared afterwards.
+
+    :param lnx: linux machine we run on
+    :param bus: i2c bus number
+    :param address: i2c addr
+    :param i2c_dump: list of dumped lines, format see ub_check_i2c_dump()
+    :param force: pass -f to i2cdump, so devices which are already
+        bound to a kernel driver are accessed anyway. Default False.
+    """
+    expected = [e for line in i2c_dump_expected(i2c_dump) for e in line]
+    if len(expected) == 0:
+        return True
+
+    first = min(ad for ad, v in expected)
+    last = max(ad for ad, v in expected)
+    opts = ["-f"] if force else []
+    ret = lnx.exec0(
+        "i2cdump", *opts, "-y", "-r", f"0x{first:02x}-0x{last:02x}", bus, address, "b"
+    )
+    vals = lnx_parse_i2cdump_output(ret)
+    return _i2c_dump_compare(bus, address, expected, vals)
+
+
 # test bootcounter with linux
 @tbot.testcase
 def board_bootcounter_with_linux(
@@ -1067,7 +1764,8 @@ def lnx_check_dmesg(
     ret = True
     if dmesg_strings is not None:
         for s in dmesg_strings:
-            r, out = lnx.exec("dmesg", linux.Pipe, "grep", s)
+            # grep -q, so the dmesg output is not transferred
+            r, out = lnx.exec("dmesg", linux.Pipe, "grep", "-q", "-e", s)
             if r:
                 msg = f"String {s} not in dmesg output."
                 tbot.log.message(tbot.log.c(msg).red)
@@ -1075,7 +1773,7 @@ def lnx_check_dmesg(
 
     if dmesg_false_strings is not None:
         for s in dmesg_false_strings:
-            r, out = lnx.exec("dmesg", linux.Pipe, "grep", s)
+            r, out = lnx.exec("dmesg", linux.Pipe, "grep", "-q", "-e", s)
             if r == 0:
                 msg = f"String {s} in dmesg output. Not allowed"
                 tbot.log.message(tbot.log.c(msg).red)
@@ -1153,6 +1851,8 @@ def lnx_install_package(
     """
     os = lnx.exec0("cat", "/etc/os-release")
 
+    # new tools may be installed now
+    machine_capability_reset(lnx)
     if "debian" in os:
         return common_install_debian(lnx, package)
     elif "Fedora" in os:
@@ -1191,6 +1891,7 @@ def tbot_copy_file_to_board(
     # copy log from lab to board
     lab.exec0(
         "scp",
+        *sshmux_lab_args(lab),
         "-o",
         "StrictHostKeyChecking=no",
         "-o",
@@ -1229,6 +1930,7 @@ def tbot_start_script_on_board(
     # copy log from lab to board
     lab.exec0(
         "scp",
+        *sshmux_lab_args(lab),
         "-o",
         "StrictHostKeyChecking=no",
         "-o",
@@ -1278,6 +1980,7 @@ def tbot_start_script_on_lab(
     # copy log to lab
     lab.exec0(
         "scp",
+        *sshmux_lab_args(lab),
         "-o",
         "StrictHostKeyChecking=no",
         "-o",
@@ -1289,8 +1992,7 @@ def tbot_start_script_on_lab(
     with tbot.ctx() as cx:
         host = cx.request(tbot.role.LocalHost)
         copy = False
-        ret, out = lab.exec("ls", "-1", scrp)
-        if ret != 0:
+        if not lab_is_file(lab, scrp):
             if labtbottestcasepath is None:
                 raise RuntimeError(
                     f"could not install {scriptname}, please set labtbottestcasepath"
@@ -1309,23 +2011,15 @@ def tbot_start_script_on_lab(
                 linux.Raw('" "'),
                 "-f",
                 linux.Raw('"1"'),
-            )
-            sumlab = lab.exec0(
-                "md5sum",
-                scrp,
-                linux.Pipe,
-                "cut",
-                "-d",
-                linux.Raw('" "'),
-                "-f",
-                linux.Raw('"1"'),
-            )
+            ).strip()
+            sumlab = lab_file_hash(lab, scrp)
             if sumorg != sumlab:
                 copy = True
 
         if copy:
             host.exec0(
                 "scp",
+                *sshmux_local_args(lab.name),
                 "-o",
                 "StrictHostKeyChecking=no",
                 "-o",
@@ -1334,7 +2028,7 @@ def tbot_start_script_on_lab(
                 f"{lab.username}@{lab.hostname}:{scrp}",
             )
 
-    ret, out = lab.exec(scrp, "-i", lfp)
+    ret, out = lab_exec(lab, scrp, "-i", lfp)
     if ret != 0:
         lnx.interactive()
 
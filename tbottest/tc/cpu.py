@@ -2,6 +2,9 @@ import tbot
 from tbot.machine import linux
 from tbot.context import Optional
 
+from tbottest.common.utils import machine_capability
+from tbottest.tc.common import lx_exec_batch
+
 
 @tbot.testcase
 def board_lnx_cpufreq(
@@ -32,8 +35,8 @@ def board_lnx_cpufreq(
         if lnx is None:
             lnx = cx.request(tbot.role.BoardLinux)
 
-        for c in cpufreq:
-            out = lnx.exec0("cat", c["file"])
+        ret = lx_exec_batch(lnx, [("cat", c["file"]) for c in cpufreq], check=True)
+        for c, (rc, out) in zip(cpufreq, ret):
             if c["val"] not in out:
                 raise RuntimeError(f'{c["val"]} not found in {c["file"]}')
 
@@ -53,19 +56,24 @@ def generic_get_socname(
 
     :param lnx: linux machine where we run
 
+    The result is cached for the boot session, see machine_capability()
+
     :return: see above table, if SoC could not be detected "not detected"
     """
     with tbot.ctx() as cx:
         if lnx is None:
             lnx = cx.request(tbot.role.BoardLinux)
 
-        # Try through device-tree
-        try:
-            log = lnx.exec0("cat", "/proc/device-tree/soc@0/compatible")
-            print("LOG ", log)
-            if "fsl,imx8mp-soc" in log:
-                return "imx8mp"
-        except:
-            pass
+        return machine_capability(lnx, "socname", lambda: _generic_probe_socname(lnx))
+
+
+def _generic_probe_socname(lnx: linux.LinuxShell) -> str:
+    # Try through device-tree
+    try:
+        log = lnx.exec0("cat", "/proc/device-tree/soc@0/compatible")
+        if "fsl,imx8mp-soc" in log:
+            return "imx8mp"
+    except:
+        pass
 
     return "not detected"
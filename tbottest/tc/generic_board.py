@@ -1,14 +1,17 @@
+import os
+import re
 import tbot
 from tbot.machine import linux
 from tbot.context import Optional
 
 from tbottest.boardgeneric import cfggeneric
+from tbottest.tc.common import generic_machine_dump_peripheral
 from tbottest.tc.common import lnx_check_beeper
 from tbottest.tc.common import lnx_check_cmd
 from tbottest.tc.common import lnx_check_dmesg
 from tbottest.tc.common import lnx_check_revfile
 from tbottest.tc.common import lnx_create_revfile
-from tbottest.tc.common import lx_devmem2_get
+from tbottest.tc.common import lx_devmem2_get_list
 from tbottest.tc.cpu import generic_get_socname
 from tbottest.tc.network import lnx_network_ping
 from tbottest.tc.network import network_linux_iperf
@@ -16,6 +19,7 @@ from tbottest.tc.kas import KAS
 from tbottest.tc.leds import lnx_test_led_simple
 from tbottest.tc.generictestdef import TC_SKIP, TC_FAIL, TC_OKAY, require_cfg
 from tbottest.tc.registermap import REGISTERMAP
+from tbottest.tc.regsnapshot import REGSNAPSHOT
 
 cfg = cfggeneric
 
@@ -89,6 +93,7 @@ def generic_lnx_create_dump_files(
                 "readtype":"readtype of devmem2 command", \n
                 "difffile":"file which gets created when there are differences (Set to None to disable it)", \n
                 "timeout":"timeout between devmem2 calls (set to None to disable it)" \n
+                "snapshotdb":"optional, sqlite database in which the revfile is also stored" \n
                 }]
 
     example:
@@ -129,6 +134,21 @@ def generic_lnx_create_dump_files(
                 config["mask"],
                 config["readtype"],
             )
+            if config.get("snapshotdb", None) not in [None, "None"]:
+                db = REGSNAPSHOT(config["snapshotdb"])
+                db.snapshot_add_file(lnx.name, config["revfile"])
+                db.close()
+
+
+def _generic_registermap_path(sourcepath, socname) -> str:
+    # json registermap, or one imported from CMSIS-SVD / IP-XACT
+    for suffix in ["json", "svd", "xml"]:
+        name = f"{socname}_registers.{suffix}"
+        registerfilepath = f"{sourcepath}/scripts/registermap/{name}"
+        if os.path.exists(registerfilepath):
+            break
+    return registerfilepath
+
 
 @tbot.testcase
 @require_cfg(cfg.regdump)
@@ -161,20 +181,59 @@ def generic_lx_dump_register(
             tbot.log.message(tbot.log.c(f"SoC not detected, please add in generic_get_socname").yellow)
             return TC_SKIP
 
-        name = f"{socname}_registers.json"
-        registerfilepath = f"{sourcepath}/scripts/registermap/{name}"
-        regmap = REGISTERMAP(registerfilepath)
+        regmap = REGISTERMAP(_generic_registermap_path(sourcepath, socname))
         outputpath = f"{workpath}/generic_registerdump.txt"
         local.exec0("rm", "-rf", outputpath)
-        for dump in cfg.regdump:
-            address = dump["address"]
-            #val = ub_read_register(ub, address)
-            val = lx_devmem2_get(lnx, address, "w")
-            regmap.registermap_dump_register_file(outputpath, address, val)
+        addrs = [dump["address"] for dump in cfg.regdump]
+        vals = lx_devmem2_get_list(lnx, addrs, "w")
+        regmap.registermap_dump_registers_file(outputpath, zip(addrs, vals))
 
         tbot.log.message(tbot.log.c(f"Register dumped to file {outputpath}").green)
 
 
+@tbot.testcase
+@require_cfg(cfg.regdump_peripherals)
+def generic_lx_dump_peripheral(
+    lnx: Optional[linux.LinuxShell] = None,
+) -> bool:  # noqa: D107
+    """
+    Dump and decode all registers of the configured peripherals on
+    lnx machine, see generic_machine_dump_peripheral(), and save them
+    on local hosts workdir in file "generic_peripheraldump_{name}_{index}.txt".
+    Characters of name, which are not letters, digits, "_" or "-" are
+    replaced with "_" in the filename.
+
+    :param lnx: Linux machine we run on
+
+    Uses config variables:
+
+    regdump_peripherals -- list of dictionary, index is optional
+
+    .. code-block:: python
+
+        regdump_peripherals = [{"name":"I2C2"}, {"name":"USART", "index":"1"}]
+    """
+    with tbot.ctx() as cx:
+        if lnx is None:
+            lnx = cx.request(tbot.role.BoardLinux)
+
+        local = cx.request(tbot.role.LocalHost)
+        sourcepath = local.sourcedir()._local_str()
+        workpath = local.workdir()._local_str()
+        socname = generic_get_socname(lnx)
+        if "not detected" in socname:
+            tbot.log.message(tbot.log.c("SoC not detected, please add in generic_get_socname").yellow)
+            return TC_SKIP
+
+        regmap = REGISTERMAP(_generic_registermap_path(sourcepath, socname))
+        for per in cfg.regdump_peripherals:
+            index = per.get("index", "0")
+            name = re.sub(r"[^A-Za-z0-9_-]", "_", f"{per['name']}_{index}")
+            outputpath = f"{workpath}/generic_peripheraldump_{name}.txt"
+            generic_machine_dump_peripheral("linux", lnx, regmap, per["name"], outputpath, index)
+            tbot.log.message(tbot.log.c(f"Peripheral {per['name']} dumped to file {outputpath}").green)
+
+
 @tbot.testcase
 @require_cfg(cfg.iperf)
 def generic_lnx_network_iperf(
@@ -362,6 +421,7 @@ def generic_lnx_test_led(
 
 lnxtestcases = [
     "generic_lx_dump_register",
+    "generic_lx_dump_peripheral",
     "generic_lnx_network_iperf",
     "generic_lnx_network_ping",
     "generic_lnx_test_beep",
@@ -3,11 +3,13 @@
 # may go into mainline
 #
 import tbot
-import time
 from typing import List
 from tbot.machine import linux
 from tbot.context import Optional
 
+from tbottest.tc.common import lx_exec_batch
+from tbottest.common.trace import trace_sleep
+
 
 @tbot.testcase
 def lnx_test_led_simple(
@@ -40,18 +42,28 @@ def lnx_test_led_simple(
         if lnx is None:
             lnx = cx.request(tbot.role.BoardLinux)
 
-        for led in leds:
-            bp = f'{led["path"]}/brightness'
-            out = lnx.exec0("cat", bp)
+        # all leds are tested at once, each step is one round trip
+        bps = [f'{led["path"]}/brightness' for led in leds]
+        ret = lx_exec_batch(lnx, [("cat", bp) for bp in bps], check=True)
+        for led, (rc, out) in zip(leds, ret):
             if led["bootval"] not in out:
                 raise RuntimeError(f'{led["bootval"]} not found in {out}')
 
-            lnx.exec0("echo", led["onval"], linux.Raw(">"), bp)
+        lx_exec_batch(
+            lnx,
+            [("echo", led["onval"], linux.Raw(">"), bp) for led, bp in zip(leds, bps)],
+            check=True,
+        )
 
-            time.sleep(1)
+        trace_sleep(1, "leds on")
 
-            out = lnx.exec0("cat", bp)
+        ret = lx_exec_batch(lnx, [("cat", bp) for bp in bps], check=True)
+        for led, (rc, out) in zip(leds, ret):
             if led["onval"] not in out:
                 raise RuntimeError(f'{led["onval"]} not found in {out}')
 
-            lnx.exec0("echo", led["bootval"], linux.Raw(">"), bp)
+        lx_exec_batch(
+            lnx,
+            [("echo", led["bootval"], linux.Raw(">"), bp) for led, bp in zip(leds, bps)],
+            check=True,
+        )
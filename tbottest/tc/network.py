@@ -1,8 +1,9 @@
 import tbot
-import time
 from tbot.machine import linux
 import math
 
+from tbottest.common.utils import machine_capability
+from tbottest.common.trace import trace_sleep
 from tbottest.tc.common import lnx_install_package
 
 
@@ -41,10 +42,15 @@ def _check_iperf_installed(
     """
     check if iperf3 is installed on lnx machine
 
-    If try_install try to install it if not
+    If try_install try to install it if not. The result is cached
+    for the boot session, see machine_capability()
     """
-    ret, out = lnx.exec("iperf3", "-v")
-    if not ret:
+
+    def probe():
+        ret, out = lnx.exec("iperf3", "-v")
+        return not ret
+
+    if machine_capability(lnx, "cmd:iperf3", probe):
         return True
 
     if not try_install:
@@ -109,12 +115,12 @@ def network_linux_iperf(
         # lnxh.exec0(toolname, "-s", linux.Background)
         lnxh.exec(linux.Raw(f"{toolname} -s 2>/dev/null 1>/dev/null &"))
         # lnxh.ch.sendline(f"{toolname} -s 2>&1 1>/dev/null &")
-        time.sleep(3)
+        trace_sleep(3, f"start {toolname} server")
         # lnxh.ch.read_until_prompt()
         # wait as command has some output
         pid = lnxh.env("!")
         # lnxh.ch.sendline("iperf -s &")
-        time.sleep(1)
+        trace_sleep(1, f"start {toolname} server")
 
     # log_event.doc_tag("iperf_minval", minval)
     # log_event.doc_tag("iperf_cycles", cycles)
@@ -1,8 +1,9 @@
 import tbot
-import time
 from tbot.machine import linux
 
+from tbottest.common.utils import machine_capability
 from tbottest.common.utils import string_to_dict
+from tbottest.common.trace import trace_sleep
 
 
 def process_get_gnuplot_work_and_configpath(
@@ -280,7 +281,7 @@ def lnx_measure_process(
         new = {"loop": i, "values": resultnew}
         result.append(new)
 
-        time.sleep(intervall)
+        trace_sleep(intervall, "ps interval")
         i += 1
 
     return result
@@ -292,12 +293,15 @@ def is_busybox(
 ) -> bool:  # noqa: D107
     """
     detect if we have a busybox version of command ```cmd```
+
+    The result is cached for the boot session, see machine_capability()
     """
-    ret, log = lnx.exec(linux.Raw(f"ls -al {cmd} | grep busybox"))
-    if ret == 0:
-        return True
 
-    return False
+    def probe():
+        ret, log = lnx.exec(linux.Raw(f"ls -al {cmd} | grep busybox"))
+        return ret == 0
+
+    return machine_capability(lnx, f"busybox:{cmd}", probe)
 
 
 def lnx_measure_top(
@@ -1,13 +1,432 @@
+import bisect
+import hashlib
 import json
+import mmap
+import os
+import struct
+import sys
+from array import array
 from pathlib import Path
 
 try:
     import tbot
 except:
-    print("tbot lib not found, some functions will fail")
+    # stderr, regdump.py writes its result to stdout
+    print("tbot lib not found, some functions will fail", file=sys.stderr)
     pass
 
 from tbottest.tc.common_generic import get_bit_range
+from tbottest.tc.registermap_xml import registermap_import_xml, registermap_is_xml
+
+# compiled registermap cache file format
+#
+# header, then REGMAP_SECTIONS sections of 8 byte aligned data, each
+# described by (offset, length) in the section table after the header.
+# All int sections are native int64 arrays, strings are interned in
+# one string table (offsets + utf-8 blob) and every register is stored
+# as compact json blob, which is only decoded when the register is used.
+REGMAP_CACHE_SUFFIX = ".regcache"
+REGMAP_CACHE_MAGIC = b"TBRMAP05"
+REGMAP_CACHE_HEADER = struct.Struct("=8sq32sqqI")
+REGMAP_CACHE_BYTEORDER = 0x0102030405060708
+
+# separator line of a register in the text dump, see
+# REGISTERMAP.registermap_dump_register_file()
+REGMAP_DUMP_SEPARATOR = "------------------------------------------------------------------------------\n"
+
+# layout of the registermap of the SoCs, see REGISTERMAP. Registermaps
+# imported from CMSIS-SVD or IP-XACT files always use the peripheral layout
+REGMAP_LAYOUT_NXP = "nxp"
+REGMAP_LAYOUT_PERIPHERAL = "peripheral"
+REGMAP_SOC_LAYOUT = {
+    "imx8mp": REGMAP_LAYOUT_NXP,
+    "stm32mp157": REGMAP_LAYOUT_PERIPHERAL,
+}
+
+REGMAP_KIND_FIXED = 0
+REGMAP_KIND_CYCLIC = 1
+REGMAP_KIND_OFFSET = 2
+
+REGMAP_SECTIONS = (
+    "str_offsets",
+    "str_data",
+    "reg_name",
+    "reg_page",
+    "reg_kind",
+    "reg_addr",
+    "reg_step",
+    "reg_last",
+    "reg_map",
+    "reg_blob",
+    "reg_field",
+    "field_name",
+    "field_range",
+    "field_shift",
+    "field_width",
+    "map_name",
+    "per_start",
+    "per_end",
+    "per_map",
+    "per_name",
+    "blob_data",
+)
+REGMAP_BYTE_SECTIONS = ("str_data", "blob_data")
+
+# decode values with numpy, if available and at least this
+# count of values get decoded at once
+REGMAP_NUMPY_MIN_VALUES = 64
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _bit_range_shift_width(bit_range: str) -> tuple:
+    """
+    convert a bit range string from the registermap, as it is
+    accepted from get_bit_range(), into shift and width.
+
+    :param bit_range: bit range string, example "3", "31-27" or "31:24"
+    :return: tuple (shift, width), (-1, 0) if bit_range is not valid
+    """
+    tmp = bit_range.strip()
+    for sep in ("-", ":"):
+        if sep in tmp:
+            parts = tmp.split(sep)
+            break
+    else:
+        parts = [tmp, tmp]
+
+    try:
+        start_bit, end_bit = map(int, parts)
+    except ValueError:
+        return (-1, 0)
+
+    if start_bit < 0 or end_bit < 0:
+        return (-1, 0)
+
+    return (min(start_bit, end_bit), abs(start_bit - end_bit) + 1)
+
+
+def _registermap_normalize(data) -> dict:
+    """
+    normalize the json registermap of NXP or STM32MP157 format into
+    the int64 tables of the compiled registermap cache.
+
+    :param data: loaded json registermap
+    :return: dictionary with an array for each section
+    """
+    tables = {name: array("q") for name in REGMAP_SECTIONS}
+    strings = []
+    stringids = {}
+    blob = bytearray()
+
+    def sid(string) -> int:
+        if string not in stringids:
+            stringids[string] = len(strings)
+            strings.append(string)
+        return stringids[string]
+
+    def page(reg) -> int:
+        try:
+            return int(reg["page"])
+        except (KeyError, TypeError, ValueError):
+            return -1
+
+    def add_register(name, kind, addr, step, last, mapid, reg) -> None:
+        tables["reg_name"].append(sid(name))
+        tables["reg_page"].append(page(reg))
+        tables["reg_kind"].append(kind)
+        tables["reg_addr"].append(addr)
+        tables["reg_step"].append(step)
+        tables["reg_last"].append(last)
+        tables["reg_map"].append(mapid)
+        tables["reg_blob"].append(len(blob))
+        tables["reg_field"].append(len(tables["field_name"]))
+        for bit in reg.get("bits", []):
+            bitrange = bit.get("range", "")
+            shift, width = _bit_range_shift_width(bitrange)
+            tables["field_name"].append(sid(bit.get("field", "")))
+            tables["field_range"].append(sid(bitrange))
+            tables["field_shift"].append(shift)
+            tables["field_width"].append(width)
+        blob.extend(json.dumps(reg, ensure_ascii=False, separators=(",", ":")).encode())
+
+    if isinstance(data, list) and data and "peripheralmaps" in data[0]:
+        # STM32MP157 format
+        for r in data[1]["registermaps"]:
+            mapid = len(tables["map_name"])
+            tables["map_name"].append(sid(r["mapname"]))
+            for reg in r["registers"]:
+                off = int(reg["offset"], 16)
+                add_register(reg["registername"], REGMAP_KIND_OFFSET, off, 0, off, mapid, reg)
+
+        for p in data[0]["peripheralmaps"]:
+            start_str, end_str = p["range"].split(" - ")
+            tables["per_start"].append(int(start_str, 16))
+            tables["per_end"].append(int(end_str, 16))
+            tables["per_map"].append(sid(p["peripheralmap"]))
+            tables["per_name"].append(sid(p["peripheral"]))
+    else:
+        # NXP format
+        for reg in data:
+            if reg["address"]:
+                addr = int(reg["address"], 16)
+                add_register(reg["register"], REGMAP_KIND_FIXED, addr, 0, addr, -1, reg)
+            elif reg["address_cyclic"]:
+                tmp = reg["address_cyclic"]
+                first = int(tmp["base"], 16) + int(tmp["offset"], 16)
+                step = tmp["step"]
+                start = first + step * tmp["start"]
+                last = first + step * tmp["end"]
+                add_register(reg["register"], REGMAP_KIND_CYCLIC, start, step, last, -1, reg)
+            else:
+                add_register(reg["register"], REGMAP_KIND_FIXED, -1, 0, -1, -1, reg)
+
+    tables["reg_blob"].append(len(blob))
+    tables["reg_field"].append(len(tables["field_name"]))
+    tables["blob_data"] = bytes(blob)
+
+    strdata = bytearray()
+    for string in strings:
+        tables["str_offsets"].append(len(strdata))
+        strdata.extend(string.encode())
+    tables["str_offsets"].append(len(strdata))
+    tables["str_data"] = bytes(strdata)
+
+    return tables
+
+
+def _registermap_compile(data, digest: bytes, stat: os.stat_result) -> bytes:
+    """
+    compile the json registermap data into the cache file format
+
+    :param data: loaded json registermap
+    :param digest: sha256 digest of the json file
+    :param stat: os.stat() result of the json file
+    :return: content of the cache file
+    """
+    tables = _registermap_normalize(data)
+    sectiontable = struct.Struct(f"={2 * len(REGMAP_SECTIONS)}q")
+    offset = REGMAP_CACHE_HEADER.size + sectiontable.size
+    sections = []
+    payload = bytearray()
+    for name in REGMAP_SECTIONS:
+        raw = tables[name] if name in REGMAP_BYTE_SECTIONS else tables[name].tobytes()
+        payload.extend(b"\0" * (-(offset + len(payload)) % 8))
+        sections.extend([offset + len(payload), len(raw)])
+        payload.extend(raw)
+
+    header = REGMAP_CACHE_HEADER.pack(
+        REGMAP_CACHE_MAGIC,
+        REGMAP_CACHE_BYTEORDER,
+        digest,
+        stat.st_mtime_ns,
+        stat.st_size,
+        len(REGMAP_SECTIONS),
+    )
+    return header + sectiontable.pack(*sections) + bytes(payload)
+
+
+class _RegisterMapStore:
+    """
+    read only view onto a compiled registermap.
+
+    All tables are memoryviews into the (memory mapped) cache
+    content, strings and registers are only decoded on access.
+
+    :param buf: content of the compiled registermap
+    """
+
+    def __init__(self, buf) -> None:
+        self.buf = buf
+        magic, order, self.digest, self.mtime, self.size, count = REGMAP_CACHE_HEADER.unpack_from(buf)
+        if magic != REGMAP_CACHE_MAGIC or order != REGMAP_CACHE_BYTEORDER:
+            raise ValueError("invalid registermap cache")
+        if count != len(REGMAP_SECTIONS):
+            raise ValueError("invalid registermap cache")
+
+        sections = struct.unpack_from(f"={2 * count}q", buf, REGMAP_CACHE_HEADER.size)
+        for i in range(count):
+            if sections[2 * i] + sections[2 * i + 1] > len(buf):
+                raise ValueError("truncated registermap cache")
+
+        self.view = memoryview(buf)
+        for i, name in enumerate(REGMAP_SECTIONS):
+            offset, length = sections[2 * i], sections[2 * i + 1]
+            section = self.view[offset:offset + length]
+            if name not in REGMAP_BYTE_SECTIONS:
+                section = section.cast("q")
+            setattr(self, name, section)
+
+        self.strings = {}
+        self.registers = {}
+
+    def __len__(self) -> int:
+        return len(self.reg_name)
+
+    def string(self, sid: int) -> str:
+        """
+        return interned string with id sid
+        """
+        if sid not in self.strings:
+            start, end = self.str_offsets[sid], self.str_offsets[sid + 1]
+            self.strings[sid] = bytes(self.str_data[start:end]).decode()
+        return self.strings[sid]
+
+    def register(self, regid: int) -> dict:
+        """
+        return the registermap entry of register regid, decoded
+        from the json blob on first access.
+        """
+        if regid not in self.registers:
+            start, end = self.reg_blob[regid], self.reg_blob[regid + 1]
+            self.registers[regid] = json.loads(bytes(self.blob_data[start:end]))
+        return self.registers[regid]
+
+    def close(self) -> None:
+        for name in REGMAP_SECTIONS:
+            getattr(self, name).release()
+        self.view.release()
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+
+def _registermap_open_cache(cachename: Path):
+    """
+    open a compiled registermap with mmap
+
+    :return: _RegisterMapStore or None, if cache could not be used
+    """
+    try:
+        with open(cachename, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        return _RegisterMapStore(buf)
+    except (ValueError, TypeError, struct.error):
+        buf.close()
+        return None
+
+
+def registermap_open_store(mapname: str, usecache: bool = True):
+    """
+    open the registermap mapname through its compiled cache file,
+    which is stored next to the json file with suffix ``.regcache``.
+    CMSIS-SVD and IP-XACT files (suffix .svd or .xml) are imported
+    with registermap_import_xml().
+
+    The cache gets (re)build when it does not exist, or when the
+    json file changed (mtime, size and sha256 hash are checked).
+    If the cache file cannot be written, the compiled registermap
+    is only hold in memory.
+
+    :param mapname: path to the json registermap file
+    :param usecache: set to False to ignore the cache file
+    :return: _RegisterMapStore
+    """
+    jsonpath = Path(mapname)
+    cachename = jsonpath.with_suffix(REGMAP_CACHE_SUFFIX)
+    stat = jsonpath.stat()
+
+    store = _registermap_open_cache(cachename) if usecache else None
+    if store is not None:
+        if store.mtime == stat.st_mtime_ns and store.size == stat.st_size:
+            return store
+
+    xml = registermap_is_xml(jsonpath)
+    if xml:
+        # xml files are parsed incrementally, so do not read them at once
+        h = hashlib.sha256()
+        with open(jsonpath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.digest()
+    else:
+        with open(jsonpath, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).digest()
+
+    if store is not None:
+        if store.digest == digest:
+            # only timestamp changed, update it in the cache header
+            try:
+                with open(cachename, "r+b") as f:
+                    f.write(
+                        REGMAP_CACHE_HEADER.pack(
+                            REGMAP_CACHE_MAGIC,
+                            REGMAP_CACHE_BYTEORDER,
+                            digest,
+                            stat.st_mtime_ns,
+                            stat.st_size,
+                            len(REGMAP_SECTIONS),
+                        )
+                    )
+            except OSError:
+                pass
+            return store
+        store.close()
+
+    data = registermap_import_xml(jsonpath) if xml else json.loads(raw)
+    content = _registermap_compile(data, digest, stat)
+    if usecache:
+        tmpname = cachename.with_name(f"{cachename.name}.{os.getpid()}")
+        try:
+            with open(tmpname, "wb") as f:
+                f.write(content)
+            os.replace(tmpname, cachename)
+            store = _registermap_open_cache(cachename)
+            if store is not None:
+                return store
+        except OSError:
+            try:
+                os.unlink(tmpname)
+            except OSError:
+                pass
+
+    return _RegisterMapStore(content)
+
+
+class _IntervalIndex:
+    """
+    sorted interval list for fast address range lookups.
+
+    Intervals are added with add() and the index gets
+    sorted with build(). Overlapping intervals are allowed,
+    find() returns all items which contain the address in
+    the order they were added.
+    """
+
+    def __init__(self) -> None:
+        self.intervals = []
+        self.starts = []
+        self.maxends = []
+
+    def add(self, start: int, end: int, item) -> None:
+        self.intervals.append((start, end, len(self.intervals), item))
+
+    def build(self) -> None:
+        self.intervals.sort(key=lambda i: (i[0], i[2]))
+        self.starts = [i[0] for i in self.intervals]
+        self.maxends = []
+        maxend = -1
+        for i in self.intervals:
+            maxend = max(maxend, i[1])
+            self.maxends.append(maxend)
+
+    def find(self, address: int) -> list:
+        found = []
+        pos = bisect.bisect_right(self.starts, address) - 1
+        while pos >= 0 and self.maxends[pos] >= address:
+            start, end, order, item = self.intervals[pos]
+            if address <= end:
+                found.append((order, item))
+            pos -= 1
+
+        return [item for order, item in sorted(found, key=lambda f: f[0])]
 
 
 class REGISTERMAP:
@@ -16,6 +435,8 @@ class REGISTERMAP:
     the bits from a registermap.
 
     :param mapname: name of the registermap file
+    :param socname: name of the SoC, if None detected from the filename,
+        example imx8mp_registers.json -> imx8mp
 
     registermap format for NXP is
 
@@ -137,29 +558,73 @@ class REGISTERMAP:
         │   ├─--------
 
 
+    Instead of a json file, mapname can also be a CMSIS-SVD (.svd) or
+    IP-XACT (.xml) file, as many SoC vendors provide them. They get
+    imported in the STM32MP157 format, each peripheral with its own
+    registermap, see :py:func:`tbottest.tc.registermap_xml.registermap_import_xml`
+
+    .. code-block:: python
+
+        regmap = REGISTERMAP("STM32F429_registers.svd")
+
     There are also helper script in `scripts/registermap <https://github.com/hsdenx/tbottest/tree/master/scripts/registermap>`_
     with which you can generate such a mapping from a reference manual.
 
+    On first use the json file gets compiled into a cache file with
+    suffix ``.regcache`` next to the json file (for example
+    ``imx8mp_registers.regcache``), which gets memory mapped on later
+    loads. The cache is rebuild automatically when the json file changes.
+
     """
 
     def __init__(self, mapname: str, socname: str = None) -> None:
         self.mapname = mapname
+        self.socname = socname
         if socname == None:
             # Try to get socname from filename
             self.socname = Path(self.mapname).name
+            if registermap_is_xml(self.mapname):
+                self.socname = Path(self.mapname).stem
             self.socname = self.socname.split("_")[0]
 
-        self.registermap = None
+        if registermap_is_xml(self.mapname):
+            self.layout = REGMAP_LAYOUT_PERIPHERAL
+        else:
+            self.layout = REGMAP_SOC_LAYOUT.get(self.socname)
+
+        self.store = None
+        self._registermap = None
+        self.name_index = None
+        self.field_index = None
+        self.fields_cache = {}
         self.register_load_map()
+        self.register_build_index()
+
+    @property
+    def registermap(self):
+        """
+        the registermap as loaded from the json file.
+
+        Only loaded on first access, as all REGISTERMAP functions
+        work on the compiled registermap in self.store
+        """
+        if self._registermap is None:
+            if registermap_is_xml(self.mapname):
+                self._registermap = registermap_import_xml(self.mapname)
+            else:
+                with open(self.mapname, "r", encoding="utf-8") as f:
+                    self._registermap = json.load(f)
+
+        return self._registermap
 
     def get_registername_from_dict(self) -> str:
         """
         return the name of the registername field in the
         dictionary for the SoC.
         """
-        if self.socname == "imx8mp":
+        if self.layout == REGMAP_LAYOUT_NXP:
             return "register"
-        elif self.socname == "stm32mp157":
+        elif self.layout == REGMAP_LAYOUT_PERIPHERAL:
             return "registername"
 
         raise RuntimeError(
@@ -167,127 +632,289 @@ class REGISTERMAP:
         )
 
 
+    def register_build_name_index(self) -> None:
+        """
+        build the hash indexes for searching registers by name
+        or by bitfield name. They get build on first use, see
+        registername_to_address() and registermap_search_field()
+
+        name_index      -- registername -> list of register ids
+        field_index     -- bitfield name -> list of register ids
+        permap_instance -- mapname -> ordered list of peripheral ids
+        """
+        store = self.store
+        self.name_index = {}
+        self.field_index = {}
+        for regid in range(len(store)):
+            name = store.string(store.reg_name[regid])
+            self.name_index.setdefault(name, []).append(regid)
+            for f in range(store.reg_field[regid], store.reg_field[regid + 1]):
+                field = store.string(store.field_name[f])
+                regids = self.field_index.setdefault(field, [])
+                if not regids or regids[-1] != regid:
+                    regids.append(regid)
+
+        self.permap_instance = {}
+        for i in range(len(store.per_map)):
+            self.permap_instance.setdefault(store.per_map[i], []).append(i)
+
     def registername_to_address(self, name, index) -> str:
         """
         converts registername to address
+
+        For STM32MP157 index is the index of the peripheral
+        instance (for example 1 for the second I2C controller)
+
+        For imx8mp index is the index n of a cyclic register,
+        for registers with fixed address only index 0 is valid.
+
+        :param name: name of the register
+        :param index: index of the peripheral instance
+        :return: address as hex string
         """
-        permaps = self.registermap[0]["peripheralmaps"]
-        regmaps = self.registermap[1]["registermaps"]
-        # search register map
-        fmap = None
-        for m in regmaps:
-            registers = m["registers"]
-            for r in registers:
-                if r["registername"] == name:
-                    fmap = m
-                    break
-            if fmap:
-                break
+        if self.name_index is None:
+            self.register_build_name_index()
 
-        if not fmap:
+        store = self.store
+        regids = self.name_index.get(name)
+        if not regids:
             raise RuntimeError(f"Could not find register {name}")
 
-        # search peripjeral map
-        i = 0
-        for p in permaps:
-            if p["peripheralmap"] == fmap["mapname"]:
-                # one found
-                if i == int(index):
-                    start_str, end_str = p["range"].split(" - ")
-                    start = int(start_str, 16)
-                    offset_str = r["offset"]
-                    offset = int(offset_str, 16)
-                    addr = start + offset
-                    return f"0x{addr:08x}"
+        regid = regids[0]
+        index = int(index)
+        kind = store.reg_kind[regid]
+        if kind == REGMAP_KIND_OFFSET:
+            mapsid = store.map_name[store.reg_map[regid]]
+            instances = self.permap_instance.get(mapsid, [])
+            if index < 0 or index >= len(instances):
+                raise RuntimeError(f"Could not find peripheralmap index {index}")
 
-                i += 1
+            addr = store.per_start[instances[index]] + store.reg_addr[regid]
+        elif kind == REGMAP_KIND_CYCLIC:
+            tmp = store.register(regid)["address_cyclic"]
+            if index < tmp["start"] or index > tmp["end"]:
+                raise RuntimeError(f"Could not find index {index} for register {name}")
 
-        raise RuntimeError(f"Could not find peripheralmap index {index}")
+            addr = int(tmp["base"], 16) + int(tmp["offset"], 16) + tmp["step"] * index
+        else:
+            if index != 0 or store.reg_addr[regid] < 0:
+                raise RuntimeError(f"Could not find index {index} for register {name}")
 
+            addr = store.reg_addr[regid]
+
+        return f"0x{addr:08x}"
+
+    def registermap_peripheral_registers(self, name, index=0) -> list:
+        """
+        return all registers of a peripheral, sorted by address
+
+        For STM32MP157 (and registermaps imported from xml files) name
+        is the name of the peripheral (for example "I2C2") or the name
+        of the peripheral registermap (for example "I2C registers"),
+        then index selects the peripheral instance.
+
+        For imx8mp name is the start of the register names of the
+        block (for example "IOMUXC_SW_PAD_CTL_PAD"), cyclic registers
+        are returned for all indexes n.
+
+        :param name: peripheral name, see above
+        :param index: index of the peripheral instance
+        :return: list of tuples (address (int), register id)
+        """
+        store = self.store
+        index = int(index)
+        regs = {}
+        if self.layout == REGMAP_LAYOUT_PERIPHERAL:
+            perid = None
+            for i in range(len(store.per_name)):
+                if store.string(store.per_name[i]) == name:
+                    perid = i
+                    break
+            else:
+                instances = [
+                    i
+                    for i in range(len(store.per_map))
+                    if store.string(store.per_map[i]) == name
+                ]
+                if 0 <= index < len(instances):
+                    perid = instances[index]
+            if perid is None:
+                raise RuntimeError(f"Could not find peripheral {name} index {index}")
+
+            base = store.per_start[perid]
+            for offset, regid in self.regmap_index.get(store.per_map[perid], {}).items():
+                regs[base + offset] = regid
+            if not regs:
+                raise RuntimeError(f"No registers found for peripheral {name}")
+        elif self.layout == REGMAP_LAYOUT_NXP:
+            for regid in range(len(store)):
+                if not store.string(store.reg_name[regid]).startswith(name):
+                    continue
+                if store.reg_addr[regid] < 0:
+                    continue
+                step = max(store.reg_step[regid], 1)
+                for addr in range(store.reg_addr[regid], store.reg_last[regid] + 1, step):
+                    regs.setdefault(addr, regid)
+            if not regs:
+                raise RuntimeError(f"Could not find registers starting with {name}")
+        else:
+            raise RuntimeError(f"Soc {self.socname} not yet supported")
+
+        return sorted(regs.items())
+
+    def registermap_search_field(self, field: str) -> list:
+        """
+        search all registers, which have a bitfield with name field
+
+        :param field: name of the bitfield
+        :return: list of registermap entries, in order of the registermap
+        """
+        if self.field_index is None:
+            self.register_build_name_index()
+
+        return [self.store.register(regid) for regid in self.field_index.get(field, [])]
 
     def register_load_map(self) -> bool:
         """
         load the register map and analyse it.
+
+        The json file gets compiled into a cache file next
+        to it, see registermap_open_store()
         """
-        with open(self.mapname, "r", encoding="utf-8") as f:
-            self.registermap = json.load(f)
+        try:
+            self.store = registermap_open_store(self.mapname)
             return True
+        except (OSError, ValueError) as e:
+            raise RuntimeError(
+                f"Could not load register definitions from {self.mapname}: {e}"
+            )
 
-        raise RuntimeError(f"Could not load register definitions from {self.mapname}")
-        return None
+    def register_build_index(self) -> None:
+        """
+        build the address index for the loaded registermap, so
+        registermap_search_address() does not need to scan the
+        whole registermap for each address.
 
-    def registermap_nxp_search_address(self, address):
+        imx8mp: hash map of fixed addresses and sorted intervals
+        of cyclic addresses, which get resolved arithmetically.
+
+        stm32mp157: sorted intervals of the peripheral ranges and a
+        hash map of register offsets for each registermap.
+        """
+        store = self.store
+        self.addr_index = {}
+        self.cyclic_index = _IntervalIndex()
+        self.regmap_index = {}
+        for regid in range(len(store)):
+            kind = store.reg_kind[regid]
+            if kind == REGMAP_KIND_FIXED:
+                self.addr_index.setdefault(store.reg_addr[regid], regid)
+            elif kind == REGMAP_KIND_CYCLIC:
+                start = store.reg_addr[regid]
+                last = store.reg_last[regid]
+                self.cyclic_index.add(
+                    min(start, last), max(start, last), (regid, start, store.reg_step[regid])
+                )
+            elif kind == REGMAP_KIND_OFFSET:
+                mapsid = store.map_name[store.reg_map[regid]]
+                offsets = self.regmap_index.setdefault(mapsid, {})
+                offsets.setdefault(store.reg_addr[regid], regid)
+
+        self.cyclic_index.build()
+
+        self.permap_index = _IntervalIndex()
+        for i in range(len(store.per_start)):
+            self.permap_index.add(store.per_start[i], store.per_end[i], i)
+
+        self.permap_index.build()
+
+    def registermap_nxp_search_regid(self, address) -> int:
         """
         search for the address in the imx8mp registermap
 
         :param address: hex string of address
+        :return: register id in self.store, None if not found
         """
-        for reg in self.registermap:
-            if reg["address"]:
-                if reg["address"] == address:
-                    return reg
-            elif reg["address_cyclic"]:
-                tmp = reg["address_cyclic"]
-                base = tmp["base"]
-                off = tmp["offset"]
-                step = tmp["step"]
-                start = tmp["start"]
-                end = tmp["end"]
+        tmp = int(address, 16)
+        found = self.addr_index.get(tmp)
 
-                addr = int(base, 16)
-                offset = int(off, 16)
-                valid_addresses = [
-                    addr + offset + step * i for i in range(start, end + 1)
-                ]
+        for regid, start, step in self.cyclic_index.find(tmp):
+            if found is not None and found < regid:
+                break
+            if step == 0:
+                if tmp != start:
+                    continue
+            elif (tmp - start) % step:
+                continue
 
-                tmp = int(address, 16)
-                if tmp in valid_addresses:
-                    return reg
+            found = regid
+            break
 
-        return None
+        return found
 
-    def registermap_stm32mp1_search_address(self, address):
+    def registermap_stm32mp1_search_regid(self, address) -> int:
         """
-        search for the address in the imx8mp registermap
+        search for the address in the stm32mp157 registermap
 
         :param address: hex string of address
+        :return: register id in self.store
         """
-        permaps = self.registermap[0]["peripheralmaps"]
-        regmaps = self.registermap[1]["registermaps"]
         tmpaddr = int(address, 16)
 
         # search peripheral mapping
-        permap = None
-        startaddr = None
-        for p in permaps:
-            start_str, end_str = p["range"].split(" - ")
-            start = int(start_str, 16)
-            end = int(end_str, 16)
-            if tmpaddr >= start and tmpaddr <= end:
-                permap = p
-                startaddr = start
-                break
-
-        if not permap:
+        permaps = self.permap_index.find(tmpaddr)
+        if not permaps:
             raise RuntimeError(f"No peripheral map found for address {address}")
 
-        # search registermap
-        regmap = None
-        for r in regmaps:
-            if r["mapname"] == permap["peripheralmap"]:
-                regmap = r
-                break
+        permap = permaps[0]
+        startaddr = self.store.per_start[permap]
 
-        if not regmap:
+        # search registermap
+        regmap = self.regmap_index.get(self.store.per_map[permap])
+        if regmap is None:
             raise RuntimeError(f"No registermap map found for address {address}")
 
         # find registermapping for full address
-        for reg in regmap["registers"]:
-            registeraddr = startaddr + int(reg["offset"], 16)
-            if registeraddr == tmpaddr:
-                return reg
+        regid = regmap.get(tmpaddr - startaddr)
+        if regid is None:
+            raise RuntimeError(f"address {address} not found")
 
-        raise RuntimeError(f"address {address} not found")
+        return regid
+
+    def registermap_nxp_search_address(self, address):
+        """
+        search for the address in the imx8mp registermap
+
+        :param address: hex string of address
+        """
+        regid = self.registermap_nxp_search_regid(address)
+        if regid is None:
+            return None
+
+        return self.store.register(regid)
+
+    def registermap_stm32mp1_search_address(self, address):
+        """
+        search for the address in the imx8mp registermap
+
+        :param address: hex string of address
+        """
+        return self.store.register(self.registermap_stm32mp1_search_regid(address))
+
+    def registermap_search_regid(self, address) -> int:
+        """
+        search the register id in self.store for the address
+        in the registermap for the SoC
+
+        :param address: hex string of address
+        :return: register id, None if not found
+        """
+        if self.layout == REGMAP_LAYOUT_NXP:
+            return self.registermap_nxp_search_regid(address)
+        elif self.layout == REGMAP_LAYOUT_PERIPHERAL:
+            return self.registermap_stm32mp1_search_regid(address)
+
+        raise RuntimeError(f"Soc {self.socname} not yet supported")
 
     def registermap_search_address(self, address):
         """
@@ -295,13 +922,186 @@ class REGISTERMAP:
 
         :param address: hex string of address
         """
-        if self.socname == "imx8mp":
+        if self.layout == REGMAP_LAYOUT_NXP:
             return self.registermap_nxp_search_address(address)
-        elif self.socname == "stm32mp157":
+        elif self.layout == REGMAP_LAYOUT_PERIPHERAL:
             return self.registermap_stm32mp1_search_address(address)
 
         raise RuntimeError(f"Soc {self.socname} not yet supported")
 
+    def registermap_register_fields(self, regid: int) -> list:
+        """
+        return the precompiled bitfield extractors of register regid
+
+        :param regid: register id in self.store
+        :return: list of tuples (index in bits, range, field, shift, mask)
+            shift is -1 if the bitfield has no valid bit range
+        """
+        fields = self.fields_cache.get(regid)
+        if fields is None:
+            store = self.store
+            fields = []
+            first = store.reg_field[regid]
+            for f in range(first, store.reg_field[regid + 1]):
+                fields.append(
+                    (
+                        f - first,
+                        store.string(store.field_range[f]),
+                        store.string(store.field_name[f]),
+                        store.field_shift[f],
+                        (1 << store.field_width[f]) - 1,
+                    )
+                )
+            self.fields_cache[regid] = fields
+
+        return fields
+
+    def registermap_decode_register(self, address, val) -> list:
+        """
+        decode the value val read from address into its bitfields
+
+        :param address: hex string of address
+        :param val: value hex string or int
+        :return: list of tuples (range, field, value of the bits),
+            bitfields without valid range are not returned
+        """
+        regid = self.registermap_search_regid(address)
+        if regid is None:
+            raise RuntimeError(f"registermapping for {address} not found")
+
+        if isinstance(val, str):
+            val = int(val, 16)
+
+        return [
+            (bitrange, field, (val >> shift) & mask)
+            for i, bitrange, field, shift, mask in self.registermap_register_fields(regid)
+            if shift >= 0
+        ]
+
+    def registermap_decode_values(self, address, values) -> list:
+        """
+        decode many values read from the same address into bitfields.
+
+        If numpy is installed and there are at least
+        REGMAP_NUMPY_MIN_VALUES values, decoding is vectorized.
+
+        :param address: hex string of address
+        :param values: list of value hex strings or ints
+        :return: list of tuples (range, field, list of bit values)
+        """
+        regid = self.registermap_search_regid(address)
+        if regid is None:
+            raise RuntimeError(f"registermapping for {address} not found")
+
+        ints = [int(v, 16) if isinstance(v, str) else v for v in values]
+        fields = [f for f in self.registermap_register_fields(regid) if f[3] >= 0]
+        if numpy is not None and len(ints) >= REGMAP_NUMPY_MIN_VALUES:
+            arr = numpy.array(ints, dtype=numpy.uint64)
+            return [
+                (bitrange, field, ((arr >> numpy.uint64(shift)) & numpy.uint64(mask)).tolist())
+                for i, bitrange, field, shift, mask in fields
+            ]
+
+        return [
+            (bitrange, field, [(v >> shift) & mask for v in ints])
+            for i, bitrange, field, shift, mask in fields
+        ]
+
+    def registermap_format_register(self, address, val) -> str:
+        """
+        return the text dump of the value val which is read from
+        address, as it is written by registermap_dump_register_file()
+
+        :param address: hex string of address
+        :param val: value hex_string
+        """
+        return self._registermap_format_regid(self.registermap_search_regid(address), address, val)
+
+    def _registermap_format_regid(self, regid, address, val) -> str:
+        sep = REGMAP_DUMP_SEPARATOR
+        out = [sep]
+        if regid is None:
+            out.append(f"registermapping for {address} not found\n")
+            return "".join(out)
+
+        reg = self.store.register(regid)
+        value = int(val, 16)
+        regname = self.get_registername_from_dict()
+        out.append(f"register name: {reg[regname]} addr {address} val: {val} RM page {reg['page']}\n")
+        out.append(sep)
+        bits = reg["bits"]
+        for i, bitrange, field, shift, mask in self.registermap_register_fields(regid):
+            desc = bits[i]["description"]
+            if "NXP bug not documented" in bitrange:
+                out.append(f"NXPbug in doc name of field {field} desc {desc}\n")
+            elif bitrange == "-":
+                out.append(f"field {field} desc {desc}\n")
+            else:
+                if shift < 0:
+                    # let get_bit_range() raise the error
+                    get_bit_range(val, bitrange)
+                bitval = format((value >> shift) & mask, f"0{mask.bit_length()}b")
+                out.append(f"{bitrange:6} {field:30} val {bitval:6}\n")
+                out.append(f"desc {desc}\n")
+            out.append("...........................................\n")
+
+        return "".join(out)
+
+    def registermap_dump_registers_file(self, filepath, regs, mode: str = "a") -> bool:
+        """
+        dump a list of register values into the file filepath,
+        format see registermap_dump_register_file()
+
+        The file is only opened once and written through a buffered
+        writer, so use this for dumping a lot of registers. Registers
+        not found in the registermap are reported in the file.
+
+        :param filepath: full path to outputfile
+        :param regs: iterable of (address, value) tuples, address and value hex strings
+        :param mode: mode for opening the file, default append
+        :return: True if all registers are found in the registermap
+        """
+        ret = True
+        with open(filepath, mode, encoding="utf-8", buffering=1024 * 1024) as f:
+            for address, val in regs:
+                try:
+                    regid = self.registermap_search_regid(address)
+                except RuntimeError as e:
+                    regid = None
+                    f.write(f"{e}\n")
+
+                if regid is None:
+                    ret = False
+
+                f.write(self._registermap_format_regid(regid, address, val))
+
+        return ret
+
+    def registermap_dump_registers(self, regs) -> bool:
+        """
+        dump a list of register values into the tbot log
+        with one log message per register.
+
+        :param regs: iterable of (address, value) tuples, address and value hex strings
+        :return: True if all registers are found in the registermap
+        """
+        ret = True
+        for address, val in regs:
+            try:
+                regid = self.registermap_search_regid(address)
+            except RuntimeError as e:
+                tbot.log.message(tbot.log.c(str(e)).red)
+                regid = None
+
+            msg = self._registermap_format_regid(regid, address, val)
+            if regid is None:
+                tbot.log.message(tbot.log.c(msg).red)
+                ret = False
+            else:
+                tbot.log.message(msg)
+
+        return ret
+
     def registermap_dump_register(self, address, val) -> bool:
         """
         dump the value val which is read from address
@@ -313,34 +1113,40 @@ class REGISTERMAP:
         :param val: value hex_string
         """
         tbot.log.message("-------------------------------")
-        reg = self.registermap_search_address(address)
-        if reg is None:
+        regid = self.registermap_search_regid(address)
+        if regid is None:
             tbot.log.message(tbot.log.c(f"regitermapping for {address} not found").red)
             return False
 
+        reg = self.store.register(regid)
+        value = int(val, 16)
         regname = self.get_registername_from_dict()
         tbot.log.message(
             tbot.log.c(
                 f"register name: {reg[regname]} addr {address} val: {val} RM page {reg['page']}"
             ).blue
         )
-        for bit in reg["bits"]:
-            if "NXP bug not documented" in bit["range"]:
+        bits = reg["bits"]
+        for i, bitrange, field, shift, mask in self.registermap_register_fields(regid):
+            desc = bits[i]["description"]
+            if "NXP bug not documented" in bitrange:
                 tbot.log.message(
                     tbot.log.c(
-                        f"NXPbug in doc name of field {bit['field']} desc {bit['description']}"
+                        f"NXPbug in doc name of field {field} desc {desc}"
                     ).red
                 )
-            elif bit["range"] == "-":
+            elif bitrange == "-":
                 tbot.log.message(
-                    tbot.log.c(f"field {bit['field']} desc {bit['description']}").red
+                    tbot.log.c(f"field {field} desc {desc}").red
                 )
             else:
-                bits = get_bit_range(val, bit["range"])
+                if shift < 0:
+                    get_bit_range(val, bitrange)
+                bitval = format((value >> shift) & mask, f"0{mask.bit_length()}b")
                 tbot.log.message(
-                    tbot.log.c(f"{bit['range']:6} {bit['field']:30} val {bits:6}").blue
+                    tbot.log.c(f"{bitrange:6} {field:30} val {bitval:6}").blue
                 )
-                tbot.log.message(f"desc {bit['description']}")
+                tbot.log.message(f"desc {desc}")
             tbot.log.message("--------")
 
         return True
@@ -396,30 +1202,12 @@ class REGISTERMAP:
 
         """
         with open(filepath, "a", encoding="utf-8") as f:
-            f.write(
-                "------------------------------------------------------------------------------\n"
-            )
-            reg = self.registermap_search_address(address)
-            if reg is None:
-                f.write(f"registermapping for {address} not found\n")
-                return False
-
-            regname = self.get_registername_from_dict()
-            f.write(f"register name: {reg[regname]} addr {address} val: {val} RM page {reg['page']}\n")
-            f.write(
-                "------------------------------------------------------------------------------\n"
-            )
-            for bit in reg["bits"]:
-                if "NXP bug not documented" in bit["range"]:
-                    f.write(
-                        f"NXPbug in doc name of field {bit['field']} desc {bit['description']}\n"
-                    )
-                elif bit["range"] == "-":
-                    f.write(f"field {bit['field']} desc {bit['description']}\n")
-                else:
-                    bits = get_bit_range(val, bit["range"])
-                    f.write(f"{bit['range']:6} {bit['field']:30} val {bits:6}\n")
-                    f.write(f"desc {bit['description']}\n")
-                f.write("...........................................\n")
-
-        return True
+            try:
+                regid = self.registermap_search_regid(address)
+            except (RuntimeError, ValueError):
+                # callers, which catch the error, expect the separator
+                f.write(REGMAP_DUMP_SEPARATOR)
+                raise
+            f.write(self._registermap_format_regid(regid, address, val))
+
+        return regid is not None
@@ -0,0 +1,314 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# file suffixes of registermaps in CMSIS-SVD or IP-XACT format
+REGMAP_XML_SUFFIXES = (".svd", ".xml")
+
+
+def registermap_is_xml(mapname) -> bool:
+    """
+    check if the registermap file mapname is a CMSIS-SVD or IP-XACT file
+    """
+    return Path(mapname).suffix.lower() in REGMAP_XML_SUFFIXES
+
+
+def _xml_tag(elem) -> str:
+    # strip the namespace, IP-XACT uses spirit: or ipxact:
+    return elem.tag.rsplit("}", 1)[-1]
+
+
+def _xml_child(elem, name, default=None):
+    for child in elem:
+        if _xml_tag(child) == name:
+            return child
+    return default
+
+
+def _xml_text(elem, name, default=None):
+    child = _xml_child(elem, name)
+    if child is None or child.text is None:
+        return default
+    return " ".join(child.text.split())
+
+
+def _xml_int(value, default=None):
+    """
+    convert a number from SVD or IP-XACT into int. Accepts decimal,
+    0x hex, #binary (SVD, x for don't care) and verilog style numbers
+    like 32'h4000_0000 (IP-XACT).
+    """
+    if value is None:
+        return default
+
+    value = value.strip().lower().replace("_", "")
+    if value.startswith("#"):
+        return int(value[1:].replace("x", "0"), 2)
+    if "'" in value:
+        base = {"h": 16, "d": 10, "b": 2, "o": 8}
+        value = value.split("'", 1)[1]
+        return int(value[1:], base[value[0]])
+    if value.startswith("0x"):
+        return int(value, 16)
+    return int(value, 10)
+
+
+def _xml_dim_names(name, dim, dimindex) -> list:
+    """
+    expand the %s placeholder of SVD register arrays and lists
+    """
+    if dimindex is None:
+        indexes = [str(i) for i in range(dim)]
+    elif "-" in dimindex and "," not in dimindex:
+        start, end = dimindex.split("-")
+        if start.isdigit():
+            indexes = [str(i) for i in range(int(start), int(end) + 1)]
+        else:
+            indexes = [chr(i) for i in range(ord(start), ord(end) + 1)]
+    else:
+        indexes = [i.strip() for i in dimindex.split(",")]
+
+    return [name.replace("%s", i) for i in indexes[:dim]]
+
+
+def _xml_bit(name, lsb, width, description) -> dict:
+    if width == 1:
+        bitrange = f"{lsb}"
+    else:
+        bitrange = f"{lsb + width - 1}:{lsb}"
+
+    return {"range": bitrange, "field": name, "description": (description or "") + "\n"}
+
+
+def _xml_peripheral(name, mapname, start, end) -> dict:
+    return {
+        "bus": "",
+        "range": f"0x{start:08X} - 0x{end:08X}",
+        "size": f"{end - start + 1}",
+        "peripheral": name,
+        "peripheralmap": mapname,
+    }
+
+
+def _svd_field(field) -> dict:
+    lsb = _xml_int(_xml_text(field, "bitOffset"))
+    width = _xml_int(_xml_text(field, "bitWidth"))
+    if lsb is None:
+        bitrange = _xml_text(field, "bitRange")
+        if bitrange is not None:
+            msb, lsb = bitrange.strip("[]").split(":")
+            msb, lsb = int(msb), int(lsb)
+        else:
+            msb = _xml_int(_xml_text(field, "msb"))
+            lsb = _xml_int(_xml_text(field, "lsb"))
+        width = msb - lsb + 1
+    elif width is None:
+        width = 1
+
+    return _xml_bit(_xml_text(field, "name"), lsb, width, _xml_text(field, "description"))
+
+
+def _svd_registers(elem, offset, prefix, defaults, registers) -> None:
+    """
+    append the registers of a <registers> or <cluster> element to
+    registers, clusters are flattened with their offset added.
+    """
+    known = {}
+    for child in elem:
+        tag = _xml_tag(child)
+        if tag not in ["register", "cluster"]:
+            continue
+
+        base = offset + _xml_int(_xml_text(child, "addressOffset"), 0)
+        name = _xml_text(child, "name")
+        dim = _xml_int(_xml_text(child, "dim"))
+        if dim is None:
+            instances = [(name, base)]
+        else:
+            incr = _xml_int(_xml_text(child, "dimIncrement"), 0)
+            names = _xml_dim_names(name, dim, _xml_text(child, "dimIndex"))
+            instances = [(n, base + i * incr) for i, n in enumerate(names)]
+
+        if tag == "cluster":
+            for n, off in instances:
+                _svd_registers(child, off, f"{prefix}{n}_", defaults, registers)
+            continue
+
+        fields = _xml_child(child, "fields")
+        if fields is not None:
+            bits = [_svd_field(f) for f in fields if _xml_tag(f) == "field"]
+        else:
+            derived = known.get(child.get("derivedFrom"))
+            bits = derived["bits"] if derived else []
+        bits.sort(key=lambda b: int(b["range"].split(":")[-1]), reverse=True)
+
+        size = _xml_int(_xml_text(child, "size"), defaults["size"])
+        reset = _xml_int(_xml_text(child, "resetValue"), defaults["resetValue"])
+        for n, off in instances:
+            reg = {
+                "registername": f"{prefix}{n}",
+                "offset": hex(off),
+                "page": "-",
+                "size": size,
+                "resetvalue": f"0x{reset:0{size // 4}x}",
+                "description": _xml_text(child, "description", ""),
+                "bits": bits,
+            }
+            known[name] = reg
+            registers.append(reg)
+
+
+def registermap_import_svd(filename) -> list:
+    """
+    import a CMSIS-SVD file into the peripheral registermap format,
+    see REGISTERMAP.
+
+    The file is parsed incrementally, each peripheral is converted
+    and freed as soon as it is parsed. Peripherals derived from an
+    other peripheral (derivedFrom) share its registermap.
+
+    :param filename: path to the svd file
+    :return: registermap
+    """
+    peripheralmaps = []
+    registermaps = []
+    mapnames = {}
+    defaults = {"size": 32, "resetValue": 0}
+    stack = []
+    for event, elem in ET.iterparse(str(filename), events=("start", "end")):
+        tag = _xml_tag(elem)
+        if event == "start":
+            stack.append(tag)
+            continue
+
+        stack.pop()
+        if stack == ["device"] and tag in defaults:
+            defaults[tag] = _xml_int(elem.text)
+        if tag != "peripheral":
+            continue
+
+        name = _xml_text(elem, "name")
+        base = _xml_int(_xml_text(elem, "baseAddress"))
+        derived = elem.get("derivedFrom")
+        pdefaults = {
+            "size": _xml_int(_xml_text(elem, "size"), defaults["size"]),
+            "resetValue": _xml_int(_xml_text(elem, "resetValue"), defaults["resetValue"]),
+        }
+        regs = _xml_child(elem, "registers")
+        if derived in mapnames and regs is None:
+            mapname, length = mapnames[derived]
+        else:
+            mapname = f"{name} registers"
+            registers = []
+            if regs is not None:
+                _svd_registers(regs, 0, "", pdefaults, registers)
+            registermaps.append({"mapname": mapname, "registers": registers})
+            length = 0
+            for block in elem:
+                if _xml_tag(block) == "addressBlock":
+                    end = _xml_int(_xml_text(block, "offset"), 0)
+                    end += _xml_int(_xml_text(block, "size"), 0)
+                    length = max(length, end)
+            for r in registers:
+                length = max(length, int(r["offset"], 16) + r["size"] // 8)
+
+        mapnames[name] = (mapname, length)
+        peripheralmaps.append(_xml_peripheral(name, mapname, base, base + max(length, 1) - 1))
+        elem.clear()
+
+    return [{"peripheralmaps": peripheralmaps}, {"registermaps": registermaps}]
+
+
+def _ipxact_registers(elem, offset, prefix, registers) -> None:
+    for child in elem:
+        tag = _xml_tag(child)
+        if tag not in ["register", "registerFile"]:
+            continue
+
+        off = offset + _xml_int(_xml_text(child, "addressOffset"), 0)
+        name = _xml_text(child, "name")
+        if tag == "registerFile":
+            _ipxact_registers(child, off, f"{prefix}{name}_", registers)
+            continue
+
+        size = _xml_int(_xml_text(child, "size"), 32)
+        reset = _xml_child(child, "reset")
+        reset = _xml_int(_xml_text(reset, "value") if reset is not None else None, 0)
+        bits = []
+        for field in child:
+            if _xml_tag(field) != "field":
+                continue
+            bits.append(
+                _xml_bit(
+                    _xml_text(field, "name"),
+                    _xml_int(_xml_text(field, "bitOffset")),
+                    _xml_int(_xml_text(field, "bitWidth")),
+                    _xml_text(field, "description"),
+                )
+            )
+        bits.sort(key=lambda b: int(b["range"].split(":")[-1]), reverse=True)
+        registers.append(
+            {
+                "registername": f"{prefix}{name}",
+                "offset": hex(off),
+                "page": "-",
+                "size": size,
+                "resetvalue": f"0x{reset:0{size // 4}x}",
+                "description": _xml_text(child, "description", ""),
+                "bits": bits,
+            }
+        )
+
+
+def registermap_import_ipxact(filename) -> list:
+    """
+    import an IP-XACT component file into the peripheral registermap
+    format, see REGISTERMAP. Each addressBlock of the memory maps becomes
+    a peripheral with its own registermap.
+
+    The file is parsed incrementally, each addressBlock is converted
+    and freed as soon as it is parsed.
+
+    :param filename: path to the xml file
+    :return: registermap
+    """
+    peripheralmaps = []
+    registermaps = []
+    for event, elem in ET.iterparse(str(filename), events=("end",)):
+        if _xml_tag(elem) != "addressBlock":
+            continue
+
+        name = _xml_text(elem, "name")
+        base = _xml_int(_xml_text(elem, "baseAddress"), 0)
+        length = _xml_int(_xml_text(elem, "range"), 1)
+        mapname = f"{name} registers"
+        registers = []
+        _ipxact_registers(elem, 0, "", registers)
+        registermaps.append({"mapname": mapname, "registers": registers})
+        peripheralmaps.append(_xml_peripheral(name, mapname, base, base + length - 1))
+        elem.clear()
+
+    return [{"peripheralmaps": peripheralmaps}, {"registermaps": registermaps}]
+
+
+def registermap_import_xml(filename) -> list:
+    """
+    import a CMSIS-SVD or IP-XACT file, detected by the root element
+
+    :param filename: path to the xml file
+    :return: registermap in the peripheral format, see REGISTERMAP
+    """
+    try:
+        for event, elem in ET.iterparse(str(filename), events=("start",)):
+            root = _xml_tag(elem)
+            break
+        else:
+            raise ValueError(f"{filename} is empty")
+
+        if root == "device":
+            return registermap_import_svd(filename)
+        if root == "component":
+            return registermap_import_ipxact(filename)
+    except ET.ParseError as e:
+        raise ValueError(f"{filename}: {e}")
+
+    raise ValueError(f"{filename}: unknown registermap format {root}")
@@ -0,0 +1,301 @@
+import sqlite3
+import time
+
+# register snapshot database
+#
+# Each snapshot only stores the registers, whose value differ from
+# the previous snapshot of the same board and name, so each revfile
+# or dump file is its own series (value NULL if the register is not
+# longer part of the snapshot). Every REGSNAPSHOT_KEYFRAME
+# snapshot stores all values, so resolving a snapshot never needs to
+# walk more than REGSNAPSHOT_KEYFRAME deltas.
+REGSNAPSHOT_KEYFRAME = 16
+
+REGSNAPSHOT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    board TEXT NOT NULL,
+    kernel TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    name TEXT,
+    parent INTEGER,
+    keyframe INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_board
+    ON snapshots (board, kernel, timestamp);
+CREATE INDEX IF NOT EXISTS snapshots_series
+    ON snapshots (board, name, id);
+CREATE TABLE IF NOT EXISTS snapvalues (
+    snapshot INTEGER NOT NULL,
+    address INTEGER NOT NULL,
+    value INTEGER,
+    PRIMARY KEY (snapshot, address)
+) WITHOUT ROWID;
+"""
+
+
+def _regsnapshot_to_db(val: int) -> int:
+    # sqlite integers are signed 64 bit
+    return val - (1 << 64) if val >= (1 << 63) else val
+
+
+def _regsnapshot_from_db(val: int) -> int:
+    return val + (1 << 64) if val < 0 else val
+
+
+def regsnapshot_parse_file(filename) -> tuple:
+    """
+    parse a revfile created with lnx_create_revfile() or a dump
+    file created with generic_machine_dump()
+
+    :param filename: file to parse
+    :return: tuple (kernel version found in header or "",
+        dictionary address -> value (int))
+    """
+    kernel = ""
+    values = {}
+    try:
+        fd = open(filename, "r")
+    except IOError:
+        raise RuntimeError("Could not open: " + filename)
+
+    with fd:
+        for line in fd:
+            cols = line.split()
+            if len(cols) == 0:
+                continue
+            if cols[0] == "#":
+                if line.startswith("# Linux"):
+                    kernel = line.split(":", 1)[1].strip()
+                continue
+            # revfile: regaddr mask type defval, dump: regaddr val
+            values[int(cols[0], 16)] = int(cols[-1], 16)
+
+    return kernel, values
+
+
+class REGSNAPSHOT:
+    """
+    versioned store for register snapshots in a sqlite database.
+
+    Snapshots are keyed by board, kernel version (output of
+    uname -a) and timestamp and stored as delta to the previous
+    snapshot of the same board and name.
+
+    example:
+
+    .. code-block:: python
+
+        db = REGSNAPSHOT("registers.db")
+        a = db.snapshot_add_file("imx8mp-board", "pinmux_old.reg")
+        b = db.snapshot_add_file("imx8mp-board", "pinmux_new.reg")
+        regmap = REGISTERMAP("scripts/registermap/imx8mp_registers.json")
+        for addr, bitrange, field, old, new in db.snapshot_diff_fields(a, b, regmap):
+            print(f"{hex(addr)} {field} {old} -> {new}")
+
+    :param dbname: filename of the sqlite database, created if
+        it does not exist
+    """
+
+    def __init__(self, dbname):
+        self.dbname = dbname
+        try:
+            self.db = sqlite3.connect(dbname)
+            self.db.executescript(REGSNAPSHOT_SCHEMA)
+        except sqlite3.Error as e:
+            raise RuntimeError(f"Could not open snapshot database {dbname}: {e}")
+
+        self.cache = {}
+
+    def close(self) -> None:
+        self.db.close()
+
+    def snapshot_add(self, board, kernel, values, timestamp=None, name=None) -> int:
+        """
+        add a new snapshot
+
+        :param board: name of the board
+        :param kernel: kernel version, output of uname -a
+        :param values: dictionary or iterable of (address, value),
+            addresses and values as int or hex string
+        :param timestamp: time of the snapshot, default now
+        :param name: optional name of the snapshot, for example
+            the name of the revfile. The snapshot is stored as delta
+            to the last snapshot of board with the same name.
+        :return: id of the new snapshot
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        if isinstance(values, dict):
+            values = values.items()
+        new = {}
+        for addr, val in values:
+            if isinstance(addr, str):
+                addr = int(addr, 16)
+            if isinstance(val, str):
+                val = int(val, 16)
+            new[addr] = val
+
+        parent = self.db.execute(
+            "SELECT id, keyframe FROM snapshots WHERE board = ? AND name IS ? "
+            "ORDER BY id DESC LIMIT 1",
+            (board, name),
+        ).fetchone()
+
+        if parent is None or parent[1] + 1 >= REGSNAPSHOT_KEYFRAME:
+            keyframe = 0
+            delta = list(new.items())
+        else:
+            keyframe = parent[1] + 1
+            old = self.snapshot_values(parent[0])
+            delta = [(a, v) for a, v in new.items() if old.get(a) != v]
+            delta += [(a, None) for a in old if a not in new]
+
+        with self.db:
+            cur = self.db.execute(
+                "INSERT INTO snapshots (board, kernel, timestamp, name, parent, keyframe) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (board, kernel, timestamp, name, parent[0] if parent else None, keyframe),
+            )
+            sid = cur.lastrowid
+            self.db.executemany(
+                "INSERT INTO snapvalues (snapshot, address, value) VALUES (?, ?, ?)",
+                (
+                    (sid, _regsnapshot_to_db(a), None if v is None else _regsnapshot_to_db(v))
+                    for a, v in delta
+                ),
+            )
+
+        self.cache[sid] = new
+        return sid
+
+    def snapshot_add_file(self, board, filename, kernel=None, timestamp=None) -> int:
+        """
+        add the values of a revfile or a dump file as new snapshot,
+        see regsnapshot_parse_file()
+
+        :param board: name of the board
+        :param filename: revfile or dump file
+        :param kernel: kernel version, if None use the version found
+            in the header of the revfile
+        :param timestamp: time of the snapshot, default now
+        :return: id of the new snapshot
+        """
+        filekernel, values = regsnapshot_parse_file(filename)
+        if kernel is None:
+            kernel = filekernel
+
+        return self.snapshot_add(board, kernel, values, timestamp, str(filename))
+
+    def snapshot_list(self, board=None, kernel=None) -> list:
+        """
+        list the snapshots, ordered by timestamp
+
+        :param board: only snapshots of this board, if not None
+        :param kernel: only snapshots of this kernel version, if not None
+        :return: list of tuples (id, board, kernel, timestamp, name)
+        """
+        query = "SELECT id, board, kernel, timestamp, name FROM snapshots"
+        cond = []
+        args = []
+        if board is not None:
+            cond.append("board = ?")
+            args.append(board)
+        if kernel is not None:
+            cond.append("kernel = ?")
+            args.append(kernel)
+        if cond:
+            query += " WHERE " + " AND ".join(cond)
+
+        return self.db.execute(query + " ORDER BY timestamp, id", args).fetchall()
+
+    def snapshot_values(self, sid) -> dict:
+        """
+        return all register values of a snapshot
+
+        :param sid: id of the snapshot
+        :return: dictionary address -> value (int)
+        """
+        values = self.cache.get(sid)
+        if values is not None:
+            # callers may modify the result, keep the cache intact
+            return dict(values)
+
+        # collect the chain of deltas back to the last keyframe
+        chain = []
+        cur = sid
+        while cur is not None and cur not in self.cache:
+            row = self.db.execute(
+                "SELECT parent, keyframe FROM snapshots WHERE id = ?", (cur,)
+            ).fetchone()
+            if row is None:
+                raise RuntimeError(f"snapshot {cur} not found in {self.dbname}")
+            chain.append(cur)
+            cur = row[0] if row[1] != 0 else None
+
+        values = dict(self.cache[cur]) if cur is not None else {}
+        for c in reversed(chain):
+            for addr, val in self.db.execute(
+                "SELECT address, value FROM snapvalues WHERE snapshot = ?", (c,)
+            ):
+                addr = _regsnapshot_from_db(addr)
+                if val is None:
+                    values.pop(addr, None)
+                else:
+                    values[addr] = _regsnapshot_from_db(val)
+
+        self.cache[sid] = values
+        return dict(values)
+
+    def snapshot_diff(self, a, b) -> list:
+        """
+        return the registers which differ between snapshot a and b
+
+        :param a: id of the first snapshot
+        :param b: id of the second snapshot
+        :return: sorted list of tuples (address, value in a, value in b),
+            value is None if the register is not in the snapshot
+        """
+        va = self.snapshot_values(a)
+        vb = self.snapshot_values(b)
+        return [
+            (addr, va.get(addr), vb.get(addr))
+            for addr in sorted(va.keys() | vb.keys())
+            if va.get(addr) != vb.get(addr)
+        ]
+
+    def snapshot_diff_fields(self, a, b, regmap) -> list:
+        """
+        return the bitfields which differ between snapshot a and b,
+        decoded with the registermap regmap
+
+        :param a: id of the first snapshot
+        :param b: id of the second snapshot
+        :param regmap: REGISTERMAP of the SoC
+        :return: list of tuples (address, range, field, value in a, value in b),
+            if the register is not found in the registermap or it is
+            missing in one snapshot, range and field are None and
+            the register values are returned
+        """
+        ret = []
+        for addr, va, vb in self.snapshot_diff(a, b):
+            regid = None
+            if va is not None and vb is not None:
+                try:
+                    regid = regmap.registermap_search_regid(hex(addr))
+                except RuntimeError:
+                    regid = None
+            if regid is None:
+                ret.append((addr, None, None, va, vb))
+                continue
+
+            for i, bitrange, field, shift, mask in regmap.registermap_register_fields(regid):
+                if shift < 0:
+                    continue
+                fa = (va >> shift) & mask
+                fb = (vb >> shift) & mask
+                if fa != fb:
+                    ret.append((addr, bitrange, field, fa, fb))
+
+        return ret
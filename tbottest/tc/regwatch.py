@@ -0,0 +1,341 @@
+import tbot
+import uuid
+from tbot.machine import linux
+
+from tbottest.common.utils import deploy_scripts
+from tbottest.common.utils import machine_capability
+
+# Register watch sampler
+#
+# lx_regwatch_start() starts a sampler in the background on the target,
+# which reads a set of registers every interval seconds. Only changes of
+# a register value are appended to a log file together with the
+# timestamp of the sample, which read the new value. The log file is a
+# ring buffer of two files, when it reaches ringsize lines, it is moved
+# to <logfile>.1 and a new log file is started.
+#
+# lx_regwatch_stop() stops the sampler, fetches the change log and
+# decodes the changed bitfields with a REGISTERMAP.
+#
+# If python3 is installed on the target, the sampler is one python
+# process (REGWATCH_SAMPLER), which maps the registers from /dev/mem
+# and reads them with the access width of typ. The samples are
+# scheduled on fixed deadlines, so the sample period does not drift;
+# a sample which misses its deadline is counted as overrun. Depending
+# on the CPU and the count of registers, periods down to some 10
+# microseconds are possible.
+#
+# Without python3 a shell loop with one devmem2 call per register is
+# used, one sample then takes some milliseconds per register and the
+# period is not fixed.
+#
+# In both cases the timestamps in the change log are the real time of
+# the sample (microsecond resolution), not the planned one, and at the
+# end the sampler writes the count of samples, so lx_regwatch_stop()
+# reports the achieved sample period.
+REGWATCH_RINGSIZE = 10000
+REGWATCH_INTERVAL = 0.001
+# shortest interval the shell sampler sleeps between two samples
+REGWATCH_SHELL_INTERVAL = 0.01
+
+REGWATCH_SAMPLER = """\
+#!/usr/bin/env python3
+#
+# tbottest register watch sampler, see tbottest/tc/regwatch.py
+#
+# args: logfile ringsize interval typ addr...
+
+import mmap
+import os
+import signal
+import sys
+import time
+
+logfile = sys.argv[1]
+ringsize = int(sys.argv[2])
+interval = float(sys.argv[3])
+fmt, size = {"b": ("B", 1), "h": ("H", 2), "w": ("I", 4), "l": ("Q", 8)}[sys.argv[4]]
+
+fd = os.open("/dev/mem", os.O_RDONLY | os.O_SYNC)
+pages = {}
+regs = []
+for a in sys.argv[5:]:
+    addr = int(a, 16)
+    base = addr & ~(mmap.PAGESIZE - 1)
+    if base not in pages:
+        mem = mmap.mmap(fd, mmap.PAGESIZE, mmap.MAP_SHARED, mmap.PROT_READ, offset=base)
+        # item access of the cast memoryview reads with the width of fmt
+        pages[base] = memoryview(mem).cast(fmt)
+    regs.append((a, pages[base], (addr - base) // size))
+
+stop = False
+
+
+def terminate(signum, frame):
+    global stop
+    stop = True
+
+
+signal.signal(signal.SIGTERM, terminate)
+
+last = [None] * len(regs)
+f = open(logfile, "w", buffering=1)
+lines = 0
+samples = 0
+overruns = 0
+start = time.time()
+deadline = time.monotonic()
+while not stop:
+    ts = time.time()
+    for i, (a, mem, idx) in enumerate(regs):
+        v = mem[idx]
+        if v != last[i]:
+            last[i] = v
+            f.write("%.6f %s 0x%x\\n" % (ts, a, v))
+            lines += 1
+            if lines >= ringsize:
+                f.close()
+                os.replace(logfile, logfile + ".1")
+                f = open(logfile, "w", buffering=1)
+                lines = 0
+    samples += 1
+    if interval > 0:
+        deadline += interval
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            overruns += 1
+            if -delay > interval:
+                # far behind, do not catch up with a burst of samples
+                deadline = time.monotonic()
+
+f.write("# regwatch samples %d start %.6f end %.6f overruns %d\\n" % (samples, start, time.time(), overruns))
+f.close()
+"""
+
+
+def _regwatch_sampler(lnx: linux.LinuxShell):
+    """
+    deploy REGWATCH_SAMPLER to the target, return its path or None
+    if python3 is not installed on the target
+    """
+
+    def probe():
+        if not lnx.test("python3", "-c", "import mmap"):
+            return None
+
+        scripts = {"regwatch.py": REGWATCH_SAMPLER}
+        d = deploy_scripts(lnx, lnx.tmpdir() / "tbot_regwatch", scripts, "regwatch sampler")
+        return d / "regwatch.py"
+
+    return machine_capability(lnx, "regwatch-sampler", probe)
+
+
+@tbot.testcase
+def lx_regwatch_start(
+    lnx: linux.LinuxShell,
+    addrs: list,
+    typ: str = "w",
+    interval: float = REGWATCH_INTERVAL,
+    ringsize: int = REGWATCH_RINGSIZE,
+) -> dict:
+    """
+    start the register watch sampler on the target
+
+    :param lnx: Linux machine we run on
+    :param addrs: list of addresses (hex strings) to watch
+    :param typ: | devmem2 type
+        | access operation type : [b]yte, [h]alfword, [w]ord, [l]ong
+    :param interval: sample period in seconds, 0 for sampling as fast
+        as possible. The shell sampler sleeps interval seconds between
+        two samples, if interval is at least REGWATCH_SHELL_INTERVAL.
+    :param ringsize: max count of changes in one log file
+    :return: watch handle, pass it to lx_regwatch_stop()
+    """
+    if len(addrs) == 0:
+        raise RuntimeError("regwatch: no registers to watch")
+
+    logfile = (lnx.tmpdir() / f"tbot_regwatch_{uuid.uuid4().hex[:8]}.log")._local_str()
+    sampler = _regwatch_sampler(lnx)
+    if sampler is not None:
+        lnx.exec0(
+            "python3",
+            sampler,
+            logfile,
+            str(ringsize),
+            str(interval),
+            typ,
+            *addrs,
+            linux.Raw("> /dev/null 2>&1 &"),
+        )
+    else:
+        regs = " ".join(f"{i}:{a}" for i, a in enumerate(addrs))
+        # one sample takes longer than short intervals anyway
+        sleep = f"sleep {interval}; " if interval >= REGWATCH_SHELL_INTERVAL else ""
+        now = "${EPOCHREALTIME:-$(date +%s.%N)}"
+        loop = (
+            f"tbot_f={logfile}; tbot_n=0; tbot_s=0; tbot_t={now}; : > $tbot_f; rm -f $tbot_f.1; "
+            f'trap \'echo "# regwatch samples $tbot_s start $tbot_t end {now}" >> $tbot_f; exit\' TERM; '
+            f"while true; do for tbot_r in {regs}; do "
+            f"tbot_l=$(devmem2 ${{tbot_r#*:}} {typ} | "
+            'grep -e "Value at address" -e "Read at address"); '
+            'tbot_v=${tbot_l##* }; eval "tbot_o=\\$tbot_w${tbot_r%:*}"; '
+            'if [ "$tbot_v" != "$tbot_o" ]; then '
+            f'echo "{now} ${{tbot_r#*:}} $tbot_v" >> $tbot_f; '
+            'eval "tbot_w${tbot_r%:*}=$tbot_v"; tbot_n=$((tbot_n+1)); '
+            f"if [ $tbot_n -ge {ringsize} ]; then mv $tbot_f $tbot_f.1; tbot_n=0; fi; "
+            f"fi; done; tbot_s=$((tbot_s+1)); {sleep}done"
+        )
+        lnx.exec0(linux.Raw(f"( {loop} ) > /dev/null 2>&1 &"))
+    pid = lnx.env("!")
+    tbot.log.message(tbot.log.c(f"regwatch started pid {pid} log {logfile}").green)
+
+    return {"pid": pid, "logfile": logfile, "addrs": list(addrs)}
+
+
+def regwatch_parse_stats(log: str) -> dict:
+    """
+    parse the statistic line, which the sampler writes at the end
+    of the change log
+
+    :param log: content of the change log
+    :return: dictionary with keys "samples", "start", "end" and for
+        the python sampler "overruns", empty if there is no statistic
+    """
+    for line in reversed(log.splitlines()):
+        cols = line.split()
+        if cols[:2] != ["#", "regwatch"]:
+            continue
+        stats = {}
+        for key, val in zip(cols[2::2], cols[3::2]):
+            try:
+                stats[key] = float(val) if "." in val else int(val)
+            except ValueError:
+                pass
+        return stats
+
+    return {}
+
+
+def regwatch_parse_log(log: str) -> list:
+    """
+    parse the change log of the register watch sampler
+
+    :param log: content of the change log, oldest line first
+    :return: list of tuples (timestamp (float), address (int), value (int))
+    """
+    changes = []
+    for line in log.splitlines():
+        cols = line.split()
+        if len(cols) != 3:
+            continue
+        try:
+            changes.append((float(cols[0]), int(cols[1], 16), int(cols[2], 16)))
+        except ValueError:
+            continue
+
+    return changes
+
+
+def regwatch_timeline(changes: list, regmap=None) -> list:
+    """
+    convert the register changes into a timeline of changed
+    bitfields
+
+    The first value of a register is the value, when the sampler
+    started (or the oldest value in the ring buffer) and it is not
+    reported as change.
+
+    :param changes: list of tuples (timestamp, address, value), see
+        regwatch_parse_log()
+    :param regmap: REGISTERMAP of the SoC, if None only register
+        values are reported
+    :return: list of tuples (timestamp, address, range, field, old, new),
+        range and field are None if the register is not found
+        in the registermap
+    """
+    last = {}
+    regids = {}
+    ret = []
+    for ts, addr, val in changes:
+        old = last.get(addr)
+        last[addr] = val
+        if old is None:
+            continue
+
+        if addr not in regids:
+            regids[addr] = None
+            if regmap is not None:
+                try:
+                    regids[addr] = regmap.registermap_search_regid(hex(addr))
+                except RuntimeError:
+                    pass
+
+        regid = regids[addr]
+        if regid is None:
+            ret.append((ts, addr, None, None, old, val))
+            continue
+
+        for i, bitrange, field, shift, mask in regmap.registermap_register_fields(regid):
+            if shift < 0:
+                continue
+            fo = (old >> shift) & mask
+            fn = (val >> shift) & mask
+            if fo != fn:
+                ret.append((ts, addr, bitrange, field, fo, fn))
+
+    return ret
+
+
+@tbot.testcase
+def lx_regwatch_stop(
+    lnx: linux.LinuxShell,
+    watch: dict,
+    regmap=None,
+) -> list:
+    """
+    stop the register watch sampler, fetch the change log and
+    decode the changed bitfields into the tbot log
+
+    example:
+
+    .. code-block:: python
+
+        regmap = REGISTERMAP("scripts/registermap/imx8mp_registers.json")
+        watch = lx_regwatch_start(lnx, ["0x30384004", "0x30384010"])
+        lnx.exec0("modprobe", "imx-sdma")
+        for ts, addr, bitrange, field, old, new in lx_regwatch_stop(lnx, watch, regmap):
+            ...
+
+    :param lnx: Linux machine we run on
+    :param watch: watch handle returned from lx_regwatch_start()
+    :param regmap: REGISTERMAP of the SoC, if None only register
+        values are reported
+    :return: timeline, see regwatch_timeline()
+    """
+    pid = watch["pid"]
+    logfile = watch["logfile"]
+    lnx.exec("kill", pid, linux.Then, "wait", pid)
+    log = lnx.exec0(linux.Raw(f"cat {logfile}.1 {logfile} 2>/dev/null; true"))
+    lnx.exec0("rm", "-f", logfile, f"{logfile}.1")
+
+    changes = regwatch_parse_log(log)
+    timeline = regwatch_timeline(changes, regmap)
+    start = changes[0][0] if changes else 0.0
+    tbot.log.message(f"regwatch: {len(changes)} register changes, {len(timeline)} field changes")
+    stats = regwatch_parse_stats(log)
+    if stats.get("samples"):
+        period = (stats["end"] - stats["start"]) / stats["samples"]
+        msg = f"regwatch: {stats['samples']} samples, mean period {period * 1e6:.1f}us"
+        if "overruns" in stats:
+            msg += f", {stats['overruns']} overruns"
+        tbot.log.message(msg)
+    for ts, addr, bitrange, field, old, new in timeline:
+        if field is None:
+            msg = f"+{ts - start:.6f}s {hex(addr)} {hex(old)} -> {hex(new)}"
+        else:
+            msg = f"+{ts - start:.6f}s {hex(addr)} [{bitrange}] {field} {hex(old)} -> {hex(new)}"
+        tbot.log.message(msg)
+
+    return timeline
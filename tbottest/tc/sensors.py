@@ -2,6 +2,8 @@ import tbot
 from tbot.machine import linux
 from tbot.context import Optional
 
+from tbottest.tc.common import lx_exec_batch
+
 
 @tbot.testcase
 def board_lnx_tempsensors(
@@ -30,17 +32,23 @@ def board_lnx_tempsensors(
     if sensors is None:
         raise RuntimeError("please config sensors")
 
+    # read all names and values in one round trip
+    cmds = []
+    for s in sensors:
+        for val in s["tmpvalues"]:
+            cmds.append(("cat", f'{s["path"]}/name'))
+            cmds.append(("cat", f'{s["path"]}/{val["valname"]}'))
+    ret = iter(lx_exec_batch(lnx, cmds, check=True))
+
     for s in sensors:
         values = s["tmpvalues"]
         for val in values:
-            tmp = f'{s["path"]}/name'
-            out = lnx.exec0("cat", tmp)
+            rc, out = next(ret)
             if s["name"] not in out:
                 raise RuntimeError(
                     f'wrong name {s["name"]} for {s["path"]} temp sensor. Out: {out}'
                 )
-            tmp = f'{s["path"]}/{val["valname"]}'
-            out = lnx.exec0("cat", tmp)
+            rc, out = next(ret)
             tempval = int(out.strip(""))
             if tempval > int(val["max"]):
                 raise RuntimeError(f'temp values {tempval} > allowed value {val["max"]}')
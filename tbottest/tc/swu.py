@@ -7,6 +7,7 @@ import tbot
 from tbot.machine import linux
 from tbot.context import Optional
 
+from tbottest.labagent import lab_file_hash
 from tbottest.tc.systemd import systemd_stop_service
 from tbottest.tc.systemd import systemd_get_log_from_service
 from tbottest.tc.systemd import systemd_active
@@ -101,16 +102,7 @@ def board_lnx_swu(
             with lab.sshmachine() as lnxssh:
                 # copy file from labhost to sshmachine
                 # copy only if different md5sums
-                md5lab = lab.exec0(
-                    "md5sum",
-                    lab.tftp_dir() / swuimage,
-                    linux.Pipe,
-                    "cut",
-                    "-d",
-                    " ",
-                    "-f",
-                    "1",
-                )
+                md5lab = lab_file_hash(lab, lab.tftp_dir() / swuimage)
                 ret, log = lnxssh.exec("ls", lnxssh.tftp_dir() / swuimage)
                 if ret == 0:
                     md5ssh = lnxssh.exec0(
@@ -122,7 +114,7 @@ def board_lnx_swu(
                         " ",
                         "-f",
                         "1",
-                    )
+                    ).strip()
                 else:
                     md5ssh = "none"
 
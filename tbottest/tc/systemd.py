@@ -1,7 +1,10 @@
 import tbot
+import typing
 from tbot.machine import linux
 from tbot.context import Optional
 
+from tbottest.tc.common import lx_exec_to_file
+
 
 @tbot.testcase
 def systemd_stop_service(
@@ -29,21 +32,31 @@ def systemd_stop_service(
 def systemd_get_log_from_service(
     lnx: Optional[linux.LinuxShell] = None,
     name: str = "",
-) -> str:  # noqa: D107
+    localfile: str = None,
+) -> typing.Union[str, dict]:  # noqa: D107
     """
     returns the log of a systemd service
 
     :param lnx: board linux machine
     :param name: name of the systemd service
-    :return: log of "journalctl --all --no-pager -u name"
+    :param localfile: if set, the log is written into this file on the
+        tbot host and not returned as string, see lx_exec_to_file()
+    :return: log of "journalctl --all --no-pager -u name", or if localfile
+        is set the summary dict of lx_exec_to_file()
     """
     with tbot.ctx() as cx:
         if lnx is None:
             lnx = cx.request(tbot.role.BoardLinux)
 
-        rcode, log = lnx.exec("journalctl", "--all", "--no-pager", "-u", name)
-        if rcode == 0:
-            return log
+        cmd = ["journalctl", "--all", "--no-pager", "-u", name]
+        if localfile is not None:
+            res = lx_exec_to_file(lnx, localfile, *cmd)
+            if res["retcode"] == 0:
+                return res
+        else:
+            rcode, log = lnx.exec(*cmd)
+            if rcode == 0:
+                return log
 
         raise RuntimeError(f"could not stop service {name}")
 
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+tests for regsnapshot.py, run with
+
+    python3 -m pytest tbottest/tc/test_regsnapshot.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+currentdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(currentdir, "..", ".."))
+
+from tbottest.tc.regsnapshot import REGSNAPSHOT  # noqa: E402
+from tbottest.tc.regsnapshot import REGSNAPSHOT_KEYFRAME  # noqa: E402
+
+BOARD = "testboard"
+KERNEL = "Linux testboard 6.1.0"
+
+
+class TestSeries(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.dbname = os.path.join(tmpdir.name, "registers.db")
+        self.db = REGSNAPSHOT(self.dbname)
+        self.addCleanup(self.db.close)
+
+    def stored(self, sid) -> int:
+        return self.db.db.execute(
+            "SELECT COUNT(*) FROM snapvalues WHERE snapshot = ?", (sid,)
+        ).fetchone()[0]
+
+    def test_interleaved_sets(self):
+        # two register sets of the same board, as generic_lnx_create_dump_files()
+        # stores them for each configured revfile
+        pinmux = {0x30330000 + i * 4: i for i in range(100)}
+        clocks = {0x30380000 + i * 4: i for i in range(50)}
+        sids = []
+        for run in range(2 * REGSNAPSHOT_KEYFRAME):
+            pinmux[0x30330000] = run
+            clocks[0x30380000] = run
+            sids.append(
+                (
+                    self.db.snapshot_add(BOARD, KERNEL, pinmux, run, "pinmux.reg"),
+                    dict(pinmux),
+                    self.db.snapshot_add(BOARD, KERNEL, clocks, run, "clocks.reg"),
+                    dict(clocks),
+                )
+            )
+
+        for run, (psid, pvals, csid, cvals) in enumerate(sids):
+            if run % REGSNAPSHOT_KEYFRAME == 0:
+                self.assertEqual(self.stored(psid), len(pinmux))
+                self.assertEqual(self.stored(csid), len(clocks))
+            else:
+                # only the changed register is stored
+                self.assertEqual(self.stored(psid), 1)
+                self.assertEqual(self.stored(csid), 1)
+
+        # resolve the deltas from the database, without the cache
+        db = REGSNAPSHOT(self.dbname)
+        self.addCleanup(db.close)
+        for psid, pvals, csid, cvals in sids:
+            self.assertEqual(db.snapshot_values(psid), pvals)
+            self.assertEqual(db.snapshot_values(csid), cvals)
+
+    def test_unnamed_series(self):
+        a = self.db.snapshot_add(BOARD, KERNEL, {0x1000: 1, 0x1004: 2}, 1)
+        self.db.snapshot_add(BOARD, KERNEL, {0x2000: 1}, 2, "other.reg")
+        b = self.db.snapshot_add(BOARD, KERNEL, {0x1000: 1, 0x1004: 3}, 3)
+        self.assertEqual(self.stored(b), 1)
+        self.assertEqual(self.db.snapshot_diff(a, b), [(0x1004, 2, 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
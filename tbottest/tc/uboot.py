@@ -5,11 +5,15 @@ import tbot
 from tbot.machine import board
 from tbot.context import Optional
 
-def ub_read_register(ub: typing.Optional[board.UBootShell], address: str, bytesize: int = 4) ->str:
-    """
-    read a register in u-boot with md command
-    return the value as a hex string
-    """
+# bytes U-Boot md command prints per line
+UB_MD_LINE_LEN = 16
+
+# max length of a command line we send to U-Boot, keep it
+# below CONFIG_SYS_CBSIZE (256 on a lot of boards)
+UB_CMD_MAXLEN = 200
+
+
+def _ub_md_size(bytesize: int) -> str:
     if bytesize == 1:
         bl = ".b"
     elif bytesize == 2:
@@ -21,6 +25,15 @@ def ub_read_register(ub: typing.Optional[board.UBootShell], address: str, bytesi
     else:
         raise RuntimeError(f"bytesize {bytesize} not allowed, [1,2,4,8]")
 
+    return bl
+
+
+def ub_read_register(ub: typing.Optional[board.UBootShell], address: str, bytesize: int = 4) ->str:
+    """
+    read a register in u-boot with md command
+    return the value as a hex string
+    """
+    bl = _ub_md_size(bytesize)
     log = ub.exec0(f"md{bl}", address, "1")
     rval = log.split(":")[1]
     rval = rval.split(" ")[1]
@@ -28,6 +41,148 @@ def ub_read_register(ub: typing.Optional[board.UBootShell], address: str, bytesi
     return val
 
 
+def ub_parse_md_output(log: str, address: int, count: int, bytesize: int = 4) -> list:
+    """
+    parse the output of an U-Boot md command
+
+    :param log: output of md command
+    :param address: start address of the md command
+    :param count: count of values read with md command
+    :param bytesize: bytes per value
+    :return: list of values as hex strings, one for each address
+    """
+    end = address + count * bytesize
+    perline = UB_MD_LINE_LEN // bytesize
+    vals = {}
+    for line in log.splitlines():
+        if ":" not in line:
+            continue
+        addr, data = line.split(":", 1)
+        try:
+            laddr = int(addr.strip(), 16)
+        except ValueError:
+            continue
+        if laddr < address or laddr >= end:
+            continue
+
+        n = min(perline, (end - laddr) // bytesize)
+        for i, v in enumerate(data.split()[:n]):
+            vals[laddr + i * bytesize] = f"0x{v}"
+
+    ret = []
+    for i in range(count):
+        a = address + i * bytesize
+        if a not in vals:
+            raise RuntimeError(f"md output has no value for address {hex(a)}")
+        ret.append(vals[a])
+
+    return ret
+
+
+def ub_read_register_list(
+    ub: typing.Optional[board.UBootShell], address: str, count: int, bytesize: int = 4
+) -> list:
+    """
+    read count registers starting at address in u-boot with
+    one md command
+
+    :param ub: U-Boot machine we run on
+    :param address: start address as hex string
+    :param count: count of registers to read
+    :param bytesize: size of one register in bytes [1,2,4,8]
+    :return: list of values as hex strings
+    """
+    bl = _ub_md_size(bytesize)
+    log = ub.exec0(f"md{bl}", address, hex(count))
+    return ub_parse_md_output(log, int(address, 16), count, bytesize)
+
+
+def ub_read_register_runs(
+    ub: typing.Optional[board.UBootShell],
+    runs: list,
+    bytesize: int = 4,
+    maxlen: int = UB_CMD_MAXLEN,
+) -> list:
+    """
+    read runs of contiguous registers in u-boot, the md commands
+    for the runs are chained with ";" into command lines up to
+    maxlen characters.
+
+    :param ub: U-Boot machine we run on
+    :param runs: list of (startaddress (int), count) tuples
+    :param bytesize: size of one register in bytes [1,2,4,8]
+    :param maxlen: max length of one command line
+    :return: list of values as hex strings, for all runs
+    """
+    bl = _ub_md_size(bytesize)
+    vals = []
+    pending = []
+    args = []
+    length = 0
+
+    def flush():
+        log = ub.exec0(*args)
+        for start, count in pending:
+            vals.extend(ub_parse_md_output(log, start, count, bytesize))
+
+    for start, count in runs:
+        cmd = [f"md{bl}", hex(start), hex(count)]
+        cmdlen = len(" ".join(cmd)) + 3
+        if args and length + cmdlen > maxlen:
+            flush()
+            args = []
+            pending = []
+            length = 0
+
+        if args:
+            args.append(board.Then)
+        args += cmd
+        pending.append((start, count))
+        length += cmdlen
+
+    if args:
+        flush()
+
+    return vals
+
+
+def ub_write_register_list(
+    ub: typing.Optional[board.UBootShell],
+    regs: list,
+    bytesize: int = 4,
+    maxlen: int = UB_CMD_MAXLEN,
+) -> None:
+    """
+    write a list of registers in u-boot with mw command
+
+    The mw commands are chained with ";" into command lines up
+    to maxlen characters, so only one prompt round trip is needed
+    for a bunch of registers.
+
+    :param ub: U-Boot machine we run on
+    :param regs: list of (address, value) tuples as hex strings
+    :param bytesize: size of one register in bytes [1,2,4,8]
+    :param maxlen: max length of one command line
+    """
+    bl = _ub_md_size(bytesize)
+    args = []
+    length = 0
+    for address, value in regs:
+        cmd = [f"mw{bl}", address, value]
+        cmdlen = len(" ".join(cmd)) + 3
+        if args and length + cmdlen > maxlen:
+            ub.exec0(*args)
+            args = []
+            length = 0
+
+        if args:
+            args.append(board.Then)
+        args += cmd
+        length += cmdlen
+
+    if args:
+        ub.exec0(*args)
+
 @tbot.testcase
 def board_ub_unit_test(
     ub: typing.Optional[board.UBootShell] = None,